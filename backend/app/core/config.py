@@ -15,7 +15,112 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     MONGODB_URI: str
     DATABASE_NAME: str
-    GEMINI_API_KEY: str
+    GEMINI_API_KEY: str = ""  # only needed once a report is analyzed
+
+    # MongoDB client: pool sizing and timeouts (0 = driver default / no limit) and wire
+    # compression ("zstd,snappy,zlib"; zstd and snappy need pymongo[zstd,snappy])
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_CONNECTING: int = 2
+    MONGO_MAX_IDLE_TIME_MS: int = 0
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 0
+    MONGO_CONNECT_TIMEOUT_MS: int = 20000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGO_SOCKET_TIMEOUT_MS: int = 0
+    MONGO_COMPRESSORS: str = ""
+    # Read routing for read-heavy routes (reports, trends, BMI history, dashboard), e.g.
+    # "secondaryPreferred" on a replica set; staleness bound in seconds (>= 90, -1 = none).
+    # With causal consistency their reads run in a session that first reads the user's
+    # document on the primary, so secondaries never serve data older than the user's own writes.
+    MONGO_READ_PREFERENCE: str = "primary"
+    MONGO_MAX_STALENESS_SECONDS: int = 90
+    MONGO_CAUSAL_CONSISTENCY: bool = True
+
+    # Password hashing: bcrypt cost (stored hashes are upgraded on login when it changes),
+    # pool size (0 = one per CPU) and how many hashes may wait before requests get a 503
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # Background report processing (POST /reports/upload?async=true)
+    REPORT_JOB_WORKERS: int = 2  # in-process workers, 0 to rely on `python -m app.worker`
+    REPORT_JOB_LEASE_SECONDS: int = 120
+    REPORT_JOB_MAX_ATTEMPTS: int = 3
+    REPORT_JOB_POLL_INTERVAL: float = 1.0
+
+    # Authenticated principal / decoded token caches (get_current_user)
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Report listing
+    REPORTS_PAGE_SIZE: int = 20
+    REPORTS_MAX_PAGE_SIZE: int = 100
+
+    # Gemini gateway
+    GEMINI_BASE_URL: str = ""
+    GEMINI_MAX_CONCURRENCY: int = 4
+    GEMINI_TIMEOUT_SECONDS: float = 90.0
+    GEMINI_MAX_RETRIES: int = 2
+    GEMINI_RETRY_BASE_DELAY: float = 0.5
+    GEMINI_RETRY_MAX_DELAY: float = 8.0
+    GEMINI_BREAKER_FAILURE_THRESHOLD: int = 5
+    GEMINI_BREAKER_RESET_SECONDS: float = 30.0
+
+    # PDF extraction process pool and limits
+    PDF_WORKERS: int = 0  # 0 = one per CPU
+    PDF_PAGES_PER_TASK: int = 16
+    PDF_MAX_PAGES: int = 100
+    PDF_MAX_BYTES: int = 20 * 1024 * 1024
+    PDF_EXTRACT_TIMEOUT_SECONDS: float = 30.0
+    PDF_TEXT_PROBE_PAGES: int = 5
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+
+    # Bulk import (POST /reports/import)
+    IMPORT_CONCURRENCY: int = 4
+    IMPORT_MAX_FILES: int = 100
+    IMPORT_MAX_ARCHIVE_BYTES: int = 200 * 1024 * 1024
+    IMPORT_INSERT_BATCH: int = 20
+
+    # Bulk BMI import (POST /bmi/import)
+    BMI_IMPORT_CHUNK_ROWS: int = 10000
+    BMI_IMPORT_MAX_ROWS: int = 1_000_000
+
+    # Uploaded PDF storage: "local" (hash-sharded directories) or "gridfs" (shared by replicas)
+    STORAGE_BACKEND: str = "local"
+    STORAGE_LOCAL_ROOT: str = "uploads/blobs"
+    STORAGE_GRIDFS_BUCKET: str = "report_blobs"
+    UPLOAD_TMP_DIR: str = "uploads/tmp"
+
+    # Content-addressed Gemini analysis cache
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 10000
+    ANALYSIS_CACHE_MEMORY_ENTRIES: int = 256
+
+    # What is sent to Gemini: "native" (the whole PDF) or "adaptive" (lab-table
+    # pages only, as text when their text layer is rich enough)
+    ANALYSIS_MODE: str = "native"
+    ANALYSIS_PAGE_SCORE_THRESHOLD: float = 3.0
+    ANALYSIS_MIN_TEXT_CHARS: int = 300
+    ANALYSIS_MIN_CHARS_PER_PAGE: int = 150
+
+    # Local rule-based lab parser: "off", "advice" (local values, Gemini writes
+    # only the narrative) or "local" (no Gemini call). Gemini handles reports
+    # parsed with less than LAB_PARSER_MIN_CONFIDENCE.
+    LAB_PARSER_MODE: str = "off"
+    LAB_PARSER_MIN_CONFIDENCE: float = 0.85
+
+    # Encode report responses with orjson, skipping response_model validation
+    FAST_JSON_RESPONSES: bool = False
+
+    # Observability: LOG_FORMAT is "json" or "text"; METRICS_ENABLED exposes GET /metrics
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    METRICS_ENABLED: bool = True
+
+    # Comma separated emails allowed to call /api/admin endpoints
+    ADMIN_EMAILS: str = ""
 
     class Config:
         case_sensitive = True
@@ -1,22 +1,194 @@
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import read_preferences
+from pymongo.client_session import ClientSession
+
 from app.core.config import get_settings
+from app.core.metrics import mongo_command_metrics, mongo_pool_metrics
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCES = {
+    "primary": read_preferences.Primary,
+    "primarypreferred": read_preferences.PrimaryPreferred,
+    "secondary": read_preferences.Secondary,
+    "secondarypreferred": read_preferences.SecondaryPreferred,
+    "nearest": read_preferences.Nearest,
+}
+
+# Collection methods that take session=; anything else passes straight through
+READ_METHODS = {"find", "find_one", "aggregate", "count_documents", "distinct"}
+WRITE_METHODS = {
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "bulk_write",
+    "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+}
 
 class Database:
     client: AsyncIOMotorClient = None
     db = None
+    read_db = None  # None when read-heavy routes read from the primary like everything else
 
 db = Database()
 
+
+def _optional_ms(value: int) -> Optional[int]:
+    return value or None
+
+
+def client_options() -> dict:
+    """AsyncIOMotorClient keyword arguments from Settings (they override the same options in MONGODB_URI)."""
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxConnecting": settings.MONGO_MAX_CONNECTING,
+        "maxIdleTimeMS": _optional_ms(settings.MONGO_MAX_IDLE_TIME_MS),
+        "waitQueueTimeoutMS": _optional_ms(settings.MONGO_WAIT_QUEUE_TIMEOUT_MS),
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": _optional_ms(settings.MONGO_SOCKET_TIMEOUT_MS),
+    }
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    if settings.METRICS_ENABLED:
+        options["event_listeners"] = [mongo_command_metrics, mongo_pool_metrics]
+    return options
+
+
+def read_preference():
+    mode = settings.MONGO_READ_PREFERENCE.replace("_", "").lower()
+    if mode not in READ_PREFERENCES:
+        raise ValueError(
+            f"Unknown MONGO_READ_PREFERENCE {settings.MONGO_READ_PREFERENCE!r}. "
+            "Use primary, primaryPreferred, secondary, secondaryPreferred or nearest."
+        )
+    if mode == "primary":
+        return read_preferences.Primary()
+    return READ_PREFERENCES[mode](max_staleness=settings.MONGO_MAX_STALENESS_SECONDS)
+
+
+def _advance(session, to) -> None:
+    # Standalone servers report no cluster or operation time
+    if to.cluster_time is not None:
+        session.advance_cluster_time(to.cluster_time)
+    if to.operation_time is not None:
+        session.advance_operation_time(to.operation_time)
+
+
+class SessionCollection:
+    """A Motor collection whose operations run in sessions of a SessionDatabase."""
+
+    def __init__(self, collection, database: "SessionDatabase"):
+        self._collection = collection
+        self._database = database
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name in READ_METHODS:
+            def read(*args, **kwargs):
+                return attribute(*args, session=self._database.branch(), **kwargs)
+            return read
+        if name in WRITE_METHODS:
+            async def write(*args, **kwargs):
+                session = self._database.branch()
+                result = await attribute(*args, session=session, **kwargs)
+                self._database.observe(session)
+                return result
+            return write
+        return attribute
+
+
+class SessionDatabase:
+    """
+    What read-heavy routes get instead of the database: collections come from the
+    read-preference database, and every operation runs in a causally consistent
+    session that starts no earlier than `clock`.
+
+    One session can't serve concurrent operations (the dashboard gathers its
+    reads), so each operation gets its own, branched from `clock`. Writes move
+    the clock forward, so a later read in the same request sees them.
+    `user_version` is the user's data_version document read on the primary
+    when the clock was started.
+    """
+
+    def __init__(self, database, client, clock, user_version: Optional[dict] = None):
+        self._database = database
+        self._client = client
+        self._clock = clock
+        self._sessions = []
+        self.user_version = user_version
+
+    def branch(self) -> ClientSession:
+        # Motor's start_session is a coroutine, but collection methods like find() need the
+        # session right away. PyMongo's does no I/O (the server session is taken from the
+        # pool on first use), and Motor passes PyMongo sessions through unchanged.
+        session = self._client.delegate.start_session(causal_consistency=True)
+        _advance(session, self._clock)
+        self._sessions.append(session)
+        return session
+
+    def observe(self, session) -> None:
+        _advance(self._clock, session)
+
+    async def end_sessions(self) -> None:
+        sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.end_session()
+
+    def __getitem__(self, name):
+        return SessionCollection(self._database[name], self)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
 async def get_database():
     return db.db
 
+
+@asynccontextmanager
+async def read_session(user_id: str, primary_db=None):
+    """
+    Database handle for a user's read-only requests. On a replica set with
+    MONGO_READ_PREFERENCE other than primary, reads may be served by secondaries;
+    otherwise this is just `primary_db` (the main database by default).
+    """
+    if db.read_db is None:
+        yield primary_db if primary_db is not None else db.db
+        return
+    if not settings.MONGO_CAUSAL_CONSISTENCY:
+        yield db.read_db
+        return
+    async with await db.client.start_session(causal_consistency=True) as clock:
+        # Reading the user's document on the primary moves the session's operation time past
+        # every write the primary has acknowledged, including this user's uploads saved by
+        # another process (the job worker). Secondary reads branched from it wait until their
+        # node has caught up to that time, so they never miss the user's own writes.
+        user_version = await db.db.users.find_one(
+            {"_id": ObjectId(user_id)}, {"data_version": 1, "data_updated_at": 1}, session=clock
+        )
+        read_db = SessionDatabase(db.read_db, db.client, clock, user_version)
+        try:
+            yield read_db
+        finally:
+            await read_db.end_sessions()
+
+
 async def connect_to_mongo():
-    db.client = AsyncIOMotorClient(settings.MONGODB_URI)
+    db.client = AsyncIOMotorClient(settings.MONGODB_URI, **client_options())
     db.db = db.client[settings.DATABASE_NAME]
-    print("Connected to MongoDB")
+    preference = read_preference()
+    if preference.mode != read_preferences.Primary().mode:
+        db.read_db = db.client.get_database(settings.DATABASE_NAME, read_preference=preference)
+    logger.info("Connected to MongoDB (reads: %s)", settings.MONGO_READ_PREFERENCE)
 
 async def close_mongo_connection():
     db.client.close()
-    print("Closed MongoDB connection")
+    logger.info("Closed MongoDB connection")
@@ -0,0 +1,70 @@
+"""
+Declared MongoDB indexes, one list per collection.
+
+Every hot query should be covered by an entry here. `ensure_indexes` is
+idempotent and runs at startup; `python -m app.scripts.indexes report`
+compares these specs with what the server has and how it is used.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "users": [
+        # get_current_user / login / register
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "reports": [
+        # list_reports keyset pagination, trends rebuilds, ownership checks
+        IndexModel([("user_id", ASCENDING), ("upload_date", DESCENDING), ("_id", DESCENDING)], name="user_upload_date"),
+        # One report per background job, however many workers ran it
+        IndexModel(
+            [("job_id", ASCENDING)], name="job_id_unique", unique=True,
+            partialFilterExpression={"job_id": {"$type": "string"}},
+        ),
+    ],
+    "bmi_records": [
+        # /bmi/latest and /bmi/history (a time-series collection since migration 2)
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+    "user_trends": [
+        IndexModel([("user_id", ASCENDING), ("key", ASCENDING)], name="user_key_unique", unique=True),
+    ],
+    "report_jobs": [
+        # claim_next_job: queued jobs by age, and expired leases
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING), ("created_at", ASCENDING)], name="status_available_at"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease_expires_at"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+    "analysis_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        IndexModel([("last_used_at", ASCENDING)], name="last_used_at"),
+        IndexModel([("version", ASCENDING)], name="version"),
+    ],
+}
+
+# Representative hot queries, used by the index report to check query plans
+HOT_QUERIES = [
+    ("users", "get_current_user", {"email": "someone@example.com"}, None),
+    ("reports", "list_reports", {"user_id": "000000000000000000000000"}, [("upload_date", -1), ("_id", -1)]),
+    ("bmi_records", "latest_bmi", {"user_id": "000000000000000000000000"}, [("created_at", -1)]),
+    ("user_trends", "trends", {"user_id": "000000000000000000000000"}, None),
+    ("report_jobs", "claim_job", {"status": "queued", "available_at": {"$lte": datetime(1970, 1, 1)}}, [("created_at", 1)]),
+]
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Creates any missing declared index. Failures are logged, never fatal."""
+    created = {}
+    for collection, models in INDEX_SPECS.items():
+        try:
+            created[collection] = await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            # e.g. duplicate emails preventing the unique index; needs manual cleanup
+            logger.error(f"Could not create indexes on {collection}: {e}")
+    return created
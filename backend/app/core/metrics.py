@@ -0,0 +1,184 @@
+"""
+Prometheus metrics for the hot paths.
+
+- MetricsMiddleware: per-route latency histogram and in-flight gauge, plus a
+  request id (X-Request-ID, generated when absent) for the structured logs.
+- span(): times a named block (PDF extraction, Gemini, bcrypt, storage...).
+- MongoCommandMetrics: pymongo command listener timing every Motor operation.
+- MongoPoolMetrics: connection pool listener recording how long operations
+  wait for a connection, and how many are checked out.
+
+Everything is exposed in the Prometheus text format on GET /metrics.
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+
+from app.core.logs import request_id_var
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"), buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served", ("method",))
+SPAN_DURATION = Histogram(
+    "span_duration_seconds", "Duration of instrumented operations",
+    ("span", "outcome"), buckets=LATENCY_BUCKETS
+)
+PASSWORD_HASH_PENDING = Gauge("password_hash_pending", "Password hashes running or queued in the hashing pool")
+PASSWORD_HASH_SHED = Counter("password_hash_shed_total", "Password hashes rejected because the pool queue was full")
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency",
+    ("command", "collection", "outcome"), buckets=MONGO_BUCKETS
+)
+MONGO_POOL_WAIT = Histogram(
+    "mongo_pool_wait_seconds", "Time spent waiting to check a connection out of the MongoDB pool",
+    ("outcome",), buckets=MONGO_BUCKETS
+)
+MONGO_POOL_CHECKED_OUT = Gauge("mongo_pool_checked_out", "MongoDB connections in use", ("address",))
+
+
+@contextmanager
+def span(name: str, **fields):
+    """Times the enclosed block; usable around sync and awaited code alike."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_DURATION.labels(name, outcome).observe(elapsed)
+        duration_ms = round(elapsed * 1000, 2)
+        logger.debug(f"{name} {outcome} {duration_ms}ms", extra={"span": name, "outcome": outcome, "duration_ms": duration_ms, **fields})
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get("collection", "")  # getMore
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _observe(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMAND_DURATION.labels(event.command_name, collection, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    def connection_checked_out(self, event):
+        MONGO_POOL_WAIT.labels("ok").observe(event.duration or 0.0)
+        MONGO_POOL_CHECKED_OUT.labels(_address(event)).inc()
+
+    def connection_check_out_failed(self, event):
+        # reason: "timeout" (pool exhausted for waitQueueTimeoutMS), "poolClosed", "connectionError"
+        MONGO_POOL_WAIT.labels(event.reason).observe(event.duration or 0.0)
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.labels(_address(event)).dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+mongo_pool_metrics = MongoPoolMetrics()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are timed to their last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.labels(method).dec()
+            # The router stores the matched route in the scope; label by template, not raw path
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(method, route, str(status)).observe(elapsed)
+            duration_ms = round(elapsed * 1000, 2)
+            logger.info(f"{method} {scope['path']} {status} {duration_ms}ms", extra={
+                "method": method,
+                "path": scope["path"],
+                "route": route,
+                "status": status,
+                "duration_ms": duration_ms,
+            })
+            request_id_var.reset(token)
+
+
+async def metrics_endpoint(request):
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
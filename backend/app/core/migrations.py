@@ -0,0 +1,184 @@
+"""
+Versioned schema migrations.
+
+Applied migrations are recorded in the `schema_migrations` collection, one
+document per version, so each runs once per database. Add new steps to
+MIGRATIONS with the next version number; they must be safe to re-run in case
+a process dies halfway through.
+
+Replicas starting together take turns: run_migrations holds a lease in
+`schema_migration_lock` while it applies migrations, and the others wait for
+it, then find the work done.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from app.core.database import get_database
+from app.core.indexes import ensure_indexes
+from app.services.trends_service import rebuild_user_trends
+
+logger = logging.getLogger(__name__)
+
+BMI_COPY_BATCH = 5000
+MIGRATION_LOCK_ID = "migrations"
+MIGRATION_LOCK_LEASE_SECONDS = 60
+MIGRATION_LOCK_POLL_SECONDS = 2
+
+
+async def _create_declared_indexes(db):
+    await ensure_indexes(db)
+
+
+async def _collection_options(db, name: str):
+    """The collection's creation options, or None if it does not exist."""
+    async for info in await db.list_collections(filter={"name": name}):
+        return info.get("options", {})
+    return None
+
+
+async def _bmi_records_to_timeseries(db):
+    """
+    Recreates bmi_records as a time-series collection (metaField user_id,
+    timeField created_at). Existing data is kept in bmi_records_legacy and
+    copied over in _id order, resuming after the last copied document, so a
+    crash halfway through just continues on the next run. Time-series
+    collections cannot be renamed, hence the copy instead of a swap.
+    """
+    options = await _collection_options(db, "bmi_records")
+    if options is not None and "timeseries" not in options:
+        if await db.bmi_records.estimated_document_count() == 0:
+            await db.bmi_records.drop()
+        elif await _collection_options(db, "bmi_records_legacy") is None:
+            await db.bmi_records.rename("bmi_records_legacy")
+        else:
+            # Written to after an interrupted run had already moved the data aside
+            await db.bmi_records.aggregate([{"$merge": {"into": "bmi_records_legacy", "whenMatched": "keepExisting"}}]).to_list(length=None)
+            await db.bmi_records.drop()
+        options = None
+
+    if options is None:
+        await db.create_collection(
+            "bmi_records",
+            timeseries={"timeField": "created_at", "metaField": "user_id", "granularity": "hours"}
+        )
+
+    if await _collection_options(db, "bmi_records_legacy") is None:
+        return
+    last = await db.bmi_records.find({}, {"_id": 1}).sort("_id", -1).limit(1).to_list(length=1)
+    query = {"_id": {"$gt": last[0]["_id"]}} if last else {}
+    batch = []
+    async for record in db.bmi_records_legacy.find(query).sort("_id", ASCENDING):
+        batch.append(record)
+        if len(batch) >= BMI_COPY_BATCH:
+            await db.bmi_records.insert_many(batch)  # ordered, so what is copied is always a prefix
+            batch = []
+    if batch:
+        await db.bmi_records.insert_many(batch)
+    logger.warning("bmi_records copied to a time-series collection; bmi_records_legacy can be dropped once verified")
+
+
+async def _backfill_user_trends(db):
+    """
+    Builds user_trends for every user with reports, including those whose older
+    reports predate the materialized view. Rebuilding is idempotent, so an
+    interrupted run simply starts over.
+    """
+    rebuilt = 0
+    async for group in db.reports.aggregate([{"$group": {"_id": "$user_id"}}]):
+        await rebuild_user_trends(db, group["_id"])
+        rebuilt += 1
+    logger.warning(f"user_trends rebuilt for {rebuilt} users")
+
+
+# (version, description, coroutine taking the db)
+MIGRATIONS = [
+    (1, "Create declared indexes", _create_declared_indexes),
+    (2, "Move bmi_records to a time-series collection", _bmi_records_to_timeseries),
+    (3, "Backfill user_trends from stored reports", _backfill_user_trends),
+]
+
+
+async def current_schema_version(db) -> int:
+    latest = await db.schema_migrations.find_one(sort=[("_id", -1)])
+    return latest["_id"] if latest else 0
+
+
+async def _take_migration_lock(db, owner: str) -> bool:
+    now = datetime.utcnow()
+    try:
+        await db.schema_migration_lock.find_one_and_update(
+            {"_id": MIGRATION_LOCK_ID, "$or": [{"owner": None}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=MIGRATION_LOCK_LEASE_SECONDS)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Held by another process: the upsert tried to insert a second lock document
+        return False
+    return True
+
+
+@asynccontextmanager
+async def migration_lock(db):
+    """Waits for the migration lease and renews it until the block exits."""
+    owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    while not await _take_migration_lock(db, owner):
+        logger.info("Waiting for another process to finish schema migrations")
+        await asyncio.sleep(MIGRATION_LOCK_POLL_SECONDS)
+
+    async def renew():
+        while True:
+            await asyncio.sleep(MIGRATION_LOCK_LEASE_SECONDS / 3)
+            await db.schema_migration_lock.update_one(
+                {"_id": MIGRATION_LOCK_ID, "owner": owner},
+                {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=MIGRATION_LOCK_LEASE_SECONDS)}}
+            )
+
+    renew_task = asyncio.create_task(renew())
+    try:
+        yield
+    finally:
+        renew_task.cancel()
+        await db.schema_migration_lock.update_one(
+            {"_id": MIGRATION_LOCK_ID, "owner": owner},
+            {"$set": {"owner": None, "expires_at": None}}
+        )
+
+
+async def run_migrations(db) -> int:
+    version = await current_schema_version(db)
+    if version >= MIGRATIONS[-1][0]:
+        return version
+    async with migration_lock(db):
+        # Another replica may have applied some while this one waited
+        return await _apply_migrations(db, await current_schema_version(db))
+
+
+async def _apply_migrations(db, version: int) -> int:
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        logger.warning(f"Applying schema migration {number}: {description}")
+        await migrate(db)
+        await db.schema_migrations.replace_one(
+            {"_id": number},
+            {"_id": number, "description": description, "applied_at": datetime.utcnow()},
+            upsert=True
+        )
+        version = number
+    return version
+
+
+async def migrate_on_startup():
+    db = await get_database()
+    version = await run_migrations(db)
+    # Index specs can grow without a new migration; creating existing indexes is a no-op
+    await ensure_indexes(db)
+    logger.info(f"Database schema at version {version}")
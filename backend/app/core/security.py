@@ -1,18 +1,84 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import get_settings
+from app.core.metrics import PASSWORD_HASH_PENDING, PASSWORD_HASH_SHED, span
 
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password.encode("utf-8"), hashed_password)
+    with span("auth.bcrypt_verify"):
+        return pwd_context.verify(plain_password.encode("utf-8"), hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password.encode("utf-8"))
+    with span("auth.bcrypt_hash"):
+        return pwd_context.hash(password.encode("utf-8"))
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash): new_hash is set when the stored hash used another cost than BCRYPT_ROUNDS."""
+    with span("auth.bcrypt_verify"):
+        return pwd_context.verify_and_update(plain_password.encode("utf-8"), hashed_password)
+
+
+# --- Off-loop hashing ---
+# bcrypt releases the GIL, so a thread pool hashes in parallel without blocking the
+# event loop. Once PASSWORD_HASH_MAX_QUEUE hashes wait for a thread, new ones are
+# refused so a login storm degrades into quick 503s instead of stalling the API.
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool's queue is full; routes answer 503."""
+
+
+HASH_WORKERS = settings.PASSWORD_HASH_WORKERS or os.cpu_count()
+
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_hash_pending = 0
+
+
+def get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+    return _hash_executor
+
+
+async def shutdown_password_workers():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+async def _run_hashing(func, *args):
+    global _hash_pending
+    if _hash_pending >= HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE:
+        PASSWORD_HASH_SHED.inc()
+        raise PasswordHashingBusy("Too many password checks in progress")
+    _hash_pending += 1
+    PASSWORD_HASH_PENDING.inc()
+    try:
+        # Run in a copy of the context so spans logged by the thread keep the request id
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(get_hash_executor(), context.run, func, *args)
+    finally:
+        _hash_pending -= 1
+        PASSWORD_HASH_PENDING.dec()
+
+
+async def hash_password(password: str) -> str:
+    return await _run_hashing(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Off-loop verify_and_update_password. Raises PasswordHashingBusy when the pool is saturated."""
+    return await _run_hashing(verify_and_update_password, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
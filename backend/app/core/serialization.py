@@ -0,0 +1,58 @@
+"""
+Opt-in fast JSON responses (FAST_JSON_RESPONSES).
+
+Routes normally return Mongo dicts that FastAPI validates against their
+response_model and encodes with the standard json module. For documents we
+wrote ourselves that validation is redundant, so with the setting enabled
+routes return a FastJSONResponse instead: the dict is encoded in one pass by
+orjson, with BSON types (ObjectId, Decimal128) converted on the way. Without
+orjson installed the stdlib encoder is used with the same conversions.
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+from bson import Decimal128, ObjectId
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def bson_default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return float(obj.to_decimal())
+    if isinstance(obj, (datetime, date)):  # only reached by the stdlib fallback
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=bson_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=bson_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_projection(model) -> dict:
+    """find() projection of a pydantic model's serialized fields, so no extra keys are read or sent."""
+    return {field.alias or name: 1 for name, field in model.model_fields.items()}
+
+
+def model_defaults(model) -> dict:
+    """Defaults of optional fields, merged under stored documents that predate them."""
+    return {
+        field.alias or name: field.default
+        for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
@@ -2,10 +2,18 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import get_settings
 from app.core.database import connect_to_mongo, close_mongo_connection
-from app.routes import auth, users, reports, bmi
+from app.core.logs import configure_logging
+from app.core.metrics import MetricsMiddleware, metrics_endpoint
+from app.core.migrations import migrate_on_startup
+from app.core.security import shutdown_password_workers
+from app.routes import auth, users, reports, bmi, admin, dashboard
+from app.services.job_service import start_report_workers, stop_report_workers
+from app.services.pdf_service import shutdown_pdf_workers
 
 settings = get_settings()
 
+configure_logging()
+
 app = FastAPI(title=settings.PROJECT_NAME)
 
 # CORS Configuration
@@ -17,10 +25,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Request-ID", "ETag", "Last-Modified"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
 # Database Events
 app.add_event_handler("startup", connect_to_mongo)
+app.add_event_handler("startup", migrate_on_startup)
+app.add_event_handler("startup", start_report_workers)
+app.add_event_handler("shutdown", stop_report_workers)
+app.add_event_handler("shutdown", shutdown_pdf_workers)
+app.add_event_handler("shutdown", shutdown_password_workers)
 app.add_event_handler("shutdown", close_mongo_connection)
 
 # Routes
@@ -28,6 +46,8 @@ app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["aut
 app.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["users"])
 app.include_router(reports.router, prefix=f"{settings.API_V1_STR}/reports", tags=["reports"])
 app.include_router(bmi.router, prefix=f"{settings.API_V1_STR}/bmi", tags=["bmi"])
+app.include_router(admin.router, prefix=f"{settings.API_V1_STR}/admin", tags=["admin"])
+app.include_router(dashboard.router, prefix=f"{settings.API_V1_STR}/dashboard", tags=["dashboard"])
 
 @app.get("/health")
 async def health_check():
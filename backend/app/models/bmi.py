@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 class BMICreate(BaseModel):
     height_cm: float
@@ -12,3 +13,33 @@ class BMIRecord(BaseModel):
     bmi: float
     category: str
     created_at: datetime
+
+
+class BMIPoint(BaseModel):
+    created_at: datetime
+    bmi: float
+    weight_kg: float
+    height_cm: float
+    category: str
+
+
+class BMIBucketStats(BaseModel):
+    mean: float
+    min: float
+    max: float
+    delta: Optional[float] = None  # change of the mean since the previous bucket
+
+
+class BMIBucket(BaseModel):
+    bucket: datetime
+    count: int
+    bmi: BMIBucketStats
+    weight_kg: BMIBucketStats
+
+
+class BMIImportResult(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    duplicates: int = 0  # same timestamp within the import or already stored
+    invalid: int = 0  # unparseable or implausible rows
+    truncated: bool = False  # stopped at BMI_IMPORT_MAX_ROWS
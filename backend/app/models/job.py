@@ -0,0 +1,54 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+from bson import ObjectId
+
+from app.models.report import ReportResponse
+
+
+class ReportJobInDB(BaseModel):
+    id: Optional[str] = Field(None, alias="_id")
+    user_id: str
+    status: str = "queued"  # queued | running | completed | failed
+    progress: int = 0
+    stage: str = "queued"
+    file_path: str
+    filename: Optional[str] = None
+    content_sha256: Optional[str] = None
+    upload_date: datetime
+    attempts: int = 0
+    max_attempts: int = 3
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    report_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        populate_by_name = True
+        json_encoders = {
+            ObjectId: str
+        }
+
+
+class ReportJobAccepted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+
+class ReportJobResponse(BaseModel):
+    id: str = Field(..., alias="_id")
+    status: str
+    progress: int
+    stage: str
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    report: Optional[ReportResponse] = None
+
+    class Config:
+        populate_by_name = True
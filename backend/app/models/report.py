@@ -27,7 +27,9 @@ class ReportInDB(ReportBase):
     upload_date: datetime = Field(default_factory=datetime.utcnow)
     extracted_data: Dict[str, Any] # Flexible dict to accommodate various report formats
     gemini_analysis: Optional[GeminiAnalysis] = None
-    pdf_path: Optional[str] = None
+    pdf_path: Optional[str] = None  # storage URI, e.g. local://<sha256>
+    pdf_sha256: Optional[str] = None
+    original_filename: Optional[str] = None
 
     class Config:
         populate_by_name = True
@@ -37,3 +39,15 @@ class ReportInDB(ReportBase):
 
 class ReportResponse(ReportInDB):
     id: str = Field(..., alias="_id")
+
+class ReportSummary(BaseModel):
+    """Lightweight list item; extra projected fields (see `fields=`) pass through."""
+    id: str = Field(..., alias="_id")
+    report_type: str = "General Health"
+    upload_date: datetime
+    health_score: Optional[int] = None
+    abnormal_count: int = 0
+
+    class Config:
+        populate_by_name = True
+        extra = "allow"
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.core.config import get_settings
+from app.routes.auth import get_current_user
+from app.services.analysis_cache import analysis_cache
+from app.services.principal_cache import cache_stats as principal_cache_stats
+from app.services.gemini_service import ADVICE_VERSION, ANALYSIS_VERSION, LIVE_VERSIONS, gateway, model_id
+from app.services.page_selection import mode_metrics
+from app.services.lab_parser import parser_stats
+
+router = APIRouter()
+settings = get_settings()
+
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    admins = {email.strip().lower() for email in settings.ADMIN_EMAILS.split(",") if email.strip()}
+    if current_user["email"].lower() not in admins:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+
+@router.get("/analysis-cache")
+async def get_analysis_cache_stats(admin: dict = Depends(get_admin_user)):
+    return {
+        "version": ANALYSIS_VERSION,
+        "model_id": model_id,
+        **analysis_cache.stats()
+    }
+
+
+@router.get("/analysis-modes")
+async def get_analysis_mode_stats(admin: dict = Depends(get_admin_user)):
+    """Bytes sent to Gemini and call latency per input mode (native PDF, text, pruned PDF)."""
+    return mode_metrics.stats()
+
+
+@router.get("/lab-parser")
+async def get_lab_parser_stats(admin: dict = Depends(get_admin_user)):
+    """Local parser acceptance versus Gemini fallbacks, per detected template."""
+    return {
+        "mode": settings.LAB_PARSER_MODE,
+        "min_confidence": settings.LAB_PARSER_MIN_CONFIDENCE,
+        **parser_stats.stats()
+    }
+
+
+@router.delete("/analysis-cache")
+async def invalidate_analysis_cache(
+    stale_only: bool = True,
+    admin: dict = Depends(get_admin_user)
+):
+    """
+    Removes cached analyses. By default only entries produced by an older
+    base_prompt, advice_prompt or model_id are dropped; pass stale_only=false
+    to clear everything.
+    """
+    deleted = await analysis_cache.invalidate(keep_versions=LIVE_VERSIONS if stale_only else None)
+    return {"status": "success", "deleted": deleted, "version": ANALYSIS_VERSION, "advice_version": ADVICE_VERSION}
+
+
+@router.get("/gemini")
+async def get_gemini_gateway_stats(admin: dict = Depends(get_admin_user)):
+    return gateway.stats()
+
+
+@router.get("/auth-cache")
+async def get_auth_cache_stats(admin: dict = Depends(get_admin_user)):
+    return principal_cache_stats()
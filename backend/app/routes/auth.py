@@ -1,16 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from app.core.database import get_database
+from app.core.database import get_database, read_session
 from app.models.user import UserCreate, UserInDB, UserResponse
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import PasswordHashingBusy, check_password, create_access_token, hash_password
 from app.core.config import get_settings
-from jose import JWTError, jwt
+from app.services.principal_cache import decode_token, get_principal, invalidate_principal
+from jose import JWTError
 from bson import ObjectId
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 settings = get_settings()
 
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests right now. Please try again shortly.",
+        headers={"Retry-After": "1"},
+    )
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get_database)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -18,23 +26,27 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = await db.users.find_one({"email": email})
+    # Resolved principals are cached briefly; writes to the user call invalidate_principal
+    user = await get_principal(db, email)
     if user is None:
         raise credentials_exception
     
-    # Convert _id to str for Pydantic compatible response if needed, 
-    # but for Internal use we might keep it as dict.
+    # _id is already converted to str for Pydantic compatible response.
     # Here we just return the dict, the route response_model will handle serialization if UserResponse is used
-    user["_id"] = str(user["_id"])
     return user
 
+async def get_read_database(current_user: dict = Depends(get_current_user), db = Depends(get_database)):
+    """Database for read-heavy routes, routed by MONGO_READ_PREFERENCE (see read_session)."""
+    async with read_session(str(current_user["_id"]), db) as read_db:
+        yield read_db
+
 @router.post("/register", response_model=UserResponse)
 async def register(user: UserCreate, db = Depends(get_database)):
     existing_user = await db.users.find_one({"email": user.email})
@@ -44,7 +56,10 @@ async def register(user: UserCreate, db = Depends(get_database)):
             detail="Email already registered"
         )
     
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await hash_password(user.password)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
     user_in_db = UserInDB(
         email=user.email,
         full_name=user.full_name,
@@ -59,12 +74,22 @@ async def register(user: UserCreate, db = Depends(get_database)):
 @router.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_database)):
     user = await db.users.find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await check_password(form_data.password, user["hashed_password"])
+        except PasswordHashingBusy:
+            raise _hashing_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made; store it at the current cost
+        await db.users.update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
+        invalidate_principal(user_id=str(user["_id"]))
     
     from datetime import timedelta
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -1,37 +1,39 @@
 from app.core.database import get_database
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from datetime import datetime
+from typing import List, Optional
+from pymongo.errors import OperationFailure
 
-from app.models.bmi import BMICreate, BMIRecord
-from app.routes.auth import get_current_user
+from app.models.bmi import BMIBucket, BMICreate, BMIImportResult, BMIPoint, BMIRecord
+from app.routes.auth import get_current_user, get_read_database
+from app.services.bmi_service import (
+    BUCKET_UNITS,
+    IMPORT_FORMATS,
+    BMIImportError,
+    bmi_buckets,
+    bmi_history,
+    classify_bmi,
+    compute_bmi,
+    ingest_bmi_stream,
+    latest_bmi,
+)
+from app.services.data_version import bump_data_version, conditional_get
 
 
 router = APIRouter(tags=["BMI"])
 @router.get("/latest")
 async def get_latest_bmi(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
-    db = Depends(get_database)
+    db = Depends(get_read_database)
 ):
-    bmi_record = await db.bmi_records.find_one(
-        {"user_id": str(current_user["_id"])},
-        sort=[("created_at", -1)]
-    )
-    if not bmi_record:
-        return None
-    
-    # Calculate recommended range for response if needed by frontend
-    height_m = bmi_record["height_cm"] / 100
-    min_w = round(18.5 * (height_m ** 2), 1)
-    max_w = round(24.9 * (height_m ** 2), 1)
-    
-    return {
-        "bmi": bmi_record["bmi"],
-        "category": bmi_record["category"],
-        "height_cm": bmi_record["height_cm"],
-        "weight_kg": bmi_record["weight_kg"],
-        "recommended_range": f"{min_w} - {max_w} kg",
-        "created_at": bmi_record["created_at"]
-    }
+    user_id = str(current_user["_id"])
+    cache_headers, not_modified = await conditional_get(request, db, user_id)
+    if not_modified:
+        return not_modified
+    response.headers.update(cache_headers)
+    return await latest_bmi(db, user_id)
 
 
 
@@ -42,20 +44,8 @@ async def calculate_bmi(
     db = Depends(get_database)
 ):
     height_m = data.height_cm / 100
-    bmi = round(data.weight_kg / (height_m ** 2), 1)
-
-    if bmi < 18.5:
-        category = "Underweight"
-        tip = "Consider a nutrient-rich diet."
-    elif bmi < 25:
-        category = "Normal weight"
-        tip = "Great job! Keep maintaining your healthy lifestyle."
-    elif bmi < 30:
-        category = "Overweight"
-        tip = "Regular exercise can help improve your health."
-    else:
-        category = "Obese"
-        tip = "Consult a healthcare professional for guidance."
+    bmi = compute_bmi(data.weight_kg, data.height_cm)
+    category, tip = classify_bmi(bmi)
 
     min_w = round(18.5 * (height_m ** 2), 1)
     max_w = round(24.9 * (height_m ** 2), 1)
@@ -70,6 +60,7 @@ async def calculate_bmi(
     )
 
     await db.bmi_records.insert_one(bmi_doc.dict())
+    await bump_data_version(db, str(current_user["_id"]))
 
     return {
         "bmi": bmi,
@@ -77,3 +68,65 @@ async def calculate_bmi(
         "recommended_range": f"{min_w} - {max_w} kg",
         "health_tip": tip
     }
+
+
+@router.post("/import", response_model=BMIImportResult)
+async def import_bmi_readings(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(" + "|".join(IMPORT_FORMATS) + ")$"),
+    height_cm: Optional[float] = Query(None, gt=0, description="Height for rows without one; defaults to the latest reading's"),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """
+    Bulk import of scale/wearable readings from a CSV (header with timestamp,
+    weight_kg and optionally height_cm) or NDJSON request body. The body is
+    streamed; readings whose timestamp is already stored are skipped.
+    """
+    user_id = str(current_user["_id"])
+    if format is None:
+        format = "ndjson" if "json" in request.headers.get("content-type", "") else "csv"
+    if height_cm is None:
+        latest = await db.bmi_records.find_one({"user_id": user_id}, {"height_cm": 1}, sort=[("created_at", -1)])
+        height_cm = latest["height_cm"] if latest else None
+
+    try:
+        result = await ingest_bmi_stream(db, user_id, request.stream(), format, default_height=height_cm)
+    except BMIImportError as e:
+        await bump_data_version(db, user_id)  # earlier chunks may already be stored
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if result.inserted:
+        await bump_data_version(db, user_id)
+    return result
+
+
+@router.get("/history", response_model=List[BMIPoint])
+async def get_bmi_history(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_read_database)
+):
+    """Raw readings in [start, end), oldest first."""
+    return await bmi_history(db, str(current_user["_id"]), start, end, limit)
+
+
+@router.get("/history/buckets", response_model=List[BMIBucket])
+async def get_bmi_history_buckets(
+    unit: str = Query("day", pattern="^(" + "|".join(BUCKET_UNITS) + ")$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tz: str = Query("UTC", description="IANA time zone or UTC offset used for bucket boundaries"),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_read_database)
+):
+    """
+    Daily, weekly (from Monday) or monthly BMI and weight statistics: count,
+    mean, min, max and the change of the mean since the previous bucket.
+    """
+    try:
+        return await bmi_buckets(db, str(current_user["_id"]), unit, start, end, timezone=tz)
+    except OperationFailure as e:
+        # e.g. an unknown time zone
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.config import get_settings
+from app.core.serialization import FastJSONResponse
+from app.routes.auth import get_current_user, get_read_database
+from app.services.dashboard_service import SECTIONS, build_dashboard, parse_sections
+
+router = APIRouter()
+settings = get_settings()
+
+
+@router.get("")
+async def get_dashboard(
+    include: str = Query("", description=f"Comma separated sections ({', '.join(SECTIONS)}); all when empty"),
+    reports_limit: int = Query(5, ge=1, le=settings.REPORTS_MAX_PAGE_SIZE),
+    sparkline_points: int = Query(20, ge=3, le=200),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_read_database)
+):
+    """
+    Profile, checkup reminder, latest BMI, the newest report summaries with the
+    report count and average health score, and downsampled trend series, for
+    one authentication and concurrent database reads.
+    """
+    try:
+        sections = parse_sections(include)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    dashboard = await build_dashboard(db, current_user, sections, reports_limit, sparkline_points)
+    if settings.FAST_JSON_RESPONSES:
+        return FastJSONResponse(dashboard)
+    return dashboard
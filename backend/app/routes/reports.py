@@ -1,199 +1,320 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, BackgroundTasks
-from typing import List
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional, Tuple
+from app.core.config import get_settings
 from app.core.database import get_database
-from app.routes.auth import get_current_user
-from app.models.report import ReportResponse, ReportInDB, ExtractedData
-from app.services.pdf_service import extract_text_from_pdf
-from app.services.gemini_service import analyze_health_report
+from app.core.metrics import span
+from app.core.serialization import FastJSONResponse, model_defaults, model_projection
+from app.routes.auth import get_current_user, get_read_database
+from app.models.report import ReportResponse, ReportSummary
+from app.models.job import ReportJobAccepted, ReportJobResponse
+from app.services.pdf_service import PDFLimitError, has_text_layer
+from app.services.upload_service import StoredUpload, UploadRejected, stream_upload_to_disk
+from app.services.storage import (
+    BlobNotFound,
+    acquire_blob,
+    get_storage,
+    iter_file_range,
+    parse_byte_range,
+    release_blob,
+)
+from app.services.report_service import (
+    ReportProcessingError,
+    list_report_summaries,
+    parse_fields,
+    process_report,
+    report_upload_date,
+)
+from app.services.trends_service import get_user_trends, remove_report_from_trends
+from app.services.data_version import bump_data_version, conditional_get
+from app.services.job_service import JOB_QUEUED, enqueue_report_job, get_report_job
+from app.services.import_service import encode_event, run_import, stage_import_files
 from bson import ObjectId
-import shutil
+import asyncio
+import logging
 import os
 import re
-from datetime import datetime, timedelta
+import uuid
+from urllib.parse import quote
+from datetime import datetime
 
 router = APIRouter()
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+REPORT_PROJECTION = model_projection(ReportResponse)
+REPORT_DEFAULTS = model_defaults(ReportResponse)
+SUMMARY_DEFAULTS = model_defaults(ReportSummary)
 
 @router.get("/trends")
 async def get_health_trends(
+    request: Request,
+    response: Response,
+    params: Optional[str] = Query(None, description="Comma separated parameter names, e.g. Hemoglobin,HbA1c"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: Optional[int] = Query(None, ge=3, le=10000),
     current_user: dict = Depends(get_current_user),
-    db = Depends(get_database)
+    db = Depends(get_read_database)
 ):
-    reports_cursor = db.reports.find({"user_id": str(current_user["_id"])}).sort("upload_date", 1)
-    reports = await reports_cursor.to_list(length=100)
-    
-    trends = {}
-    
-    # 1. Build a map of normalized_key -> best_display_name
-    # Iterate in reverse order (newest first) to prefer newer names for display
-    param_name_map = {}
-    for report in reversed(reports):
-        data = report.get("extracted_data", {})
-        for param in data:
-            # Normalize: Remove parentheses, lowercase, strip, collapse spaces
-            # Hemoglobin (Hb) -> Hemoglobin -> hemoglobin
-            clean_param = re.sub(r'\(.*?\)', '', param)
-            norm_key = " ".join(clean_param.strip().lower().split())
-            
-            # Map common variations to standard display names if not already handled by Gemini
-            # This handles older/legacy reports
-            mapping = {
-                "hb": "Hemoglobin",
-                "haemoglobin": "Hemoglobin",
-                "hgb": "Hemoglobin",
-                "blood sugar fasting": "Fasting Blood Sugar",
-                "fasting glucose": "Fasting Blood Sugar",
-                "glucose fasting": "Fasting Blood Sugar",
-                "blood sugar random": "Random Blood Sugar",
-                "random glucose": "Random Blood Sugar",
-                "hdl": "HDL Cholesterol",
-                "ldl": "LDL Cholesterol",
-                "tgl": "Triglycerides",
-                "alt": "SGPT",
-                "ast": "SGOT",
-            }
-            
-            if norm_key in mapping:
-                param_name_map[norm_key] = mapping[norm_key]
-            elif norm_key not in param_name_map:
-                param_name_map[norm_key] = param.strip()
-    
-    for report in reports:
-        date = report.get("upload_date").isoformat()
-        data = report.get("extracted_data", {})
-        
-        for param, val in data.items():
-            # Get the canonical display name for this parameter
-            clean_param = re.sub(r'\(.*?\)', '', param)
-            norm_key = " ".join(clean_param.strip().lower().split())
-            
-            # Use the canonical display name from map
-            param_key = param_name_map.get(norm_key, param.strip())
-            
-            num_val = None
-            unit = ""
-            ref_range = None
-            
-            if isinstance(val, dict):
-                num_val = val.get("value")
-                unit = val.get("unit", "")
-                ref_range = val.get("reference_range", None)
-            elif isinstance(val, str):
-                # Legacy support: extract number from string "14.5 g/dL"
-                match = re.search(r"(\d+\.?\d*)", val)
-                if match:
-                    num_val = float(match.group(1))
-                    unit = val.replace(match.group(1), "").strip()
-            
-            if num_val is not None:
-                if param_key not in trends:
-                    trends[param_key] = {
-                        "unit": unit,
-                        "reference_range": ref_range,
-                        "data": []
-                    }
-                trends[param_key]["data"].append({
-                    "date": date,
-                    "value": num_val,
-                    "referenceRange": ref_range
-                })
-                
-    # Sort data points by date just in case
-    for param in trends:
-        trends[param]["data"].sort(key=lambda x: x["date"])
-        
+    user_id = str(current_user["_id"])
+    cache_headers, not_modified = await conditional_get(request, db, user_id)
+    if not_modified:
+        return not_modified
+
+    # Served from the incrementally maintained user_trends collection
+    trends = await get_user_trends(
+        db,
+        user_id,
+        params=[param.strip() for param in params.split(",") if param.strip()] if params else None,
+        start=start,
+        end=end,
+        max_points=max_points
+    )
+    if settings.FAST_JSON_RESPONSES:
+        return FastJSONResponse(trends, headers=cache_headers)
+    response.headers.update(cache_headers)
     return trends
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(settings.UPLOAD_TMP_DIR, exist_ok=True)
+
+def _content_disposition(filename: str) -> str:
+    """Inline disposition with the UTF-8 name (RFC 6266) and a plain-ASCII fallback for older clients."""
+    fallback = re.sub(r'[^\x20-\x7e]|["\\;,%]', "_", filename).strip() or "report.pdf"
+    return f"inline; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
 
-@router.post("/upload", response_model=ReportResponse)
+async def _store_upload(file: UploadFile, db) -> Tuple[StoredUpload, str]:
+    """Saves an uploaded PDF to storage after the size and text-layer checks. Returns it and its blob URI."""
+    # Stream the file to a temp file in chunks, hashing and size-checking as we go
+    tmp_path = os.path.join(settings.UPLOAD_TMP_DIR, f"{uuid.uuid4().hex}.pdf")
+    try:
+        with span("upload.stream_to_disk"):
+            stored = await stream_upload_to_disk(file, tmp_path)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    logger.info(f"File saved to {tmp_path} ({stored.size} bytes)")
+
+    # Reject scanned/image-only or oversized PDFs before storing or queueing anything
+    try:
+        has_text = await has_text_layer(tmp_path)
+    except PDFLimitError as e:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if not has_text:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=400, detail="Could not extract text from the uploaded PDF. Please ensure it is a valid text-based PDF report.")
+
+    # Content-addressed: a re-uploaded file just takes another reference on the same blob
+    pdf_uri = await acquire_blob(db, stored.sha256, tmp_path, stored.size)
+    return stored, pdf_uri
+
+@router.post("/upload", response_model=ReportResponse, responses={202: {"model": ReportJobAccepted}})
 async def upload_report(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    async_mode: bool = Query(False, alias="async"),
     current_user: dict = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    # Save file locally
-    file_path = f"{UPLOAD_DIR}/{current_user['_id']}_{datetime.now().timestamp()}_{file.filename}"
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
-    print(f"File saved to {file_path}")
-        
-    # Extract Text
-    print("Extracting text from PDF...")
-    text = await extract_text_from_pdf(content)
-    print(f"Extracted {len(text)} characters.")
-    if not text.strip():
-        print("Text extraction failed or returned empty string.")
-        raise HTTPException(status_code=400, detail="Could not extract text from the uploaded PDF. Please ensure it is a valid text-based PDF report.")
-    
-    # Analyze with Gemini (pass bytes for native visual/layout analysis)
-    print("Calling Gemini for native PDF analysis...")
-    gemini_result = await analyze_health_report(pdf_bytes=content)
-    print("Gemini analysis complete.")
-    
-    print("Preparing report for DB...")
+    stored, pdf_uri = await _store_upload(file, db)
+
+    if async_mode:
+        job_id = await enqueue_report_job(
+            db,
+            str(current_user["_id"]),
+            pdf_uri,
+            file.filename,
+            upload_date=report_upload_date(),
+            content_sha256=stored.sha256
+        )
+        accepted = ReportJobAccepted(
+            job_id=job_id,
+            status=JOB_QUEUED,
+            status_url=f"{settings.API_V1_STR}/reports/jobs/{job_id}"
+        )
+        return JSONResponse(status_code=202, content=accepted.dict())
+
     try:
-        report_in_db = ReportInDB(
-            user_id=str(current_user["_id"]),
-            extracted_data=gemini_result.get("extracted_data", {}),
-            gemini_analysis=gemini_result.get("analysis"),
-            pdf_path=file_path,
-            upload_date=datetime.utcnow() + timedelta(hours=5, minutes=30) # IST conversion
+        return await process_report(
+            db,
+            str(current_user["_id"]),
+            stored.sha256,
+            original_filename=file.filename,
+            release_on_failure=True
         )
-    except Exception as e:
-        print(f"FAILED to create ReportInDB model: {e}")
-        raise HTTPException(status_code=500, detail=f"Data validation error: {str(e)}")
-    
-    print("Inserting into MongoDB...")
-    new_report = await db.reports.insert_one(report_in_db.dict(by_alias=True, exclude={"id"}))
-    created_report = await db.reports.find_one({"_id": new_report.inserted_id})
-    print("Report saved to DB.")
-    
-    # Update user's last report date and next checkup
-    next_checkup = datetime.utcnow() + timedelta(days=90)
-    await db.users.update_one(
-        {"_id": ObjectId(current_user["_id"])},
-        {"$set": {
-            "last_report_date": datetime.utcnow(),
-            "next_checkup_date": next_checkup
-        }}
+    except ReportProcessingError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+# Streaming uploads keep running when their client goes away; hold a reference until they finish
+_stream_tasks = set()
+
+@router.post("/upload/stream")
+async def upload_report_stream(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """
+    Synchronous upload that reports progress as Server-Sent Events while the
+    report is analyzed: started, extracted, one parameter event per lab value as
+    soon as it parses from Gemini's streamed answer, summary and recommendation
+    events for the analysis fields, then completed with the saved report (or error).
+    The report is saved once, as by /upload, even if the client disconnects.
+    """
+    stored, _ = await _store_upload(file, db)
+    user_id = str(current_user["_id"])
+    filename = file.filename
+    events = asyncio.Queue()
+
+    async def run():
+        try:
+            report = await process_report(
+                db, user_id, stored.sha256, original_filename=filename, on_event=events.put, release_on_failure=True
+            )
+            response = ReportResponse.model_validate(report).model_dump(mode="json", by_alias=True)
+            await events.put({"event": "completed", "report": response})
+        except ReportProcessingError as e:
+            await events.put({"event": "error", "status_code": e.status_code, "detail": e.detail})
+        except Exception:
+            logger.exception("Streaming upload failed")
+            await events.put({"event": "error", "status_code": 500, "detail": "Report processing failed"})
+        finally:
+            await events.put(None)
+
+    task = asyncio.create_task(run())
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+
+    async def body():
+        yield encode_event({"event": "started", "filename": filename, "size": stored.size}, True)
+        while (event := await events.get()) is not None:
+            yield encode_event(event, True)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    
-    created_report["_id"] = str(created_report["_id"])
-    return created_report
 
-@router.get("/", response_model=List[ReportResponse])
-async def list_reports(
+@router.post("/import")
+async def import_reports(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    format: Optional[str] = Query(None, pattern="^(ndjson|sse)$"),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """
+    Bulk import of a ZIP archive and/or several PDFs. Progress is streamed as one
+    event per line (NDJSON), or as Server-Sent Events with format=sse or
+    `Accept: text/event-stream`: started, item (analyzed / saved / failed), completed.
+    """
+    try:
+        staged, errors = await stage_import_files(files)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    sse = format == "sse" or (format is None and "text/event-stream" in request.headers.get("accept", ""))
+    events = run_import(db, str(current_user["_id"]), staged, errors)
+
+    async def body():
+        async for event in events:
+            yield encode_event(event, sse)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job_status(
+    job_id: str,
     current_user: dict = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    reports_cursor = db.reports.find({"user_id": str(current_user["_id"])}).sort("upload_date", -1)
-    reports = await reports_cursor.to_list(length=100)
-    # Convert ObjectId to str
-    for report in reports:
-        report["_id"] = str(report["_id"])
-    return reports
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid ID")
+
+    job = await get_report_job(db, job_id, str(current_user["_id"]))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job["_id"] = str(job["_id"])
+    if job.get("report_id"):
+        report = await db.reports.find_one({"_id": ObjectId(job["report_id"])})
+        if report:
+            report["_id"] = str(report["_id"])
+            job["report"] = report
+    return job
+
+@router.get("/", response_model=List[ReportSummary])
+async def list_reports(
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.REPORTS_PAGE_SIZE, ge=1, le=settings.REPORTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_read_database)
+):
+    """
+    Newest reports first, as summaries (date, type, health score, abnormal count).
+    `fields=` adds more of the stored report, e.g. fields=gemini_analysis.summary.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    user_id = str(current_user["_id"])
+    cache_headers, not_modified = await conditional_get(request, db, user_id)
+    if not_modified:
+        return not_modified
+
+    try:
+        items, next_cursor = await list_report_summaries(
+            db,
+            user_id,
+            limit,
+            cursor=cursor,
+            fields=parse_fields(fields)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {**cache_headers, "X-Next-Cursor": next_cursor} if next_cursor else cache_headers
+    if settings.FAST_JSON_RESPONSES:
+        # Summaries come from our own projection; no need to validate them again
+        return FastJSONResponse([{**SUMMARY_DEFAULTS, **item} for item in items], headers=headers)
+    response.headers.update(headers)
+    return items
 
 @router.get("/{report_id}", response_model=ReportResponse)
 async def get_report(
     report_id: str,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
-    db = Depends(get_database)
+    db = Depends(get_read_database)
 ):
     if not ObjectId.is_valid(report_id):
         raise HTTPException(status_code=400, detail="Invalid ID")
-        
+
+    user_id = str(current_user["_id"])
+    cache_headers, not_modified = await conditional_get(request, db, user_id)
+    if not_modified:
+        return not_modified
+
     report = await db.reports.find_one({
         "_id": ObjectId(report_id),
-        "user_id": str(current_user["_id"])
-    })
+        "user_id": user_id
+    }, REPORT_PROJECTION)
     
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
         
     report["_id"] = str(report["_id"])
+    if settings.FAST_JSON_RESPONSES:
+        # Written through ReportInDB, so it already has the response shape
+        return FastJSONResponse({**REPORT_DEFAULTS, **report}, headers=cache_headers)
+    response.headers.update(cache_headers)
     return report
 
 @router.delete("/{report_id}")
@@ -205,12 +326,68 @@ async def delete_report(
     if not ObjectId.is_valid(report_id):
         raise HTTPException(status_code=400, detail="Invalid ID")
         
-    result = await db.reports.delete_one({
-        "_id": ObjectId(report_id),
-        "user_id": str(current_user["_id"])
-    })
+    report = await db.reports.find_one_and_delete(
+        {"_id": ObjectId(report_id), "user_id": str(current_user["_id"])},
+        projection={"pdf_sha256": 1}
+    )
     
-    if result.deleted_count == 0:
+    if report is None:
         raise HTTPException(status_code=404, detail="Report not found")
-        
+
+    await remove_report_from_trends(db, str(current_user["_id"]), report_id)
+    await release_blob(db, report.get("pdf_sha256"))
+    await bump_data_version(db, str(current_user["_id"]))
     return {"status": "success"}
+
+@router.get("/{report_id}/file")
+async def download_report_file(
+    report_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Streams the original PDF. Supports single-range `Range: bytes=...` requests."""
+    if not ObjectId.is_valid(report_id):
+        raise HTTPException(status_code=400, detail="Invalid ID")
+
+    report = await db.reports.find_one(
+        {"_id": ObjectId(report_id), "user_id": str(current_user["_id"])},
+        {"pdf_sha256": 1, "pdf_path": 1, "original_filename": 1}
+    )
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    storage = get_storage()
+    sha = report.get("pdf_sha256")
+    try:
+        if sha:
+            size = await storage.size(sha)
+            open_range = lambda start, end: storage.open_range(sha, start, end)
+        else:
+            # Reports uploaded before content-addressed storage point at a plain file
+            legacy_path = report.get("pdf_path") or ""
+            if not os.path.isfile(legacy_path):
+                raise BlobNotFound(legacy_path)
+            size = os.path.getsize(legacy_path)
+            open_range = lambda start, end: iter_file_range(legacy_path, start, end)
+    except BlobNotFound:
+        raise HTTPException(status_code=404, detail="Report file not found")
+
+    filename = os.path.basename(report.get("original_filename") or f"report-{report_id}.pdf")
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": _content_disposition(filename),
+    }
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), size)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(open_range(0, size - 1), media_type="application/pdf", headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(open_range(start, end), status_code=206, media_type="application/pdf", headers=headers)
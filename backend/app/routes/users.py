@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from app.core.database import get_database
 from app.routes.auth import get_current_user
 from app.models.user import UserResponse
-from datetime import datetime
+from app.services.dashboard_service import reminder_status
 
 router = APIRouter()
 
@@ -19,14 +19,4 @@ async def get_user_profile(
 async def get_reminder_status(
     current_user: dict = Depends(get_current_user)
 ):
-    next_date = current_user.get("next_checkup_date")
-    days_remaining = None
-    if next_date:
-        delta = next_date - datetime.utcnow()
-        days_remaining = delta.days
-        
-    return {
-        "next_checkup_date": next_date,
-        "days_remaining": days_remaining,
-        "reminder_enabled": True # Default to true for MVP
-    }
+    return reminder_status(current_user)
@@ -0,0 +1,101 @@
+"""
+Index management CLI.
+
+    python -m app.scripts.indexes ensure         # create missing declared indexes
+    python -m app.scripts.indexes report [--json]
+
+The report lists, per collection, declared indexes missing on the server,
+server indexes that are not declared, usage counters from $indexStats (unused
+indexes cost writes for nothing) and the winning plan of each hot query.
+"""
+import argparse
+import asyncio
+import json
+
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.indexes import HOT_QUERIES, INDEX_SPECS, ensure_indexes
+
+
+def _winning_stages(plan: dict) -> list:
+    stages = []
+    while plan:
+        stages.append(plan.get("stage"))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+
+async def index_report(db) -> dict:
+    report = {"collections": {}, "queries": []}
+    existing_collections = set(await db.list_collection_names())
+
+    for collection, models in INDEX_SPECS.items():
+        declared = {model.document["name"] for model in models}
+        entry = {"missing": sorted(declared), "undeclared": [], "usage": {}}
+        if collection in existing_collections:
+            info = await db[collection].index_information()
+            present = set(info) - {"_id_"}
+            entry["missing"] = sorted(declared - present)
+            entry["undeclared"] = sorted(present - declared)
+            async for stat in db[collection].aggregate([{"$indexStats": {}}]):
+                entry["usage"][stat["name"]] = {
+                    "ops": stat["accesses"]["ops"],
+                    "since": stat["accesses"]["since"].isoformat(),
+                }
+            entry["unused"] = sorted(
+                name for name, usage in entry["usage"].items()
+                if usage["ops"] == 0 and name != "_id_"
+            )
+        report["collections"][collection] = entry
+
+    for collection, name, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = _winning_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report["queries"].append({
+            "query": name,
+            "collection": collection,
+            "stages": stages,
+            "collection_scan": "COLLSCAN" in stages,
+        })
+    return report
+
+
+def print_report(report: dict) -> None:
+    for collection, entry in report["collections"].items():
+        print(f"{collection}:")
+        print(f"  missing:    {', '.join(entry['missing']) or '-'}")
+        print(f"  undeclared: {', '.join(entry['undeclared']) or '-'}")
+        print(f"  unused:     {', '.join(entry.get('unused', [])) or '-'}")
+        for name, usage in entry["usage"].items():
+            print(f"    {name}: {usage['ops']} ops since {usage['since']}")
+    print("hot queries:")
+    for query in report["queries"]:
+        flag = "COLLECTION SCAN" if query["collection_scan"] else "ok"
+        print(f"  {query['query']:<18} {' <- '.join(query['stages']):<40} {flag}")
+
+
+async def main(command: str, as_json: bool):
+    await connect_to_mongo()
+    try:
+        db = await get_database()
+        if command == "ensure":
+            created = await ensure_indexes(db)
+            print(json.dumps(created, indent=2))
+            return
+        report = await index_report(db)
+        if as_json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_report(report)
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes")
+    parser.add_argument("command", choices=["report", "ensure"], nargs="?", default="report")
+    parser.add_argument("--json", action="store_true", help="machine readable output")
+    args = parser.parse_args()
+    asyncio.run(main(args.command, args.json))
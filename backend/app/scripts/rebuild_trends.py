@@ -0,0 +1,32 @@
+"""
+Rebuilds the materialized user_trends collection from stored reports.
+Migration 3 does this once for every user at startup; use this to repair
+series by hand.
+
+    python -m app.scripts.rebuild_trends              # every user with reports
+    python -m app.scripts.rebuild_trends --user-id ID # a single user
+"""
+import argparse
+import asyncio
+
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.services.trends_service import rebuild_user_trends
+
+
+async def main(user_id: str = None):
+    await connect_to_mongo()
+    try:
+        db = await get_database()
+        user_ids = [user_id] if user_id else await db.reports.distinct("user_id")
+        for index, uid in enumerate(user_ids, start=1):
+            series = await rebuild_user_trends(db, uid)
+            print(f"[{index}/{len(user_ids)}] user {uid}: {series} series")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild materialized health trends")
+    parser.add_argument("--user-id", help="only rebuild this user")
+    args = parser.parse_args()
+    asyncio.run(main(args.user_id))
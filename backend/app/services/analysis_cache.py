@@ -0,0 +1,156 @@
+import copy
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from pymongo import ASCENDING
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.database import db as mongo
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+COLLECTION = "analysis_cache"
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def cache_key(sha256: str, version: str) -> str:
+    return f"{version}:{sha256}"
+
+
+class AnalysisCache:
+    """
+    Content-addressed cache of Gemini analyses.
+
+    Keyed by the SHA-256 of the uploaded document plus the analysis version
+    (a hash of the prompt and model), so changing either never serves stale
+    results. A small LRU sits in front of the `analysis_cache` collection;
+    Mongo expires entries via a TTL index and is trimmed to a maximum size.
+    """
+
+    def __init__(self):
+        self.memory = TTLCache(settings.ANALYSIS_CACHE_MEMORY_ENTRIES, settings.ANALYSIS_CACHE_TTL_SECONDS)
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.trims = 0
+        self._stores_since_trim = 0
+
+    @property
+    def collection(self):
+        if not settings.ANALYSIS_CACHE_ENABLED or mongo.db is None:
+            return None
+        return mongo.db[COLLECTION]
+
+    async def get(self, sha256: str, version: str) -> Optional[dict]:
+        if not settings.ANALYSIS_CACHE_ENABLED:
+            return None
+        key = cache_key(sha256, version)
+
+        result = self.memory.get(key)
+        if result is not None:
+            self.hits += 1
+            self.memory_hits += 1
+            return copy.deepcopy(result)
+
+        collection = self.collection
+        if collection is not None:
+            now = datetime.utcnow()
+            try:
+                doc = await collection.find_one_and_update(
+                    {"_id": key, "expires_at": {"$gt": now}},
+                    {"$set": {"last_used_at": now}, "$inc": {"hits": 1}},
+                    projection={"result": 1},
+                )
+            except Exception as e:
+                logger.warning(f"Analysis cache lookup failed: {e}")
+                doc = None
+            if doc is not None:
+                self.hits += 1
+                self.memory.set(key, doc["result"])
+                return copy.deepcopy(doc["result"])
+
+        self.misses += 1
+        return None
+
+    async def set(self, sha256: str, version: str, result: dict) -> None:
+        if not settings.ANALYSIS_CACHE_ENABLED:
+            return
+        key = cache_key(sha256, version)
+        self.memory.set(key, copy.deepcopy(result))
+        self.stores += 1
+
+        collection = self.collection
+        if collection is None:
+            return
+        now = datetime.utcnow()
+        try:
+            await collection.replace_one(
+                {"_id": key},
+                {
+                    "sha256": sha256,
+                    "version": version,
+                    "result": result,
+                    "created_at": now,
+                    "last_used_at": now,
+                    "expires_at": now + timedelta(seconds=settings.ANALYSIS_CACHE_TTL_SECONDS),
+                    "hits": 0,
+                },
+                upsert=True,
+            )
+            self._stores_since_trim += 1
+            if self._stores_since_trim >= 100:
+                await self.trim()
+        except Exception as e:
+            logger.warning(f"Analysis cache store failed: {e}")
+
+    async def trim(self) -> int:
+        """Evicts least recently used entries above ANALYSIS_CACHE_MAX_ENTRIES."""
+        self._stores_since_trim = 0
+        collection = self.collection
+        if collection is None:
+            return 0
+        excess = await collection.estimated_document_count() - settings.ANALYSIS_CACHE_MAX_ENTRIES
+        if excess <= 0:
+            return 0
+        cursor = collection.find({}, {"_id": 1}).sort("last_used_at", ASCENDING).limit(excess)
+        ids = [doc["_id"] async for doc in cursor]
+        result = await collection.delete_many({"_id": {"$in": ids}})
+        self.trims += result.deleted_count
+        return result.deleted_count
+
+    async def invalidate(self, keep_versions: Optional[Iterable[str]] = None) -> int:
+        """
+        Drops cached analyses. With `keep_versions`, only entries produced by
+        other prompt/model versions are removed.
+        """
+        self.memory.clear()
+        collection = self.collection
+        if collection is None:
+            return 0
+        query = {"version": {"$nin": list(keep_versions)}} if keep_versions else {}
+        result = await collection.delete_many(query)
+        return result.deleted_count
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.ANALYSIS_CACHE_ENABLED,
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evicted_by_size": self.trims,
+            "memory": self.memory.stats(),
+        }
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,401 @@
+"""
+BMI computation, bulk ingestion and history queries over the bmi_records
+time-series collection.
+
+Bucketed statistics are computed in the database: $dateTrunc groups readings
+per day/week/month, and $setWindowFields compares each bucket's mean with
+the previous one, so a year of daily readings comes back as one small result.
+Bulk imports compute BMI and category for a whole chunk of readings at once
+with NumPy, using the same thresholds as a single calculation.
+"""
+import csv
+import json
+import warnings
+from datetime import datetime, timezone as dt_timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+import numpy as np
+from pymongo.errors import BulkWriteError
+
+from app.core.config import get_settings
+from app.models.bmi import BMIImportResult
+
+settings = get_settings()
+
+BUCKET_UNITS = ("day", "week", "month")
+
+# Upper bounds (exclusive) of each category but the last
+BMI_THRESHOLDS = np.array([18.5, 25.0, 30.0])
+BMI_CATEGORIES = ("Underweight", "Normal weight", "Overweight", "Obese")
+BMI_TIPS = (
+    "Consider a nutrient-rich diet.",
+    "Great job! Keep maintaining your healthy lifestyle.",
+    "Regular exercise can help improve your health.",
+    "Consult a healthcare professional for guidance.",
+)
+
+# Plausible input ranges; readings outside them are rejected as invalid
+HEIGHT_RANGE_CM = (50.0, 280.0)
+WEIGHT_RANGE_KG = (2.0, 500.0)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+MAX_IMPORT_LINE_BYTES = 64 * 1024  # a reading is a few dozen bytes; longer lines are not an export
+_COLUMN_ALIASES = {
+    "created_at": ("created_at", "timestamp", "time", "date", "datetime"),
+    "weight_kg": ("weight_kg", "weight"),
+    "height_cm": ("height_cm", "height"),
+}
+
+
+def compute_bmi(weight_kg: float, height_cm: float) -> float:
+    height_m = height_cm / 100
+    return round(weight_kg / (height_m ** 2), 1)
+
+
+def classify_bmi(bmi: float) -> Tuple[str, str]:
+    """(category, health tip) for one BMI value."""
+    index = int(np.searchsorted(BMI_THRESHOLDS, bmi, side="right"))
+    return BMI_CATEGORIES[index], BMI_TIPS[index]
+
+
+def compute_bmi_array(weight_kg: np.ndarray, height_cm: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized compute_bmi + classify_bmi: (bmi, category index) arrays."""
+    height_m = height_cm / 100
+    bmi = np.round(weight_kg / (height_m ** 2), 1)
+    return bmi, np.searchsorted(BMI_THRESHOLDS, bmi, side="right")
+
+
+def _time_filter(user_id: str, start: Optional[datetime], end: Optional[datetime]) -> dict:
+    query = {"user_id": user_id}
+    created_at = {}
+    if start is not None:
+        created_at["$gte"] = start
+    if end is not None:
+        created_at["$lt"] = end
+    if created_at:
+        query["created_at"] = created_at
+    return query
+
+
+async def latest_bmi(db, user_id: str) -> Optional[dict]:
+    """The newest reading with its healthy weight range, or None."""
+    record = await db.bmi_records.find_one({"user_id": user_id}, sort=[("created_at", -1)])
+    if not record:
+        return None
+
+    height_m = record["height_cm"] / 100
+    min_w = round(18.5 * (height_m ** 2), 1)
+    max_w = round(24.9 * (height_m ** 2), 1)
+    return {
+        "bmi": record["bmi"],
+        "category": record["category"],
+        "height_cm": record["height_cm"],
+        "weight_kg": record["weight_kg"],
+        "recommended_range": f"{min_w} - {max_w} kg",
+        "created_at": record["created_at"]
+    }
+
+
+async def bmi_history(
+    db,
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 1000
+) -> List[dict]:
+    """Raw readings, oldest first."""
+    cursor = db.bmi_records.find(
+        _time_filter(user_id, start, end),
+        {"_id": 0, "created_at": 1, "bmi": 1, "weight_kg": 1, "height_cm": 1, "category": 1}
+    ).sort("created_at", 1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+def _stats(field: str) -> dict:
+    return {
+        "mean": {"$round": [f"$mean_{field}", 1]},
+        "min": f"$min_{field}",
+        "max": f"$max_{field}",
+        "delta": {"$round": [{"$subtract": [f"$mean_{field}", f"$previous_{field}"]}, 1]},
+    }
+
+
+def bmi_buckets_pipeline(
+    user_id: str,
+    unit: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    timezone: str = "UTC"
+) -> List[dict]:
+    bucket = {"date": "$created_at", "unit": unit, "timezone": timezone}
+    if unit == "week":
+        bucket["startOfWeek"] = "monday"
+    return [
+        {"$match": _time_filter(user_id, start, end)},
+        {"$group": {
+            "_id": {"$dateTrunc": bucket},
+            "count": {"$sum": 1},
+            "mean_bmi": {"$avg": "$bmi"},
+            "min_bmi": {"$min": "$bmi"},
+            "max_bmi": {"$max": "$bmi"},
+            "mean_weight": {"$avg": "$weight_kg"},
+            "min_weight": {"$min": "$weight_kg"},
+            "max_weight": {"$max": "$weight_kg"},
+        }},
+        {"$setWindowFields": {
+            "sortBy": {"_id": 1},
+            "output": {
+                "previous_bmi": {"$shift": {"output": "$mean_bmi", "by": -1}},
+                "previous_weight": {"$shift": {"output": "$mean_weight", "by": -1}},
+            },
+        }},
+        {"$project": {
+            "_id": 0,
+            "bucket": "$_id",
+            "count": 1,
+            "bmi": _stats("bmi"),
+            "weight_kg": _stats("weight"),
+        }},
+    ]
+
+
+async def bmi_buckets(
+    db,
+    user_id: str,
+    unit: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    timezone: str = "UTC"
+) -> List[dict]:
+    """Per day/week/month count, mean, min, max and delta of BMI and weight, oldest first."""
+    pipeline = bmi_buckets_pipeline(user_id, unit, start, end, timezone)
+    return await db.bmi_records.aggregate(pipeline).to_list(length=None)
+
+
+# --- Bulk ingestion ---
+
+class BMIImportError(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def _decode_line(line: bytes, first: bool) -> str:
+    if len(line) > MAX_IMPORT_LINE_BYTES:
+        raise BMIImportError(f"Import lines must be at most {MAX_IMPORT_LINE_BYTES} bytes.")
+    try:
+        return line.decode("utf-8-sig" if first else "utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        raise BMIImportError("Import files must be UTF-8 encoded.")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Splits a byte stream (e.g. request.stream()) into decoded lines without buffering it whole.
+    Lines over MAX_IMPORT_LINE_BYTES and non-UTF-8 input raise BMIImportError.
+    """
+    pending = b""
+    first = True
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield _decode_line(line, first)
+            first = False
+        if len(pending) > MAX_IMPORT_LINE_BYTES:
+            # No newline in sight: stop before the partial line grows without bound
+            _decode_line(pending, first)
+    if pending.strip():
+        yield _decode_line(pending, first)
+
+
+def _column(names: List[str], field: str) -> Optional[int]:
+    normalized = [name.strip().lower() for name in names]
+    for alias in _COLUMN_ALIASES[field]:
+        if alias in normalized:
+            return normalized.index(alias)
+    return None
+
+
+async def iter_import_rows(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[str, str, str]]:
+    """
+    Yields raw (timestamp, weight, height) strings per reading; height may be "".
+    CSV needs a header row; NDJSON objects use the same field names.
+    """
+    if fmt == "csv":
+        columns = None
+        async for line in lines:
+            if not line.strip():
+                continue
+            cells = next(csv.reader([line]))
+            if columns is None:
+                columns = tuple(_column(cells, field) for field in ("created_at", "weight_kg", "height_cm"))
+                if columns[0] is None or columns[1] is None:
+                    raise BMIImportError("CSV header needs a timestamp and a weight_kg column.")
+                continue
+            yield tuple(cells[index] if index is not None and index < len(cells) else "" for index in columns)
+    else:
+        async for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield "", "", ""  # counted as invalid
+                continue
+            if not isinstance(record, dict):
+                yield "", "", ""
+                continue
+            values = []
+            for field in ("created_at", "weight_kg", "height_cm"):
+                value = next((record[alias] for alias in _COLUMN_ALIASES[field] if alias in record), "")
+                values.append("" if value is None else str(value))
+            yield tuple(values)
+
+
+def _parse_floats(values: List[str]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        pass
+    parsed = np.empty(len(values), dtype=np.float64)
+    for index, value in enumerate(values):
+        try:
+            parsed[index] = float(value)
+        except ValueError:
+            parsed[index] = np.nan
+    return parsed
+
+
+def _parse_timestamp(value: str) -> np.datetime64:
+    value = value.strip()
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            moment = datetime.fromtimestamp(float(value), dt_timezone.utc)  # epoch seconds
+        except (ValueError, OverflowError, OSError):
+            return np.datetime64("NaT")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return np.datetime64(moment, "ms")
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _parse_timestamps(values: List[str]) -> np.ndarray:
+    """Naive UTC datetime64[ms]; NaT where unparseable. Plain ISO strings take the fast path."""
+    if any(_is_number(value) for value in values):
+        # NumPy reads digit-only strings as years ("1700000000" -> year 1700000000), not epoch seconds
+        return np.array([_parse_timestamp(value) for value in values], dtype="datetime64[ms]")
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")  # time zone suffixes: convert them properly below
+            return np.array(values, dtype="datetime64[ms]")
+    except (ValueError, UserWarning, DeprecationWarning):
+        return np.array([_parse_timestamp(value) for value in values], dtype="datetime64[ms]")
+
+
+async def _existing_timestamps(db, user_id: str, first: np.datetime64, last: np.datetime64) -> np.ndarray:
+    cursor = db.bmi_records.find(
+        {"user_id": user_id, "created_at": {"$gte": first.tolist(), "$lte": last.tolist()}},
+        {"_id": 0, "created_at": 1}
+    )
+    stored = [record["created_at"] async for record in cursor]
+    return np.array(stored, dtype="datetime64[ms]").astype(np.int64)
+
+
+async def _ingest_chunk(
+    db,
+    user_id: str,
+    rows: List[Tuple[str, str, str]],
+    default_height: Optional[float],
+    result: BMIImportResult
+) -> None:
+    timestamps_raw, weights_raw, heights_raw = zip(*rows)
+    created_at = _parse_timestamps(list(timestamps_raw))
+    weight = _parse_floats(list(weights_raw))
+    height = _parse_floats([value or "nan" for value in heights_raw])
+    if default_height is not None:
+        height = np.where(np.isnan(height), default_height, height)
+
+    valid = (
+        ~np.isnat(created_at)
+        & (weight >= WEIGHT_RANGE_KG[0]) & (weight <= WEIGHT_RANGE_KG[1])
+        & (height >= HEIGHT_RANGE_CM[0]) & (height <= HEIGHT_RANGE_CM[1])
+    )
+    result.invalid += int(np.count_nonzero(~valid))
+    created_at, weight, height = created_at[valid], weight[valid], height[valid]
+    if not len(created_at):
+        return
+
+    # One reading per timestamp: first occurrence in this chunk, unless already stored
+    # (which includes earlier chunks of this import)
+    keys = created_at.astype(np.int64)
+    _, first_index = np.unique(keys, return_index=True)
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[first_index] = True
+    if keep.any():
+        stored = await _existing_timestamps(db, user_id, created_at[keep].min(), created_at[keep].max())
+        keep &= ~np.isin(keys, stored)
+    result.duplicates += int(len(keys) - np.count_nonzero(keep))
+    created_at, weight, height, keys = created_at[keep], weight[keep], height[keep], keys[keep]
+    if not len(keys):
+        return
+
+    bmi, category = compute_bmi_array(weight, height)
+    documents = [
+        {
+            "user_id": user_id,
+            "height_cm": h,
+            "weight_kg": w,
+            "bmi": b,
+            "category": BMI_CATEGORIES[c],
+            "created_at": t,
+        }
+        for h, w, b, c, t in zip(height.tolist(), weight.tolist(), bmi.tolist(), category.tolist(), created_at.tolist())
+    ]
+    try:
+        inserted = await db.bmi_records.insert_many(documents, ordered=False)
+        result.inserted += len(inserted.inserted_ids)
+    except BulkWriteError as e:
+        result.inserted += e.details.get("nInserted", 0)
+        result.invalid += len(e.details.get("writeErrors", []))
+
+
+async def ingest_bmi_stream(
+    db,
+    user_id: str,
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    default_height: Optional[float] = None
+) -> BMIImportResult:
+    """
+    Imports readings from a CSV or NDJSON byte stream. Rows are processed
+    BMI_IMPORT_CHUNK_ROWS at a time (parse, validate, dedupe, compute, one
+    unordered insert_many), so memory stays bounded whatever the upload size.
+    Rows without a height use default_height.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise BMIImportError(f"Unsupported format {fmt!r}; use one of {', '.join(IMPORT_FORMATS)}.")
+    result = BMIImportResult()
+    rows = []
+    async for row in iter_import_rows(iter_lines(chunks), fmt):
+        if result.received >= settings.BMI_IMPORT_MAX_ROWS:
+            result.truncated = True
+            break
+        result.received += 1
+        rows.append(row)
+        if len(rows) >= settings.BMI_IMPORT_CHUNK_ROWS:
+            await _ingest_chunk(db, user_id, rows, default_height, result)
+            rows = []
+    if rows:
+        await _ingest_chunk(db, user_id, rows, default_height, result)
+    return result
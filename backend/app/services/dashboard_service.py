@@ -0,0 +1,76 @@
+"""
+Everything the dashboard renders, in one request.
+
+The sections come from the same service functions as their standalone
+endpoints (/users/profile, /users/reminders/status, /bmi/latest, /reports/,
+/reports/trends). Their Mongo reads run concurrently, so the response takes
+about as long as the slowest read. Profile and reminder come from the
+already-authenticated user and read nothing.
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from app.models.user import UserResponse
+from app.services.bmi_service import latest_bmi
+from app.services.report_service import list_report_summaries, report_stats
+from app.services.trends_service import get_user_trends
+
+SECTIONS = ("profile", "reminder", "bmi", "reports", "trends")
+
+
+def parse_sections(include: str) -> List[str]:
+    """Validates a comma separated include= value; empty means every section."""
+    requested = [section.strip() for section in (include or "").split(",") if section.strip()]
+    unknown = sorted(set(requested) - set(SECTIONS))
+    if unknown:
+        raise ValueError(f"Unknown dashboard sections: {', '.join(unknown)}. Use any of: {', '.join(SECTIONS)}.")
+    return [section for section in SECTIONS if section in requested] if requested else list(SECTIONS)
+
+
+def reminder_status(user: dict) -> dict:
+    next_date = user.get("next_checkup_date")
+    days_remaining = None
+    if next_date:
+        delta = next_date - datetime.utcnow()
+        days_remaining = delta.days
+
+    return {
+        "next_checkup_date": next_date,
+        "days_remaining": days_remaining,
+        "reminder_enabled": True  # Default to true for MVP
+    }
+
+
+async def _reports_section(db, user_id: str, limit: int) -> dict:
+    (items, _), stats = await asyncio.gather(
+        list_report_summaries(db, user_id, limit),
+        report_stats(db, user_id),
+    )
+    return {"items": items, **stats}
+
+
+async def build_dashboard(
+    db,
+    user: dict,
+    sections: Iterable[str],
+    reports_limit: int,
+    sparkline_points: int
+) -> Dict[str, object]:
+    user_id = str(user["_id"])
+    payload = {}
+    if "profile" in sections:
+        payload["profile"] = UserResponse.model_validate(user).model_dump(by_alias=True)
+    if "reminder" in sections:
+        payload["reminder"] = reminder_status(user)
+
+    reads = {}
+    if "bmi" in sections:
+        reads["bmi"] = latest_bmi(db, user_id)
+    if "reports" in sections:
+        reads["reports"] = _reports_section(db, user_id, reports_limit)
+    if "trends" in sections:
+        reads["trends"] = get_user_trends(db, user_id, max_points=sparkline_points)
+    results = await asyncio.gather(*reads.values())
+    payload.update(zip(reads.keys(), results))
+    return payload
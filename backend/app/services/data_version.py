@@ -0,0 +1,94 @@
+"""
+Per-user data version for conditional GETs.
+
+Every write that changes what a user's read endpoints return (report upload,
+import or deletion, BMI readings) increments `data_version` on the user
+document and stamps `data_updated_at`. Reads derive a strong ETag from the
+version and the request URL, so a revalidating client (If-None-Match /
+If-Modified-Since) gets a 304 after one `_id` lookup on users, before any
+report, trends or BMI document is read.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import Request, Response
+
+from app.core.config import get_settings
+from app.core.database import SessionDatabase
+
+settings = get_settings()
+
+
+class CacheValidators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+    def headers(self) -> dict:
+        # no-cache: browsers keep the response but revalidate it on every use
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+
+def data_version_update() -> dict:
+    """Update operators that bump the version; merge them into any other write on the user."""
+    return {"$inc": {"data_version": 1}, "$currentDate": {"data_updated_at": True}}
+
+
+async def bump_data_version(db, user_id: str) -> None:
+    await db.users.update_one({"_id": ObjectId(user_id)}, data_version_update())
+
+
+async def get_validators(request: Request, db, user_id: str) -> CacheValidators:
+    if isinstance(db, SessionDatabase) and db.user_version is not None:
+        user = db.user_version  # already read on the primary when the read session started
+    else:
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, {"data_version": 1, "data_updated_at": 1})
+    version = (user or {}).get("data_version", 0)
+    updated_at = (user or {}).get("data_updated_at")
+    # The URL (path and query) selects the representation; the encoder setting changes its bytes
+    key = f"{user_id}:{version}:{request.url.path}?{request.url.query}:{int(settings.FAST_JSON_RESPONSES)}"
+    etag = '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+    if updated_at is not None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+    return CacheValidators(etag, updated_at)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip() for tag in header.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def is_not_modified(request: Request, validators: CacheValidators) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, validators.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return validators.last_modified <= since
+    return False
+
+
+async def conditional_get(request: Request, db, user_id: str) -> Tuple[dict, Optional[Response]]:
+    """
+    Returns the validator headers for the response and, when the client's copy
+    is current, the 304 response to send instead of reading any data.
+    """
+    validators = await get_validators(request, db, user_id)
+    headers = validators.headers()
+    if is_not_modified(request, validators):
+        return headers, Response(status_code=304, headers=headers)
+    return headers, None
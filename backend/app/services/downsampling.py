@@ -0,0 +1,46 @@
+"""
+Shape-preserving downsampling for chart series.
+
+Largest-Triangle-Three-Buckets (Steinarsson, 2013): the first and last points
+are kept, the rest are split into equal buckets, and from each bucket the
+point forming the largest triangle with the previously kept point and the
+next bucket's average is kept. Peaks and dips survive, unlike striding.
+"""
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points to keep so that at most `threshold` remain.
+    x must be sorted ascending. Bucket averages are computed in one pass with
+    np.add.reduceat; only the bucket walk itself is a Python loop (threshold
+    iterations, independent of the series length).
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold <= 2:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+
+    # threshold - 2 buckets over the interior points 1 .. n-2; edges are strictly
+    # increasing because each bucket holds at least one point when threshold < n
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # The "next" point of bucket i is bucket i+1's average; the last bucket looks at the last point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        areas = np.abs(
+            (x[a] - next_x[i]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (next_y[i] - y[a])
+        )
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
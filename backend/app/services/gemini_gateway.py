@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, AsyncIterator, Callable, Optional
+
+import httpx
+from google.genai import errors
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: timeouts, rate limiting and upstream trouble
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling Gemini while the circuit breaker is open."""
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(exc, errors.APIError):
+        return exc.code in TRANSIENT_STATUS_CODES
+    return False
+
+
+class CircuitBreaker:
+    """
+    Classic closed/open/half-open breaker. After `failure_threshold` consecutive
+    transient failures it opens and rejects calls for `reset_timeout` seconds,
+    then lets a single probe call through to decide whether to close again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def abandon(self) -> None:
+        """The call ended without an answer either way (cancelled); a new probe may go out."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning("Gemini circuit breaker opened")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+        }
+
+
+class GeminiGateway:
+    """
+    Non-blocking access to Gemini through the SDK's async surface (`client.aio`).
+
+    Bounds in-flight calls with a semaphore, applies a per-attempt timeout,
+    retries transient errors with full-jitter exponential backoff and trips a
+    circuit breaker when the upstream keeps failing.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        max_concurrency: int,
+        timeout: float,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+        breaker: CircuitBreaker,
+    ):
+        self._client_factory = client_factory
+        self._client = None
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @property
+    def client(self):
+        # Built on first use, so importing the app does not require Gemini credentials
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def generate_content(self, **kwargs):
+        client = self.client
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise CircuitOpenError("Gemini circuit breaker is open")
+
+            try:
+                async with self._semaphore:
+                    self.in_flight += 1
+                    self.calls += 1
+                    try:
+                        response = await asyncio.wait_for(
+                            client.aio.models.generate_content(**kwargs),
+                            timeout=self.timeout
+                        )
+                    except Exception as e:
+                        last_error = e
+                    finally:
+                        self.in_flight -= 1
+            except BaseException:
+                # Cancelled (e.g. the client disconnected): without this a half-open
+                # breaker would wait forever for the probe's verdict
+                self.breaker.abandon()
+                raise
+
+            if last_error is None:
+                self.breaker.record_success()
+                return response
+
+            if not is_transient_error(last_error):
+                # Bad requests are our problem, not an unhealthy upstream
+                self.breaker.record_success()
+                self.failures += 1
+                raise last_error
+
+            self.breaker.record_failure()
+            if attempt == self.max_retries:
+                break
+            self.retries += 1
+            delay = self._backoff(attempt)
+            logger.warning(f"Transient Gemini error ({last_error!r}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            last_error = None
+
+        self.failures += 1
+        raise last_error
+
+    async def generate_content_stream(self, **kwargs) -> AsyncIterator[Any]:
+        """
+        Streaming generate_content. Failures before the first chunk are retried
+        like generate_content; once chunks have been yielded the error is
+        raised to the caller. The timeout applies to the wait for each chunk,
+        and the call holds its concurrency slot until the stream ends.
+        """
+        client = self.client
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise CircuitOpenError("Gemini circuit breaker is open")
+
+            received = False
+            try:
+                async with self._semaphore:
+                    self.in_flight += 1
+                    self.calls += 1
+                    try:
+                        stream = await asyncio.wait_for(
+                            client.aio.models.generate_content_stream(**kwargs),
+                            timeout=self.timeout
+                        )
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(stream.__anext__(), timeout=self.timeout)
+                            except StopAsyncIteration:
+                                break
+                            received = True
+                            yield chunk
+                    except Exception as e:
+                        last_error = e
+                    else:
+                        last_error = None
+                    finally:
+                        self.in_flight -= 1
+            except BaseException:
+                # Cancelled, or closed early by the consumer (GeneratorExit)
+                self.breaker.abandon()
+                raise
+
+            if last_error is None:
+                self.breaker.record_success()
+                return
+
+            transient = is_transient_error(last_error)
+            if transient:
+                self.breaker.record_failure()
+            else:
+                # Bad requests are our problem, not an unhealthy upstream
+                self.breaker.record_success()
+            if received or not transient or attempt == self.max_retries:
+                self.failures += 1
+                raise last_error
+            self.retries += 1
+            delay = self._backoff(attempt)
+            logger.warning(f"Transient Gemini error ({last_error!r}), retrying stream in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected_by_breaker": self.rejected,
+            "breaker": self.breaker.stats(),
+        }
@@ -1,68 +1,69 @@
 import os
+import time
+import hashlib
+import logging
 from google import genai
 from google.genai import types
 import json
+from contextlib import aclosing
+from typing import Awaitable, Callable, Optional
 from app.core.config import get_settings
+from app.core.metrics import span
 from app.models.report import GeminiAnalysis, ExtractedData
+from app.services.analysis_cache import analysis_cache, content_hash
+from app.services.json_stream import JSONStreamError, MemberStream
+from app.services.parameter_registry import annotate_extracted_data, prompt_alias_lines, prompt_reference_lines
+from app.services.upload_service import hash_stored_file, read_stored_file
+from app.services.gemini_gateway import CircuitBreaker, CircuitOpenError, GeminiGateway
+from app.services.page_selection import MODE_NATIVE, MODE_PAGES, MODE_TEXT, mode_metrics
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+EventCallback = Callable[[dict], Awaitable[None]]
+
+# Analysis fields streamed as "summary" events; the rest are "recommendation" events
+SUMMARY_FIELDS = {"summary", "health_score", "abnormal_parameters", "doctor_consultation"}
+
+
+def create_client() -> genai.Client:
+    """Gemini client (GEMINI_BASE_URL points it at a local fake server in tests/benchmarks)."""
+    if not settings.GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+    http_options = types.HttpOptions(base_url=settings.GEMINI_BASE_URL) if settings.GEMINI_BASE_URL else None
+    return genai.Client(api_key=settings.GEMINI_API_KEY, http_options=http_options)
+
 
-# Initialize Gemini Client
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
 model_id = "models/gemini-flash-latest" # Stable alias for Gemini 1.5 Flash
 
+gateway = GeminiGateway(
+    create_client,
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    timeout=settings.GEMINI_TIMEOUT_SECONDS,
+    max_retries=settings.GEMINI_MAX_RETRIES,
+    base_delay=settings.GEMINI_RETRY_BASE_DELAY,
+    max_delay=settings.GEMINI_RETRY_MAX_DELAY,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.GEMINI_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.GEMINI_BREAKER_RESET_SECONDS
+    )
+)
 
-async def analyze_health_report(extracted_text: str = None, pdf_bytes: bytes = None) -> dict:
-    """
-    Analyzes health report using Gemini API.
-    Can accept extracted text OR raw PDF bytes for native visual analysis.
-    """
-    
-    # Base prompt focusing on medical logic
-    base_prompt = """
+
+# Base prompt focusing on medical logic
+# The alias and reference range lists come from app/services/parameter_registry.py
+base_prompt = """
     You are a professional health advisor. Analyze the following medical lab report.
     
     2. PARAMETER NORMALIZATION (CRITICAL):
        Medical reports use many different names for the same thing. You MUST map what you find to these EXACT "Standard Keys" if they match:
-       - "Hemoglobin": (Hb, Haemoglobin, Hgb)
-       - "RBC Count": (Red Blood Cell Count, RBCs)
-       - "WBC Count": (White Blood Cell Count, WBCs, Leucocytes)
-       - "Platelet Count": (Platelets, PLT)
-       - "Fasting Blood Sugar": (Fasting Glucose, Glucose Fasting, BFS)
-       - "Random Blood Sugar": (Random Glucose, RBS)
-       - "HbA1c": (Glycated Hemoglobin)
-       - "Total Cholesterol": (Cholesterol Total)
-       - "HDL Cholesterol": (HDL, Good Cholesterol)
-       - "LDL Cholesterol": (LDL, Bad Cholesterol)
-       - "Triglycerides": (TGL, TRIG)
-       - "Vitamin D": (Vit D, 25-OH Vitamin D)
-       - "Vitamin B12": (Vit B12, Cobalamin)
-       - "TSH": (Thyroid Stimulating Hormone)
-       - "Creatinine": (Serum Creatinine)
-       - "Uric Acid": (S. Uric Acid)
-       - "SGPT": (ALT, Alanine Aminotransferase)
-       - "SGOT": (AST, Aspartate Aminotransferase)
-       - "Bilirubin Total": (Total Bilirubin)
+{parameter_aliases}
        
     3. REFERENCE RANGE EXTRACTION (CRITICAL):
        For EVERY parameter you extract, you MUST provide a reference_range field.
        - FIRST: Look for the 'Reference Range', 'Normal Range', or 'Biological Reference Interval' in the report document itself.
        - IF NOT FOUND in document: Use standard Indian medical reference ranges:
-         * Hemoglobin: "13-17" for men, "12-15" for women (use "12-17" if gender unknown)
-         * Fasting Blood Sugar: "70-100"
-         * Random Blood Sugar: "70-140"
-         * HbA1c: "4-5.6"
-         * Total Cholesterol: "125-200"
-         * LDL Cholesterol: "0-100"
-         * HDL Cholesterol: "40-60"
-         * Triglycerides: "0-150"
-         * Vitamin D: "30-100"
-         * Vitamin B12: "200-900"
-         * TSH: "0.5-5"
-         * Creatinine: "0.6-1.2"
-         * Uric Acid: "3.5-7.2"
-         * SGPT: "0-40"
-         * SGOT: "0-40"
+{reference_ranges}
        - For any other parameter not listed above, use your medical knowledge to provide appropriate standard ranges.
        - IMPORTANT: The reference_range should be a string in format "min-max" (e.g., "13-17"), without units.
        
@@ -92,80 +93,255 @@ async def analyze_health_report(extracted_text: str = None, pdf_bytes: bytes = N
             "doctor_consultation": true/false
         }
     }
+    """.replace("{parameter_aliases}", prompt_alias_lines()).replace("{reference_ranges}", prompt_reference_lines())
+
+# Narrative-only prompt for values already extracted by the local lab parser
+advice_prompt = """
+    You are a professional health advisor. The following lab values were already extracted
+    from a medical lab report, each with its unit and reference range, as JSON.
+    Do not re-extract or change them. Compare them against their reference ranges and
+    provide dietary and lifestyle advice based on the results.
+
+    OUTPUT FORMAT:
+    You MUST return a JSON object with this EXACT structure:
+    {
+        "analysis": {
+            "summary": "brief overview of health status",
+            "health_score": 85,
+            "abnormal_parameters": ["param1", "param2"],
+            "dietary_suggestions": ["suggestion1", "suggestion2"],
+            "foods_to_include": ["food1", "food2"],
+            "foods_to_avoid": ["food1", "food2"],
+            "lifestyle_tips": ["tip1", "tip2"],
+            "doctor_consultation": true/false
+        }
+    }
+    """
+
+# Bumps whenever the prompt or model changes, so cached analyses from an older
+# prompt/model are never served (see app/services/analysis_cache.py)
+ANALYSIS_VERSION = hashlib.sha256(f"{model_id}\n{base_prompt}".encode("utf-8")).hexdigest()[:16]
+ADVICE_VERSION = hashlib.sha256(f"{model_id}\n{advice_prompt}".encode("utf-8")).hexdigest()[:16]
+# Every version the cache currently serves; entries of any other version are stale
+LIVE_VERSIONS = (ANALYSIS_VERSION, ADVICE_VERSION)
+
+
+def fallback_analysis(summary: str) -> dict:
+    # Valid structure that matches GeminiAnalysis model
+    return {
+        "extracted_data": {},
+        "analysis": {
+            "summary": summary,
+            "health_score": 0,
+            "abnormal_parameters": [],
+            "dietary_suggestions": [],
+            "foods_to_include": [],
+            "foods_to_avoid": [],
+            "lifestyle_tips": [],
+            "doctor_consultation": True
+        }
+    }
+
+
+async def analyze_health_report(
+    extracted_text: str = None,
+    pdf_bytes: bytes = None,
+    pdf_path: str = None,
+    content_sha: str = None,
+    original_bytes: int = None,
+    on_event: Optional[EventCallback] = None
+) -> dict:
     """
+    Analyzes health report using Gemini API.
+    Can accept extracted text OR raw PDF bytes (or the path of a stored PDF) for native visual analysis.
+    Successful analyses are cached by content hash, so re-uploads skip Gemini.
+    Pass content_sha when the hash is already known (uploads hash while streaming).
+    original_bytes is the size of the uploaded PDF when a pruned input is sent, for mode metrics.
 
+    With on_event, Gemini's answer is streamed and each extracted parameter and
+    analysis field is passed to it as soon as it parses (see member_event).
+    The returned result is validated as a whole, as without streaming.
+    """
+    if content_sha is None:
+        if pdf_path:
+            content_sha = await hash_stored_file(pdf_path)
+        else:
+            content_sha = content_hash(pdf_bytes if pdf_bytes else (extracted_text or "").encode("utf-8"))
+    cached = await analysis_cache.get(content_sha, ANALYSIS_VERSION)
+    if cached is not None:
+        logger.info("Gemini analysis served from cache")
+        if on_event is not None:
+            await replay_events(cached, on_event)
+        return cached
+
+    if pdf_path and not pdf_bytes:
+        # Only read the file on a cache miss; the SDK needs the bytes in memory
+        pdf_bytes = await read_stored_file(pdf_path)
+
+    started = time.perf_counter()
+    with span("gemini.analyze"):
+        if on_event is not None:
+            data, ok = await _stream_analysis(extracted_text, pdf_bytes, on_event)
+        else:
+            data, ok = await _generate_analysis(extracted_text, pdf_bytes)
+    if ok:
+        if pdf_bytes:
+            sent_bytes = len(pdf_bytes)
+            mode = MODE_NATIVE if original_bytes is None else MODE_PAGES
+        else:
+            sent_bytes = len((extracted_text or "").encode("utf-8"))
+            mode = MODE_TEXT
+        mode_metrics.record(mode, original_bytes or sent_bytes, sent_bytes, time.perf_counter() - started)
+        await analysis_cache.set(content_sha, ANALYSIS_VERSION, data)
+    return data
+
+
+async def advise_on_lab_values(extracted_data: dict, abnormal_parameters: list) -> dict:
+    """
+    Narrative analysis for values the local lab parser already extracted, so
+    Gemini only writes advice. Cached by the values themselves. Returns None
+    when Gemini is unavailable; the caller then uses its local summary.
+    """
+    values = json.dumps(
+        {
+            name: {key: entry.get(key) for key in ("value", "unit", "reference_range")}
+            for name, entry in extracted_data.items()
+        },
+        sort_keys=True
+    )
+    values_sha = content_hash(values.encode("utf-8"))
+    cached = await analysis_cache.get(values_sha, ADVICE_VERSION)
+    if cached is None:
+        with span("gemini.advise"):
+            data, ok = await _generate_analysis(values, prompt=advice_prompt)
+        if not ok:
+            return None
+        cached = data["analysis"]
+        await analysis_cache.set(values_sha, ADVICE_VERSION, cached)
+    # Abnormal flags are computed locally from the same values and ranges
+    cached["abnormal_parameters"] = abnormal_parameters
+    return cached
+
+
+def _contents(extracted_text: str, pdf_bytes: bytes, prompt: str):
     if pdf_bytes:
         # Use native PDF processing for better layout/table understanding
         contents = [
-            base_prompt,
+            prompt,
             types.Part.from_bytes(data=pdf_bytes, mime_type='application/pdf')
         ]
     else:
         # Fallback to text if no bytes provided
-        contents = f"{base_prompt}\n\nREPORT TEXT:\n{extracted_text}"
-    
+        contents = f"{prompt}\n\nREPORT TEXT:\n{extracted_text}"
+    return contents
+
+
+async def _generate_analysis(extracted_text: str = None, pdf_bytes: bytes = None, prompt: str = base_prompt) -> tuple:
+    """
+    Calls Gemini and validates its output.
+    Returns (result, ok) where ok is False when the fallback dict was used.
+    """
     try:
-        response = client.models.generate_content(
+        response = await gateway.generate_content(
             model=model_id,
-            contents=contents,
+            contents=_contents(extracted_text, pdf_bytes, prompt),
             config={
                 'response_mime_type': 'application/json',
             }
         )
+    except CircuitOpenError:
+        logger.warning("Gemini circuit breaker open, returning fallback analysis")
+        return fallback_analysis("Error: AI analysis service is temporarily degraded. Please try again later."), False
     except Exception as e:
-        print(f"Gemini API Call failed: {e}")
-        return {
-            "extracted_data": {},
-            "analysis": {
-                "summary": "Error: AI analysis service is currently unavailable.",
-                "health_score": 0,
-                "abnormal_parameters": [],
-                "dietary_suggestions": [],
-                "foods_to_include": [],
-                "foods_to_avoid": [],
-                "lifestyle_tips": [],
-                "doctor_consultation": True
-            }
-        }
+        logger.error(f"Gemini API call failed: {e}")
+        return fallback_analysis("Error: AI analysis service is currently unavailable."), False
     
     # The new SDK with response_mime_type returns valid JSON in response.text
     try:
         data = json.loads(response.text)
-        
+    except Exception as e:
+        logger.error(f"Error parsing Gemini response: {e}")
+        return fallback_analysis("Error analyzing report content. The AI output was not in the expected format."), False
+    return _validate_analysis(data)
+
+
+def _validate_analysis(data: dict) -> tuple:
+    try:
         # Validate the analysis part using our Pydantic model
         if "analysis" in data:
-            print("Validating analysis with GeminiAnalysis model...")
             # This ensures the AI output matches our expected schema for storage
             data["analysis"] = GeminiAnalysis(**data["analysis"]).dict()
-            print("Analysis validation successful.")
             
         if "extracted_data" in data:
-            print("Validating extracted_data...")
             # Ensure it's a dict
             if not isinstance(data["extracted_data"], dict):
-                print(f"Warning: extracted_data is not a dict, it is {type(data['extracted_data'])}")
+                logger.warning(f"extracted_data is not a dict, it is {type(data['extracted_data'])}")
                 data["extracted_data"] = {}
             else:
                 # Use our model to ensure consistency
                 validated_data = ExtractedData(data=data["extracted_data"])
-                data["extracted_data"] = validated_data.dict().get("data", {})
-                print("Extracted data validation successful.")
-        return data
+                data["extracted_data"] = annotate_extracted_data(validated_data.dict().get("data", {}))
+        return data, "analysis" in data
     except Exception as e:
-        print(f"Error parsing/validating Gemini response: {e}")
+        logger.error(f"Error parsing/validating Gemini response: {e}")
         # Fallback to a valid structure that matches GeminiAnalysis model
-        return {
-            "extracted_data": {},
-            "analysis": {
-                "summary": "Error analyzing report content. The AI output was not in the expected format.",
-                "health_score": 0,
-                "abnormal_parameters": [],
-                "dietary_suggestions": [],
-                "foods_to_include": [],
-                "foods_to_avoid": [],
-                "lifestyle_tips": [],
-                "doctor_consultation": True
-            }
-        }
+        return fallback_analysis("Error analyzing report content. The AI output was not in the expected format."), False
+
+
+def member_event(path: tuple, value) -> Optional[dict]:
+    """The event for one streamed member of the answer, or None for members that are not shown."""
+    if len(path) != 2:
+        return None
+    section, name = path
+    if section == "extracted_data" and isinstance(value, dict):
+        return {"event": "parameter", "name": name, "value": annotate_extracted_data({name: value})[name]}
+    if section == "analysis":
+        return {"event": "summary" if name in SUMMARY_FIELDS else "recommendation", "field": name, "value": value}
+    return None
+
+
+async def replay_events(data: dict, on_event: EventCallback) -> None:
+    """Sends the events of an analysis that was not streamed (cached or parsed locally)."""
+    for section in ("extracted_data", "analysis"):
+        for name, value in (data.get(section) or {}).items():
+            event = member_event((section, name), value)
+            if event is not None:
+                await on_event(event)
+
 
-print("Gemini key loaded:", bool(settings.GEMINI_API_KEY))
+async def _stream_analysis(extracted_text: str, pdf_bytes: bytes, on_event: EventCallback) -> tuple:
+    """
+    _generate_analysis over Gemini's streaming API: the answer is parsed as it
+    arrives and only the parsed members are kept, never the whole text.
+    """
+    parser = MemberStream()
+    data = {}
+    try:
+        # aclosing: a parse error must end the stream and free its concurrency slot right away
+        async with aclosing(gateway.generate_content_stream(
+            model=model_id,
+            contents=_contents(extracted_text, pdf_bytes, base_prompt),
+            config={
+                'response_mime_type': 'application/json',
+            }
+        )) as chunks:
+            async for chunk in chunks:
+                for path, value in parser.feed(chunk.text or ""):
+                    if len(path) == 1:
+                        data[path[0]] = value
+                    else:
+                        data.setdefault(path[0], {})[path[1]] = value
+                    event = member_event(path, value)
+                    if event is not None:
+                        await on_event(event)
+        parser.close()
+    except CircuitOpenError:
+        logger.warning("Gemini circuit breaker open, returning fallback analysis")
+        return fallback_analysis("Error: AI analysis service is temporarily degraded. Please try again later."), False
+    except JSONStreamError as e:
+        logger.error(f"Error parsing streamed Gemini response: {e}")
+        return fallback_analysis("Error analyzing report content. The AI output was not in the expected format."), False
+    except Exception as e:
+        logger.error(f"Gemini API call failed: {e}")
+        return fallback_analysis("Error: AI analysis service is currently unavailable."), False
+    return _validate_analysis(data)
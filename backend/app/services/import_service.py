@@ -0,0 +1,268 @@
+"""
+Bulk report import: a ZIP archive or a multipart batch of PDFs in one request.
+
+Files are staged to UPLOAD_TMP_DIR first (hashed and size-checked like single
+uploads), then analyzed IMPORT_CONCURRENCY at a time. Finished reports are
+written with insert_many in batches of IMPORT_INSERT_BATCH, and the user's
+checkup dates are updated once at the end. run_import yields one event per
+step so the route can stream progress as NDJSON or Server-Sent Events.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+import zipfile
+from typing import AsyncIterator, List, NamedTuple, Tuple
+
+from fastapi import UploadFile
+
+from app.core.config import get_settings
+from app.models.report import ReportInDB
+from app.services.pdf_service import PDFLimitError, has_text_layer
+from app.services.report_service import (
+    ReportProcessingError,
+    analyze_report_content,
+    build_report,
+    save_reports,
+    update_user_checkup,
+)
+from app.services.storage import acquire_blob, get_storage, release_blob
+from app.services.upload_service import PDF_MAGIC, UploadRejected, remove_quietly, stream_upload_to_disk
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+
+class StagedFile(NamedTuple):
+    index: int
+    filename: str
+    path: str
+    size: int
+    sha256: str
+
+
+def _is_zip(upload: UploadFile) -> bool:
+    return upload.content_type in ZIP_CONTENT_TYPES or (upload.filename or "").lower().endswith(".zip")
+
+
+def _failed(index: int, filename: str, error: str) -> dict:
+    return {"event": "item", "index": index, "filename": filename, "status": "failed", "error": error}
+
+
+def _extract_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Tuple[str, int, str]:
+    """Copies one archive member to a temp file, hashing it and enforcing PDF_MAX_BYTES as it goes."""
+    if info.file_size > settings.PDF_MAX_BYTES:
+        raise UploadRejected(f"File is larger than {settings.PDF_MAX_BYTES // (1024 * 1024)} MB.", status_code=413)
+    dest_path = os.path.join(settings.UPLOAD_TMP_DIR, f"{uuid.uuid4().hex}.pdf")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with archive.open(info) as src, open(dest_path, "wb") as out:
+            while True:
+                chunk = src.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0 and PDF_MAGIC not in chunk[:1024]:
+                    raise UploadRejected("File is not a PDF.", status_code=415)
+                size += len(chunk)
+                # The header's file_size cannot be trusted (zip bombs), so check what was read
+                if size > settings.PDF_MAX_BYTES:
+                    raise UploadRejected(f"File is larger than {settings.PDF_MAX_BYTES // (1024 * 1024)} MB.", status_code=413)
+                hasher.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        remove_quietly(dest_path)
+        raise
+    return dest_path, size, hasher.hexdigest()
+
+
+def _stage_zip(fileobj, first_index: int) -> Tuple[List[StagedFile], List[dict]]:
+    staged, errors = [], []
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        return staged, [_failed(first_index, "archive", "Not a valid ZIP archive.")]
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(".pdf")
+            and not os.path.basename(info.filename).startswith(".")
+            and not info.filename.startswith("__MACOSX/")
+        ]
+        if first_index + len(members) > settings.IMPORT_MAX_FILES:
+            raise UploadRejected(f"A bulk import is limited to {settings.IMPORT_MAX_FILES} files.", status_code=413)
+        for offset, info in enumerate(members):
+            index = first_index + offset
+            filename = os.path.basename(info.filename)
+            try:
+                path, size, sha = _extract_member(archive, info)
+            except UploadRejected as e:
+                errors.append(_failed(index, filename, e.detail))
+            except (zipfile.BadZipFile, OSError, RuntimeError) as e:
+                # RuntimeError: encrypted members
+                errors.append(_failed(index, filename, f"Could not read from archive: {e}"))
+            else:
+                staged.append(StagedFile(index, filename, path, size, sha))
+    return staged, errors
+
+
+async def stage_import_files(uploads: List[UploadFile]) -> Tuple[List[StagedFile], List[dict]]:
+    """
+    Writes every PDF of the request (ZIP members included) to UPLOAD_TMP_DIR.
+    Returns the staged files and a failed item event for each rejected one.
+    Raises UploadRejected when the batch itself is too large.
+    """
+    staged, errors = [], []
+    for upload in uploads:
+        index = len(staged) + len(errors)
+        if _is_zip(upload):
+            if upload.size is not None and upload.size > settings.IMPORT_MAX_ARCHIVE_BYTES:
+                raise UploadRejected(
+                    f"Archive is larger than {settings.IMPORT_MAX_ARCHIVE_BYTES // (1024 * 1024)} MB.",
+                    status_code=413
+                )
+            try:
+                zip_staged, zip_errors = await asyncio.to_thread(_stage_zip, upload.file, index)
+            except UploadRejected:
+                discard_staged(staged)
+                raise
+            staged.extend(zip_staged)
+            errors.extend(zip_errors)
+        else:
+            tmp_path = os.path.join(settings.UPLOAD_TMP_DIR, f"{uuid.uuid4().hex}.pdf")
+            try:
+                stored = await stream_upload_to_disk(upload, tmp_path)
+            except UploadRejected as e:
+                errors.append(_failed(index, upload.filename, e.detail))
+            else:
+                staged.append(StagedFile(index, upload.filename, stored.path, stored.size, stored.sha256))
+
+        if len(staged) + len(errors) > settings.IMPORT_MAX_FILES:
+            discard_staged(staged)
+            raise UploadRejected(f"A bulk import is limited to {settings.IMPORT_MAX_FILES} files.", status_code=413)
+    return staged, errors
+
+
+def discard_staged(staged: List[StagedFile]) -> None:
+    for item in staged:
+        remove_quietly(item.path)
+
+
+async def _analyze_item(db, user_id: str, item: StagedFile) -> ReportInDB:
+    """Same checks and pipeline as a single upload, minus persistence."""
+    try:
+        has_text = await has_text_layer(item.path)
+    except PDFLimitError as e:
+        await asyncio.to_thread(remove_quietly, item.path)
+        raise ReportProcessingError(e.detail, status_code=e.status_code)
+    if not has_text:
+        await asyncio.to_thread(remove_quietly, item.path)
+        raise ReportProcessingError("Could not extract text from the uploaded PDF. Please ensure it is a valid text-based PDF report.")
+
+    await acquire_blob(db, item.sha256, item.path, item.size)
+    try:
+        async with get_storage().local_copy(item.sha256) as local_path:
+            gemini_result = await analyze_report_content(local_path, item.sha256)
+        return build_report(user_id, gemini_result, item.sha256, original_filename=item.filename)
+    except BaseException:
+        await release_blob(db, item.sha256)
+        raise
+
+
+async def run_import(db, user_id: str, staged: List[StagedFile], errors: List[dict]) -> AsyncIterator[dict]:
+    """
+    Processes staged files and yields progress events: started, one item event
+    per file as it is analyzed or fails, another once its report is saved, and
+    completed. Unsaved work is released if the client goes away.
+    """
+    yield {"event": "started", "total": len(staged) + len(errors)}
+    for error in errors:
+        yield error
+
+    semaphore = asyncio.Semaphore(settings.IMPORT_CONCURRENCY)
+
+    async def analyze(item: StagedFile):
+        async with semaphore:
+            try:
+                return item, await _analyze_item(db, user_id, item), None
+            except ReportProcessingError as e:
+                return item, None, e.detail
+            except Exception as e:
+                logger.exception(f"Bulk import of {item.filename} failed")
+                return item, None, f"Processing failed: {e}"
+
+    tasks = [asyncio.create_task(analyze(item)) for item in staged]
+    batch: List[Tuple[StagedFile, ReportInDB]] = []
+    taken = set()  # indexes of items whose analysis result has been handled
+    saved, failed = 0, len(errors)
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item, report, error = await next_done
+            taken.add(item.index)
+            if error is not None:
+                failed += 1
+                yield _failed(item.index, item.filename, error)
+                continue
+            batch.append((item, report))  # before yielding, so a disconnect there releases it
+            yield {
+                "event": "item",
+                "index": item.index,
+                "filename": item.filename,
+                "status": "analyzed",
+                "health_score": report.gemini_analysis.health_score if report.gemini_analysis else None,
+            }
+            if len(batch) >= settings.IMPORT_INSERT_BATCH:
+                pending, batch = batch, []
+                async for event in _flush(db, pending):
+                    saved += event["status"] == "saved"
+                    failed += event["status"] == "failed"
+                    yield event
+
+        pending, batch = batch, []
+        async for event in _flush(db, pending):
+            saved += event["status"] == "saved"
+            failed += event["status"] == "failed"
+            yield event
+
+        if saved:
+            await update_user_checkup(db, user_id)
+        yield {"event": "completed", "total": len(staged) + len(errors), "saved": saved, "failed": failed}
+    finally:
+        for task in tasks:
+            task.cancel()
+        for item, _ in batch:
+            await release_blob(db, item.sha256)
+        # Analyses that finished after the client went away hold a blob nobody will save
+        for task in tasks:
+            if task.done() and not task.cancelled():
+                item, report, _ = task.result()
+                if report is not None and item.index not in taken:
+                    await release_blob(db, item.sha256)
+        discard_staged(staged)  # only leftovers of items that never started
+
+
+async def _flush(db, batch: List[Tuple[StagedFile, ReportInDB]]) -> AsyncIterator[dict]:
+    if not batch:
+        return
+    try:
+        documents = await save_reports(db, [report for _, report in batch])
+    except Exception as e:
+        logger.exception("Bulk import insert failed")
+        for item, _ in batch:
+            await release_blob(db, item.sha256)
+            yield _failed(item.index, item.filename, f"Could not save report: {e}")
+        return
+    for (item, _), document in zip(batch, documents):
+        yield {"event": "item", "index": item.index, "filename": item.filename, "status": "saved", "report_id": document["_id"]}
+
+
+def encode_event(event: dict, sse: bool) -> str:
+    data = json.dumps(event, default=str)
+    if sse:
+        return f"event: {event['event']}\ndata: {data}\n\n"
+    return data + "\n"
@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import get_settings
+from app.core.database import get_database
+from app.core.logs import request_id_var
+from app.models.job import ReportJobInDB
+from app.services.report_service import ReportProcessingError, process_report
+from app.services.storage import BlobNotFound, acquire_blob, release_blob
+from app.services.upload_service import hash_stored_file
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+async def enqueue_report_job(
+    db,
+    user_id: str,
+    file_path: str,
+    filename: Optional[str],
+    upload_date: datetime,
+    content_sha256: Optional[str] = None
+) -> str:
+    job = ReportJobInDB(
+        user_id=user_id,
+        file_path=file_path,
+        filename=filename,
+        content_sha256=content_sha256,
+        upload_date=upload_date,
+        max_attempts=settings.REPORT_JOB_MAX_ATTEMPTS,
+    )
+    result = await db.report_jobs.insert_one(job.dict(by_alias=True, exclude={"id"}))
+    return str(result.inserted_id)
+
+
+async def get_report_job(db, job_id: str, user_id: str) -> Optional[dict]:
+    return await db.report_jobs.find_one({"_id": ObjectId(job_id), "user_id": user_id})
+
+
+async def claim_next_job(db, worker_id: str) -> Optional[dict]:
+    """
+    Atomically leases the oldest runnable job. A job is runnable when it is queued
+    and due, or when it is running but its lease expired (the worker died).
+    """
+    now = datetime.utcnow()
+    return await db.report_jobs.find_one_and_update(
+        {"$or": [
+            {"status": JOB_QUEUED, "available_at": {"$lte": now}},
+            {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}},
+        ]},
+        {
+            "$set": {
+                "status": JOB_RUNNING,
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=settings.REPORT_JOB_LEASE_SECONDS),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _update_owned_job(db, job: dict, worker_id: str, fields: dict, inc: Optional[dict] = None) -> bool:
+    fields["updated_at"] = datetime.utcnow()
+    update = {"$set": fields}
+    if inc:
+        update["$inc"] = inc
+    result = await db.report_jobs.update_one(
+        {"_id": job["_id"], "lease_owner": worker_id},
+        update
+    )
+    return result.modified_count == 1
+
+
+async def renew_lease(db, job: dict, worker_id: str) -> bool:
+    expires = datetime.utcnow() + timedelta(seconds=settings.REPORT_JOB_LEASE_SECONDS)
+    return await _update_owned_job(db, job, worker_id, {"lease_expires_at": expires})
+
+
+async def fail_or_retry_job(db, job: dict, worker_id: str, error: str, permanent: bool = False) -> None:
+    if permanent or job["attempts"] >= job.get("max_attempts", settings.REPORT_JOB_MAX_ATTEMPTS):
+        failed = await _update_owned_job(db, job, worker_id, {
+            "status": JOB_FAILED,
+            "stage": "failed",
+            "error": error,
+            "lease_owner": None,
+            "lease_expires_at": None,
+        })
+        # Unless a report was saved before the failure, none will own the stored upload
+        if failed and not await db.reports.find_one({"job_id": str(job["_id"])}, {"_id": 1}):
+            await release_blob(db, job.get("content_sha256"))
+        return
+
+    # Exponential backoff between attempts: 10s, 20s, 40s...
+    delay = 5 * (2 ** job["attempts"])
+    await _update_owned_job(db, job, worker_id, {
+        "status": JOB_QUEUED,
+        "stage": "retrying",
+        "error": error,
+        "available_at": datetime.utcnow() + timedelta(seconds=delay),
+        "lease_owner": None,
+        "lease_expires_at": None,
+    })
+
+
+async def release_job(db, job: dict, worker_id: str) -> None:
+    """Hands an interrupted job back to the queue without counting the attempt."""
+    await _update_owned_job(db, job, worker_id, {
+        "status": JOB_QUEUED,
+        "available_at": datetime.utcnow(),
+        "lease_owner": None,
+        "lease_expires_at": None,
+    }, inc={"attempts": -1})
+
+
+async def _complete_job(db, job: dict, worker_id: str, report_id) -> None:
+    await _update_owned_job(db, job, worker_id, {
+        "status": JOB_COMPLETED,
+        "stage": "completed",
+        "progress": 100,
+        "report_id": str(report_id),
+        "error": None,
+        "lease_owner": None,
+        "lease_expires_at": None,
+    })
+
+
+async def adopt_legacy_upload(db, job: dict) -> str:
+    path = job["file_path"]
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    content_sha = await hash_stored_file(path)
+    await acquire_blob(db, content_sha, path, os.path.getsize(path))
+    await db.report_jobs.update_one({"_id": job["_id"]}, {"$set": {"content_sha256": content_sha}})
+    return content_sha
+
+
+async def run_report_job(db, job: dict, worker_id: str) -> None:
+    if job["attempts"] > job.get("max_attempts", settings.REPORT_JOB_MAX_ATTEMPTS):
+        await fail_or_retry_job(db, job, worker_id, job.get("error") or "Job exceeded max attempts", permanent=True)
+        return
+
+    async def progress(value: int, stage: str) -> None:
+        await _update_owned_job(db, job, worker_id, {"progress": value, "stage": stage})
+
+    job_task = asyncio.current_task()
+    lease_lost = False
+
+    async def heartbeat() -> None:
+        nonlocal lease_lost
+        interval = max(settings.REPORT_JOB_LEASE_SECONDS / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            if not await renew_lease(db, job, worker_id):
+                # Another worker may have claimed the job: stop working on it
+                logger.warning(f"Lost lease on report job {job['_id']}, cancelling it")
+                lease_lost = True
+                job_task.cancel()
+                return
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        # An earlier attempt may have saved the report and died before completing the job
+        report = await db.reports.find_one({"job_id": str(job["_id"])}, {"_id": 1})
+        if report is not None:
+            await _complete_job(db, job, worker_id, report["_id"])
+            return
+        content_sha = job.get("content_sha256")
+        if not content_sha:
+            # Jobs queued before content-addressed storage only know their upload path
+            content_sha = await adopt_legacy_upload(db, job)
+        await progress(10, "loaded")
+        report = await process_report(
+            db,
+            job["user_id"],
+            content_sha,
+            upload_date=job["upload_date"],
+            progress=progress,
+            original_filename=job.get("filename"),
+            job_id=str(job["_id"]),
+        )
+        await _complete_job(db, job, worker_id, report["_id"])
+    except asyncio.CancelledError:
+        if lease_lost and job_task.uncancel() == 0:
+            # Cancelled by the heartbeat only: the job is no longer ours to release
+            return
+        await release_job(db, job, worker_id)
+        raise
+    except ReportProcessingError as e:
+        await fail_or_retry_job(db, job, worker_id, e.detail, permanent=True)
+    except (FileNotFoundError, BlobNotFound) as e:
+        await fail_or_retry_job(db, job, worker_id, f"Uploaded file is missing: {e}", permanent=True)
+    except Exception as e:
+        logger.exception(f"Report job {job['_id']} failed")
+        await fail_or_retry_job(db, job, worker_id, str(e))
+    finally:
+        heartbeat_task.cancel()
+
+
+class ReportJobWorkerPool:
+    """
+    A bounded set of asyncio workers that poll `report_jobs` for leased work.
+    Several pools (API replicas, `python -m app.worker`) can share one queue.
+    """
+
+    def __init__(self, get_db, concurrency: int):
+        self.get_db = get_db
+        self.concurrency = concurrency
+        self.worker_prefix = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._tasks = []
+        self._stopping = asyncio.Event()
+
+    async def _work(self, index: int) -> None:
+        worker_id = f"{self.worker_prefix}-{index}"
+        while not self._stopping.is_set():
+            db = await self.get_db()
+            try:
+                job = await claim_next_job(db, worker_id)
+            except Exception as e:
+                logger.error(f"Could not claim report job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=settings.REPORT_JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Worker tasks own their context, so this only tags this job's log lines
+            request_id_var.set(f"job-{job['_id']}")
+            try:
+                await run_report_job(db, job, worker_id)
+            except Exception:
+                # e.g. the database went away while recording the outcome; the lease
+                # expires and the job is claimed again, but this worker must keep polling
+                logger.exception(f"Report job {job['_id']} could not be recorded")
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._work(i)) for i in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self) -> None:
+        self.start()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+worker_pool: Optional[ReportJobWorkerPool] = None
+
+
+async def start_report_workers():
+    global worker_pool
+    if settings.REPORT_JOB_WORKERS <= 0:
+        return
+    worker_pool = ReportJobWorkerPool(get_database, settings.REPORT_JOB_WORKERS)
+    worker_pool.start()
+    logger.info(f"Started {settings.REPORT_JOB_WORKERS} report job workers")
+
+
+async def stop_report_workers():
+    global worker_pool
+    if worker_pool is not None:
+        await worker_pool.stop()
+        worker_pool = None
@@ -0,0 +1,132 @@
+"""
+Incremental parsing of a streamed JSON object.
+
+Gemini streams its JSON answer as arbitrary text fragments. MemberStream
+scans them as they arrive and returns each member of the nested objects as
+soon as its value is complete:
+
+    {"extracted_data": {"Hemoglobin": {...}, "TSH": {...}}, "analysis": {"summary": "...", ...}}
+
+gives (("extracted_data", "Hemoglobin"), {...}), (("extracted_data", "TSH"), {...}),
+(("analysis", "summary"), "..."), ... A top-level member whose value is not an
+object is returned whole, with a one-element path. Only the text of the member
+being read is buffered, so memory does not grow with the length of the answer.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+Member = Tuple[Tuple[str, ...], Any]
+
+
+class JSONStreamError(ValueError):
+    """The streamed text is not a well-formed JSON object."""
+
+
+class MemberStream:
+    def __init__(self):
+        self._started = False
+        self.finished = False
+        self._depth = 0  # open objects and arrays; 1 = directly inside the root object
+        self._in_string = False
+        self._escaped = False
+        self._parent: Optional[str] = None  # root key whose object is being read member by member
+        self._member: List[str] = []  # text of the member being read, from its key on
+        self._member_depth = 0  # depth of the object holding that member (0 = none)
+        self._after_colon = False  # a root member's value has not started yet
+
+    def feed(self, text: str) -> List[Member]:
+        """Consumes the next fragment; returns the members it completed, in order."""
+        members = []
+        for char in text:
+            member = self._consume(char)
+            if member is not None:
+                members.append(member)
+        return members
+
+    def close(self) -> None:
+        if not self.finished:
+            raise JSONStreamError("Streamed JSON ended before the root object was closed")
+
+    def _consume(self, char: str) -> Optional[Member]:
+        if self.finished:
+            if not char.isspace():
+                raise JSONStreamError("Unexpected text after the root object")
+            return None
+        if not self._started:
+            if char == "{":
+                self._started, self._depth = True, 1
+            elif not char.isspace() and char != "\ufeff":
+                raise JSONStreamError("Streamed JSON is not an object")
+            return None
+
+        if self._member_depth:
+            self._member.append(char)
+
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+            return None
+        if char.isspace():
+            return None
+
+        if self._after_colon:
+            self._after_colon = False
+            if char == "{":
+                # The value of this root member is an object: read it member by member
+                text = "".join(self._member[:-1])
+                self._parent = self._parse_key(text)
+                self._member, self._member_depth = [], 0
+                self._depth = 2
+                return None
+
+        if not self._member_depth:
+            if char == '"' and self._depth in (1, 2):
+                self._member, self._member_depth = [char], self._depth
+                self._in_string = True
+            elif char == "}" and self._depth == 2:  # empty nested object
+                self._parent, self._depth = None, 1
+            elif char == "}" and self._depth == 1:  # empty root object
+                self.finished = True
+            elif char != "," or self._depth not in (1, 2):
+                raise JSONStreamError(f"Unexpected {char!r} in streamed JSON")
+            return None
+
+        if char == '"':
+            self._in_string = True
+        elif char == ":" and self._depth == self._member_depth == 1:
+            self._after_colon = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]" and self._depth > self._member_depth:
+            self._depth -= 1
+        elif char == "," and self._depth == self._member_depth:
+            return self._complete()
+        elif char == "}" and self._depth == self._member_depth:
+            member = self._complete()
+            # The same brace closes the object holding the member
+            if self._depth == 2:
+                self._parent, self._depth = None, 1
+            else:
+                self.finished = True
+            return member
+        return None
+
+    def _parse_key(self, text: str) -> str:
+        try:
+            return json.loads(text.rsplit(":", 1)[0])
+        except ValueError as e:
+            raise JSONStreamError(f"Invalid key in streamed JSON: {e}") from e
+
+    def _complete(self) -> Member:
+        text = "".join(self._member[:-1])  # without the closing delimiter
+        depth = self._member_depth
+        self._member, self._member_depth = [], 0
+        try:
+            ((key, value),) = json.loads("{" + text + "}").items()
+        except ValueError as e:
+            raise JSONStreamError(f"Invalid member in streamed JSON: {e}") from e
+        return ((self._parent, key) if depth == 2 else (key,)), value
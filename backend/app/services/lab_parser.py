@@ -0,0 +1,227 @@
+"""
+Deterministic lab-report parser.
+
+Reads parameter rows (name, value, unit, reference range) straight from the
+table rows PyMuPDF gives us, so reports with a recognised layout need no LLM
+call to extract their values. The output has the same `extracted_data` shape
+as the Gemini analysis, with abnormal parameters computed by comparing values
+to their ranges. Each parse carries a confidence score; callers fall back to
+Gemini below LAB_PARSER_MIN_CONFIDENCE.
+"""
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.services.parameter_registry import (
+    NAME_PATTERN, UNITS, ParameterSpec, alternation, annotate_extracted_data, lookup
+)
+
+
+@dataclass(frozen=True)
+class LabTemplate:
+    name: str
+    markers: Tuple[str, ...]  # regexes; any match in the document selects the template
+
+
+# Fixed-layout lab chains that make up most uploads. Their tables are one
+# parameter per row, so rows parse reliably and score full confidence.
+TEMPLATES: Tuple[LabTemplate, ...] = (
+    LabTemplate("lal_pathlabs", (r"dr\.?\s*lal\s*path\s*labs",)),
+    LabTemplate("thyrocare", (r"thyrocare",)),
+    LabTemplate("metropolis", (r"metropolis\s+healthcare", r"metropolis\s+labs?")),
+    LabTemplate("agilus", (r"agilus\s+diagnostics", r"srl\s+diagnostics")),
+)
+_TEMPLATE_PATTERNS = [
+    (template, re.compile("|".join(template.markers), re.IGNORECASE)) for template in TEMPLATES
+]
+
+# Unknown layouts still parse, but the result is trusted less
+GENERIC_LAYOUT_WEIGHT = 0.75
+MIN_PARAMETERS = 3
+
+_EXTRA_UNITS = ("mg/dl", "g/dl", "gm/dl", "mmol/L", "IU/L", "µIU/mL", "uIU/ml", "mIU/L", "/cumm", "10^3/µL", "10^6/µL", "fL", "pg")
+_UNIT = re.compile(r"^\s*(" + alternation(UNITS + _EXTRA_UNITS) + r")(?![A-Za-z])", re.IGNORECASE)
+_NUMBER = r"\d+(?:\.\d+)?"
+_RANGE = re.compile(r"(" + _NUMBER + r")\s*(?:-|–|to)\s*(" + _NUMBER + r")", re.IGNORECASE)
+_UPPER_BOUND = re.compile(r"(?:<|≤|upto|up to|less than)\s*(" + _NUMBER + r")", re.IGNORECASE)
+_VALUE = re.compile(r"(?<![\w.])(" + _NUMBER + r")(?![\d.])")
+_DIGIT_GROUPING = re.compile(r"(?<=\d),(?=\d)")
+_QUALIFIER = re.compile(r"^\s*\([^)]*\)")
+_ROW_PREFIX = re.compile(r"^[\W\d_]*$")
+
+
+def _unit_key(unit: str) -> str:
+    return unit.lower().replace("µ", "u").replace("gm/", "g/")
+
+
+@dataclass
+class LocalParseResult:
+    template: Optional[str]
+    extracted_data: Dict[str, dict] = field(default_factory=dict)
+    abnormal_parameters: List[str] = field(default_factory=list)
+    confidence: float = 0.0
+    detected: int = 0  # distinct known parameters mentioned anywhere in the tables
+
+
+def detect_template(text: str) -> Optional[LabTemplate]:
+    for template, pattern in _TEMPLATE_PATTERNS:
+        if pattern.search(text):
+            return template
+    return None
+
+
+def _number(text: str):
+    value = float(text)
+    return int(value) if value.is_integer() and "." not in text else value
+
+
+def _reference_range(text: str) -> Optional[str]:
+    # Reference ranges are the last column, so prefer the rightmost match
+    ranges = _RANGE.findall(text)
+    if ranges:
+        low, high = ranges[-1]
+        return f"{low}-{high}"
+    bounds = _UPPER_BOUND.findall(text)
+    if bounds:
+        return f"0-{bounds[-1]}"
+    return None
+
+
+def parse_row(cells: List[str]) -> Optional[Tuple[ParameterSpec, dict, float]]:
+    """
+    Parses one table row into (spec, {"value", "unit", "reference_range"}, score).
+    The row must start with a known parameter name; the score drops when the
+    unit or the range had to come from the registry defaults.
+    """
+    line = _DIGIT_GROUPING.sub("", "  ".join(cells))
+    match = NAME_PATTERN.search(line)
+    if match is None or not _ROW_PREFIX.match(line[:match.start()]):
+        return None
+    spec = lookup(match.group(0))
+    if spec is None:
+        return None
+
+    rest = _QUALIFIER.sub("", line[match.end():])  # e.g. "Hemoglobin (Photometry)"
+    reference_range = _reference_range(rest)
+    without_ranges = _UPPER_BOUND.sub(" ", _RANGE.sub(" ", rest))
+    value_match = _VALUE.search(without_ranges)
+    if value_match is None:
+        return None
+
+    score = 1.0
+    unit_match = _UNIT.match(without_ranges[value_match.end():])
+    if unit_match:
+        unit = unit_match.group(1)
+        if spec.unit and _unit_key(unit) != _unit_key(spec.unit):
+            score -= 0.3  # e.g. mmol/L where mg/dL is expected
+        elif spec.unit:
+            unit = spec.unit
+    else:
+        unit = spec.unit
+        score -= 0.2
+    if reference_range is None:
+        reference_range = spec.reference_range
+        score -= 0.2
+
+    return spec, {
+        "value": _number(value_match.group(1)),
+        "unit": unit,
+        "reference_range": reference_range,
+    }, score
+
+
+def is_abnormal(entry: dict) -> bool:
+    reference_range = entry.get("reference_range")
+    value = entry.get("value")
+    if not reference_range or not isinstance(value, (int, float)):
+        return False
+    match = _RANGE.fullmatch(reference_range.strip())
+    if match is None:
+        return False
+    return not float(match.group(1)) <= value <= float(match.group(2))
+
+
+def parse_lab_report(rows: List[List[str]]) -> LocalParseResult:
+    """
+    Parses table rows (pdf_service.extract_table_rows) into extracted_data.
+
+    Confidence = layout weight (known template or generic) x coverage (known
+    parameters parsed / mentioned) x mean row score, and 0 below MIN_PARAMETERS.
+    """
+    text = "\n".join(" ".join(row) for row in rows)
+    template = detect_template(text)
+    detected = {lookup(match.group(0)).name for match in NAME_PATTERN.finditer(text) if lookup(match.group(0))}
+
+    extracted, scores = {}, []
+    for row in rows:
+        parsed = parse_row(row)
+        if parsed is None:
+            continue
+        spec, entry, score = parsed
+        if spec.name in extracted:
+            continue  # first occurrence wins; later ones are usually summaries
+        extracted[spec.name] = entry
+        scores.append(score)
+
+    result = LocalParseResult(template.name if template else None, detected=len(detected))
+    if len(extracted) < MIN_PARAMETERS:
+        return result
+
+    result.extracted_data = annotate_extracted_data(extracted)
+    result.abnormal_parameters = [name for name, entry in extracted.items() if is_abnormal(entry)]
+    coverage = len(extracted) / max(len(detected), len(extracted))
+    weight = 1.0 if template else GENERIC_LAYOUT_WEIGHT
+    result.confidence = round(weight * coverage * sum(scores) / len(scores), 4)
+    return result
+
+
+def local_analysis(result: LocalParseResult) -> dict:
+    """A GeminiAnalysis-shaped summary computed from the parsed values alone."""
+    total = len(result.extracted_data)
+    abnormal = result.abnormal_parameters
+    if abnormal:
+        summary = f"{len(abnormal)} of {total} parameters are outside the reference range: {', '.join(abnormal)}."
+    else:
+        summary = f"All {total} parameters are within the reference range."
+    return {
+        "summary": summary,
+        "health_score": round(100 * (1 - len(abnormal) / total)) if total else 0,
+        "abnormal_parameters": abnormal,
+        "dietary_suggestions": [],
+        "foods_to_include": [],
+        "foods_to_avoid": [],
+        "lifestyle_tips": [],
+        "doctor_consultation": bool(abnormal),
+    }
+
+
+class ParserStats:
+    """How often the local parser was accepted or fell back to Gemini, per template."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.accepted = Counter()
+        self.fallbacks = Counter()
+
+    def record(self, result: LocalParseResult, accepted: bool) -> None:
+        with self._lock:
+            (self.accepted if accepted else self.fallbacks)[result.template or "generic"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            accepted, fallbacks = sum(self.accepted.values()), sum(self.fallbacks.values())
+            total = accepted + fallbacks
+            return {
+                "accepted": accepted,
+                "fallbacks": fallbacks,
+                "accept_rate": round(accepted / total, 4) if total else 0.0,
+                "by_template": {
+                    name: {"accepted": self.accepted[name], "fallbacks": self.fallbacks[name]}
+                    for name in set(self.accepted) | set(self.fallbacks)
+                },
+            }
+
+
+parser_stats = ParserStats()
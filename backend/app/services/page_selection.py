@@ -0,0 +1,115 @@
+"""
+Adaptive analysis input: decides what to send Gemini for a report.
+
+Pages are scored locally by how much they look like a lab table (known
+parameter names/aliases from the registry, numbers followed by units, range
+patterns). When the text layer of the selected pages is rich enough only that
+text is sent; otherwise a PDF rebuilt from just those pages is sent, and when
+nothing can be pruned the original PDF is sent as before.
+"""
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.core.config import get_settings
+from app.services.parameter_registry import NAME_PATTERN, UNITS, alternation
+
+settings = get_settings()
+
+MODE_NATIVE = "native_pdf"
+MODE_TEXT = "text"
+MODE_PAGES = "pruned_pdf"
+
+
+_VALUE_WITH_UNIT = re.compile(r"\d+(?:\.\d+)?\s*(?:" + alternation(UNITS) + r")", re.IGNORECASE)
+_RANGE = re.compile(r"\d+(?:\.\d+)?\s*(?:-|–|to)\s*\d+(?:\.\d+)?")
+
+
+def score_page(text: str) -> float:
+    """
+    Cheap lab-table likelihood: distinct known parameters count most, values
+    with units and reference ranges add supporting evidence.
+    """
+    if not text:
+        return 0.0
+    parameters = {match.group(0).lower() for match in NAME_PATTERN.finditer(text)}
+    values = len(_VALUE_WITH_UNIT.findall(text))
+    ranges = len(_RANGE.findall(text))
+    return len(parameters) + 0.25 * min(values, 40) + 0.1 * min(ranges, 40)
+
+
+@dataclass
+class AnalysisPlan:
+    mode: str
+    pages: List[int] = field(default_factory=list)  # 0-based pages kept
+    page_count: int = 0
+    text: Optional[str] = None  # set in MODE_TEXT
+
+    @property
+    def page_key(self) -> str:
+        return ",".join(str(page) for page in self.pages)
+
+
+def plan_analysis(page_texts: List[str]) -> AnalysisPlan:
+    """
+    Picks the Gemini input for a document from its per-page text.
+    Pages scoring at least ANALYSIS_PAGE_SCORE_THRESHOLD are kept; if none
+    qualifies every page is kept, so a report is never sent empty.
+    """
+    page_count = len(page_texts)
+    selected = [
+        index for index, text in enumerate(page_texts)
+        if score_page(text) >= settings.ANALYSIS_PAGE_SCORE_THRESHOLD
+    ] or list(range(page_count))
+
+    text = "".join(page_texts[index] for index in selected)
+    chars = len(text.strip())
+    if chars >= settings.ANALYSIS_MIN_TEXT_CHARS and chars / max(len(selected), 1) >= settings.ANALYSIS_MIN_CHARS_PER_PAGE:
+        return AnalysisPlan(MODE_TEXT, selected, page_count, text)
+    if len(selected) < page_count:
+        return AnalysisPlan(MODE_PAGES, selected, page_count)
+    return AnalysisPlan(MODE_NATIVE, selected, page_count)
+
+
+class AnalysisModeMetrics:
+    """
+    Per-mode counters for Gemini calls: how many bytes were sent against the
+    size of the original PDF, and call latency. Latency saved is measured
+    against the native-PDF average, so it needs some native calls to compare with.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes: Dict[str, Dict[str, float]] = {}
+
+    def record(self, mode: str, original_bytes: int, sent_bytes: int, latency: float) -> None:
+        with self._lock:
+            entry = self._modes.setdefault(mode, {"calls": 0, "original_bytes": 0, "sent_bytes": 0, "latency_total": 0.0})
+            entry["calls"] += 1
+            entry["original_bytes"] += original_bytes
+            entry["sent_bytes"] += sent_bytes
+            entry["latency_total"] += latency
+
+    def stats(self) -> dict:
+        with self._lock:
+            modes = {mode: dict(entry) for mode, entry in self._modes.items()}
+        native = modes.get(MODE_NATIVE)
+        native_avg = native["latency_total"] / native["calls"] if native else None
+
+        result = {}
+        for mode, entry in modes.items():
+            avg = entry["latency_total"] / entry["calls"]
+            result[mode] = {
+                "calls": entry["calls"],
+                "original_bytes": entry["original_bytes"],
+                "sent_bytes": entry["sent_bytes"],
+                "bytes_saved": entry["original_bytes"] - entry["sent_bytes"],
+                "sent_ratio": round(entry["sent_bytes"] / entry["original_bytes"], 4) if entry["original_bytes"] else None,
+                "avg_latency_seconds": round(avg, 4),
+                "avg_latency_saved_seconds": round(native_avg - avg, 4) if native_avg is not None else None,
+            }
+        return {"mode": settings.ANALYSIS_MODE, "modes": result}
+
+
+mode_metrics = AnalysisModeMetrics()
@@ -0,0 +1,129 @@
+"""
+Canonical lab parameter registry.
+
+Single source of truth for parameter names, aliases, units and default
+reference ranges. The Gemini prompt's normalization section is generated from
+it, ingestion stamps `canonical_key` on every extracted value with it, and
+the trends code groups series by it.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ParameterSpec:
+    name: str  # the "Standard Key" Gemini is asked to use
+    aliases: Tuple[str, ...] = ()
+    unit: str = ""
+    reference_range: Optional[str] = None  # "min-max", without units
+    reference_note: Optional[str] = None  # prompt wording when a plain range is not enough
+
+
+PARAMETERS: Tuple[ParameterSpec, ...] = (
+    ParameterSpec("Hemoglobin", ("Hb", "Haemoglobin", "Hgb"), "g/dL", "12-17",
+                  '"13-17" for men, "12-15" for women (use "12-17" if gender unknown)'),
+    ParameterSpec("RBC Count", ("Red Blood Cell Count", "RBCs"), "million/cumm"),
+    ParameterSpec("WBC Count", ("White Blood Cell Count", "WBCs", "Leucocytes"), "cells/cumm"),
+    ParameterSpec("Platelet Count", ("Platelets", "PLT"), "lakhs/cumm"),
+    ParameterSpec("Fasting Blood Sugar", ("Fasting Glucose", "Glucose Fasting", "Blood Sugar Fasting", "BFS"), "mg/dL", "70-100"),
+    ParameterSpec("Random Blood Sugar", ("Random Glucose", "Blood Sugar Random", "RBS"), "mg/dL", "70-140"),
+    ParameterSpec("HbA1c", ("Glycated Hemoglobin",), "%", "4-5.6"),
+    ParameterSpec("Total Cholesterol", ("Cholesterol Total",), "mg/dL", "125-200"),
+    ParameterSpec("HDL Cholesterol", ("HDL", "Good Cholesterol"), "mg/dL", "40-60"),
+    ParameterSpec("LDL Cholesterol", ("LDL", "Bad Cholesterol"), "mg/dL", "0-100"),
+    ParameterSpec("Triglycerides", ("TGL", "TRIG"), "mg/dL", "0-150"),
+    ParameterSpec("Vitamin D", ("Vit D", "25-OH Vitamin D"), "ng/mL", "30-100"),
+    ParameterSpec("Vitamin B12", ("Vit B12", "Cobalamin"), "pg/mL", "200-900"),
+    ParameterSpec("TSH", ("Thyroid Stimulating Hormone",), "uIU/mL", "0.5-5"),
+    ParameterSpec("Creatinine", ("Serum Creatinine",), "mg/dL", "0.6-1.2"),
+    ParameterSpec("Uric Acid", ("S. Uric Acid",), "mg/dL", "3.5-7.2"),
+    ParameterSpec("SGPT", ("ALT", "Alanine Aminotransferase"), "U/L", "0-40"),
+    ParameterSpec("SGOT", ("AST", "Aspartate Aminotransferase"), "U/L", "0-40"),
+    ParameterSpec("Bilirubin Total", ("Total Bilirubin",), "mg/dL"),
+)
+
+_PARENTHESES = re.compile(r'\(.*?\)')
+
+
+def normalize_parameter(param: str) -> str:
+    # Normalize: Remove parentheses, lowercase, strip, collapse spaces
+    # Hemoglobin (Hb) -> Hemoglobin -> hemoglobin
+    clean_param = _PARENTHESES.sub('', param)
+    return " ".join(clean_param.strip().lower().split())
+
+
+def _compile(parameters: Tuple[ParameterSpec, ...]) -> Dict[str, ParameterSpec]:
+    lookup = {}
+    for spec in parameters:
+        for name in (spec.name,) + spec.aliases:
+            lookup[normalize_parameter(name)] = spec
+    return lookup
+
+
+# normalized name or alias -> spec, built once at import
+_LOOKUP = _compile(PARAMETERS)
+# canonical key -> spec
+_BY_KEY = {normalize_parameter(spec.name): spec for spec in PARAMETERS}
+
+
+def alternation(terms) -> str:
+    """Regex alternation of literal terms, longest first so "HDL Cholesterol" wins over "HDL"."""
+    return "|".join(re.escape(term) for term in sorted(set(terms), key=len, reverse=True))
+
+
+# Any known name or alias as a whole word, for scanning raw report text
+NAME_PATTERN = re.compile(
+    r"(?<![A-Za-z])(?:" + alternation(name for spec in PARAMETERS for name in (spec.name,) + spec.aliases) + r")(?![A-Za-z])",
+    re.IGNORECASE
+)
+UNITS: Tuple[str, ...] = tuple(sorted({spec.unit for spec in PARAMETERS if spec.unit}, key=len, reverse=True))
+
+
+@lru_cache(maxsize=4096)
+def canonical_key(param: str) -> str:
+    """
+    Stable key for a parameter name as written in a report. Known aliases
+    collapse onto their standard parameter; unknown names are just normalized.
+    """
+    norm_key = normalize_parameter(param)
+    spec = _LOOKUP.get(norm_key)
+    return normalize_parameter(spec.name) if spec else norm_key
+
+
+def lookup(param: str) -> Optional[ParameterSpec]:
+    return _LOOKUP.get(normalize_parameter(param))
+
+
+def spec_for_key(key: str) -> Optional[ParameterSpec]:
+    return _BY_KEY.get(key)
+
+
+def display_name(key: str) -> Optional[str]:
+    spec = _BY_KEY.get(key)
+    return spec.name if spec else None
+
+
+def annotate_extracted_data(extracted_data: dict) -> dict:
+    """Stamps `canonical_key` on each structured value so reads never normalize again."""
+    for param, val in extracted_data.items():
+        if isinstance(val, dict):
+            val["canonical_key"] = canonical_key(param)
+    return extracted_data
+
+
+def prompt_alias_lines(indent: str = "       ") -> str:
+    return "\n".join(
+        f'{indent}- "{spec.name}": ({", ".join(spec.aliases)})'
+        for spec in PARAMETERS
+    )
+
+
+def prompt_reference_lines(indent: str = "         ") -> str:
+    lines = []
+    for spec in PARAMETERS:
+        if spec.reference_range:
+            reference = spec.reference_note or '"' + spec.reference_range + '"'
+            lines.append(f"{indent}* {spec.name}: {reference}")
+    return "\n".join(lines)
@@ -1,21 +1,290 @@
 import fitz  # PyMuPDF
-import re
+import asyncio
+import os
+import time
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple, Union
+
+from app.core.config import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# A PDF can be handed over as raw bytes or as the path of the stored upload.
+# Paths are preferred: worker processes reopen the file instead of receiving a pickled copy.
+PDFSource = Union[bytes, str]
+
+# Table reconstruction from word boxes, in PDF points
+ROW_TOLERANCE = 3.0  # words whose baselines differ by less are on the same row
+CELL_GAP = 12.0  # a wider horizontal gap between words starts a new cell
+
+
+class PDFLimitError(Exception):
+    """Raised when a PDF exceeds the configured page, size or time limits."""
+
+    def __init__(self, detail: str, status_code: int = 413):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.PDF_WORKERS or os.cpu_count())
+    return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    global _executor
+    if _executor is executor:
+        _executor = None
+
+
+def _recycle_executor(executor: ProcessPoolExecutor) -> None:
+    """
+    Kills the pool's processes, which may still be busy with timed-out work, and
+    lets get_executor start a fresh pool. Cancelling a future does not stop work
+    already running in a process. Page extractions running in the killed pool are
+    retried once in the new one.
+    """
+    _discard_executor(executor)
+    # No public API stops running work; without the private process map (another
+    # Python version), the pool is only shut down and its work runs to its deadline
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.kill()
+    logger.warning(f"Killed {len(processes)} PDF worker processes after a timeout")
+
+
+async def shutdown_pdf_workers():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _open(source: PDFSource):
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _source_size(source: PDFSource) -> int:
+    return os.path.getsize(source) if isinstance(source, str) else len(source)
+
+
+# --- Functions below run inside the worker processes ---
+
+def _page_count(source: PDFSource) -> int:
+    with _open(source) as doc:
+        return doc.page_count
+
+
+def _extract_page_range(source: PDFSource, start: int, stop: int, deadline: float) -> List[str]:
+    pages = []
+    with _open(source) as doc:
+        for index in range(start, stop):
+            if time.time() > deadline:
+                raise TimeoutError(f"PDF extraction deadline exceeded at page {index}")
+            pages.append(doc[index].get_text())
+    return pages
+
+
+def _group_rows(words: list) -> List[List[str]]:
+    # words: (x0, y0, x1, y1, text, block, line, word) from page.get_text("words")
+    rows = []
+    current, baseline = [], None
+    for word in sorted(words, key=lambda w: w[3]):
+        if baseline is not None and abs(word[3] - baseline) > ROW_TOLERANCE:
+            rows.append(current)
+            current = []
+        if not current:
+            baseline = word[3]
+        current.append(word)
+    if current:
+        rows.append(current)
+
+    table = []
+    for row in rows:
+        row.sort(key=lambda w: w[0])
+        cells, cell, right = [], [], None
+        for x0, _, x1, _, text, *_ in row:
+            if right is not None and x0 - right > CELL_GAP:
+                cells.append(" ".join(cell))
+                cell = []
+            cell.append(text)
+            right = x1
+        cells.append(" ".join(cell))
+        table.append(cells)
+    return table
+
+
+def _extract_row_range(source: PDFSource, start: int, stop: int, deadline: float) -> List[List[List[str]]]:
+    pages = []
+    with _open(source) as doc:
+        for index in range(start, stop):
+            if time.time() > deadline:
+                raise TimeoutError(f"PDF extraction deadline exceeded at page {index}")
+            pages.append(_group_rows(doc[index].get_text("words")))
+    return pages
+
+
+def _build_page_subset(source: PDFSource, pages: List[int]) -> bytes:
+    with _open(source) as doc:
+        with fitz.open() as subset:
+            for index in pages:
+                subset.insert_pdf(doc, from_page=index, to_page=index)
+            return subset.tobytes(garbage=3, deflate=True)
+
+
+def _probe_text_layer(source: PDFSource, max_pages: int) -> bool:
+    with _open(source) as doc:
+        for index in range(min(doc.page_count, max_pages)):
+            if doc[index].get_text().strip():
+                return True
+    return False
 
-async def extract_text_from_pdf(file_content: bytes) -> str:
+
+# --- Async API used by the routes ---
+
+def _check_size(source: PDFSource) -> None:
+    if _source_size(source) > settings.PDF_MAX_BYTES:
+        raise PDFLimitError(f"PDF is larger than {settings.PDF_MAX_BYTES // (1024 * 1024)} MB.")
+
+
+def _page_ranges(page_count: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+
+async def _call_in_pool(fn, *args):
+    """
+    fn(*args) in the process pool, within PDF_EXTRACT_TIMEOUT_SECONDS. On timeout
+    the pool is recycled and asyncio.TimeoutError raised.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = time.time() + settings.PDF_EXTRACT_TIMEOUT_SECONDS
+    executor = get_executor()
+    try:
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), timeout=settings.PDF_EXTRACT_TIMEOUT_SECONDS)
+        except BrokenProcessPool:
+            # Killed under us after another extraction timed out: retry once in a fresh pool
+            _discard_executor(executor)
+            executor = get_executor()
+            return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), timeout=max(deadline - time.time(), 0))
+    except asyncio.TimeoutError:
+        _recycle_executor(executor)
+        raise
+
+
+async def _map_in_pool(executor: ProcessPoolExecutor, file_content: PDFSource, worker, deadline: float) -> list:
+    loop = asyncio.get_running_loop()
+    try:
+        # Opening the document can hang on a crafted PDF, so it counts against the deadline too
+        page_count = await asyncio.wait_for(
+            loop.run_in_executor(executor, _page_count, file_content),
+            timeout=max(deadline - time.time(), 0)
+        )
+        if page_count > settings.PDF_MAX_PAGES:
+            raise PDFLimitError(f"PDF has {page_count} pages; the limit is {settings.PDF_MAX_PAGES}.")
+        futures = [
+            loop.run_in_executor(executor, worker, file_content, start, stop, deadline)
+            for start, stop in _page_ranges(page_count, settings.PDF_PAGES_PER_TASK)
+        ]
+        return await asyncio.wait_for(
+            asyncio.gather(*futures),
+            timeout=max(deadline - time.time(), 0)
+        )
+    except (asyncio.TimeoutError, TimeoutError):
+        _recycle_executor(executor)
+        raise
+
+
+async def _map_page_ranges(file_content: PDFSource, worker) -> list:
     """
-    Extracts text from PDF bytes using PyMuPDF.
+    Runs worker(source, start, stop, deadline) over the document's page ranges in
+    the process pool and concatenates the per-page results in page order.
     """
+    _check_size(file_content)
+    deadline = time.time() + settings.PDF_EXTRACT_TIMEOUT_SECONDS
+    executor = get_executor()
     try:
-        doc = fitz.open(stream=file_content, filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
+        try:
+            parts = await _map_in_pool(executor, file_content, worker, deadline)
+        except BrokenProcessPool:
+            # Killed under us after another extraction timed out: retry once in a fresh pool
+            _discard_executor(executor)
+            parts = await _map_in_pool(get_executor(), file_content, worker, deadline)
+    except (asyncio.TimeoutError, TimeoutError):
+        raise PDFLimitError(
+            f"PDF text extraction took longer than {settings.PDF_EXTRACT_TIMEOUT_SECONDS} seconds.",
+            status_code=422
+        )
+    except PDFLimitError:
+        raise
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {e}")
-        return ""
+        return []
+    return [page for part in parts for page in part]
+
+
+async def extract_pages_from_pdf(file_content: PDFSource) -> List[str]:
+    """
+    Extracts the text of every page from PDF bytes (or a stored PDF path) using PyMuPDF.
+
+    Runs in a process pool so the event loop stays free. Large documents are split
+    into page ranges extracted in parallel. Raises PDFLimitError when the document
+    exceeds PDF_MAX_BYTES / PDF_MAX_PAGES or PDF_EXTRACT_TIMEOUT_SECONDS; returns
+    [] for unreadable PDFs.
+    """
+    return await _map_page_ranges(file_content, _extract_page_range)
+
+
+async def extract_table_rows(file_content: PDFSource) -> List[List[str]]:
+    """
+    Visual table rows of the whole document, from PyMuPDF word positions: words on
+    the same baseline form a row, and wide horizontal gaps split it into cells.
+    Same limits as extract_pages_from_pdf; returns [] for unreadable PDFs.
+    """
+    pages = await _map_page_ranges(file_content, _extract_row_range)
+    return [row for page in pages for row in page]
+
+
+async def extract_text_from_pdf(file_content: PDFSource) -> str:
+    """Whole-document text, joined once; "" for unreadable PDFs. See extract_pages_from_pdf."""
+    return "".join(await extract_pages_from_pdf(file_content))
+
+
+async def build_page_subset(file_content: PDFSource, pages: List[int]) -> bytes:
+    """
+    Rebuilds a PDF holding only the given (0-based) pages, e.g. the lab tables of
+    a scanned report, so images and boilerplate pages are not sent to Gemini.
+    """
+    try:
+        return await _call_in_pool(_build_page_subset, file_content, pages)
+    except asyncio.TimeoutError:
+        raise PDFLimitError("PDF pages could not be extracted in time.", status_code=422)
+
+
+async def has_text_layer(file_content: PDFSource) -> bool:
+    """
+    Cheap early check: stops at the first page that has any text, looking at no
+    more than PDF_TEXT_PROBE_PAGES pages. Scanned, image-only PDFs return False.
+    """
+    _check_size(file_content)
+    try:
+        return await _call_in_pool(_probe_text_layer, file_content, settings.PDF_TEXT_PROBE_PAGES)
+    except asyncio.TimeoutError:
+        raise PDFLimitError("PDF could not be inspected in time.", status_code=422)
+    except Exception as e:
+        logger.error(f"Error probing PDF text layer: {e}")
+        return False
 
 # Removed parse_health_parameters as Gemini now handles extraction.
@@ -0,0 +1,68 @@
+import time
+from typing import Optional
+
+from jose import jwt
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# token -> decoded JWT payload, each entry lives until the token expires
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+# user id -> subject of a cached principal, so writes that only know the id can invalidate
+_subjects_by_user_id = {}
+
+
+def _forget_subject(subject: str, user: dict) -> None:
+    if _subjects_by_user_id.get(user["_id"]) == subject:
+        del _subjects_by_user_id[user["_id"]]
+
+
+# token subject (email) -> user document; its id mapping leaves with it
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS, on_evict=_forget_subject)
+
+
+def decode_token(token: str) -> dict:
+    """jwt.decode memoized for the token's lifetime. Raises JWTError like jwt.decode."""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining > 0:
+        token_cache.set(token, payload, ttl=remaining)
+    return payload
+
+
+async def get_principal(db, subject: str) -> Optional[dict]:
+    user = principal_cache.get(subject)
+    if user is None:
+        user = await db.users.find_one({"email": subject})
+        if user is None:
+            return None
+        user["_id"] = str(user["_id"])
+        _subjects_by_user_id[user["_id"]] = subject
+        principal_cache.set(subject, user)
+    # Routes get their own copy so they cannot mutate the cached principal
+    return dict(user)
+
+
+def invalidate_principal(user_id: Optional[str] = None, subject: Optional[str] = None) -> None:
+    """
+    Call after any write to a user document. This only reaches the current
+    process: other API replicas and `python -m app.worker` (which updates checkup
+    dates) keep serving their cached copy for up to PRINCIPAL_CACHE_TTL_SECONDS.
+    That staleness is accepted; checking data_version on every request would cost
+    the lookup the cache exists to save.
+    """
+    subject = subject or _subjects_by_user_id.pop(str(user_id), None)
+    if subject:
+        principal_cache.pop(subject)
+
+
+def cache_stats() -> dict:
+    return {
+        "principals": principal_cache.stats(),
+        "tokens": token_cache.stats(),
+    }
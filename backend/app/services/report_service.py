@@ -0,0 +1,347 @@
+import base64
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.models.report import ReportInDB
+from app.core.config import get_settings
+from app.core.metrics import span
+from app.services.analysis_cache import content_hash
+from app.services.data_version import data_version_update
+from app.services.pdf_service import PDFLimitError, build_page_subset, extract_pages_from_pdf, extract_table_rows
+from app.services.gemini_service import EventCallback, advise_on_lab_values, analyze_health_report, replay_events
+from app.services.lab_parser import local_analysis, parse_lab_report, parser_stats
+from app.services.page_selection import MODE_PAGES, MODE_TEXT, plan_analysis
+from app.services.trends_service import add_report_to_trends, add_reports_to_trends
+from app.services.principal_cache import invalidate_principal
+from app.services.storage import get_storage, release_blob
+from app.services.upload_service import hash_stored_file
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, str], Awaitable[None]]
+
+
+class ReportProcessingError(Exception):
+    """
+    Raised when an uploaded report cannot be turned into a stored report.
+    Routes translate it into an HTTPException, background jobs into a failed job.
+    """
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def report_upload_date() -> datetime:
+    return datetime.utcnow() + timedelta(hours=5, minutes=30)  # IST conversion
+
+
+async def _noop_progress(progress: int, stage: str) -> None:
+    return None
+
+
+async def analyze_report_content(
+    file_path: str,
+    content_sha: Optional[str] = None,
+    progress: ProgressCallback = _noop_progress,
+    on_event: Optional[EventCallback] = None
+) -> dict:
+    """
+    Runs text extraction and the Gemini analysis for a stored PDF.
+    Returns the raw gemini result dict ({"extracted_data": ..., "analysis": ...}).
+
+    With ANALYSIS_MODE=adaptive only the lab-table pages are sent: as text when
+    their text layer is rich enough, otherwise as a PDF rebuilt from those pages.
+    on_event receives an "extracted" event once the text is read, then the
+    parameter and analysis events of analyze_health_report.
+    """
+    try:
+        with span("pdf.extract_text"):
+            pages = await extract_pages_from_pdf(file_path)
+    except PDFLimitError as e:
+        raise ReportProcessingError(e.detail, status_code=e.status_code)
+    text = "".join(pages)
+    logger.info(f"Extracted {len(text)} characters from {len(pages)} pages")
+    if not text.strip():
+        raise ReportProcessingError(
+            "Could not extract text from the uploaded PDF. Please ensure it is a valid text-based PDF report."
+        )
+    await progress(30, "extracted")
+    if on_event is not None:
+        await on_event({"event": "extracted", "pages": len(pages), "characters": len(text)})
+
+    if settings.LAB_PARSER_MODE in ("advice", "local"):
+        local_result = await _analyze_locally(file_path)
+        if local_result is not None:
+            if on_event is not None:
+                await replay_events(local_result, on_event)
+            await progress(70, "analyzed")
+            return local_result
+
+    if content_sha is None:
+        content_sha = await hash_stored_file(file_path)
+    plan = plan_analysis(pages) if settings.ANALYSIS_MODE == "adaptive" else None
+
+    if plan is not None and plan.mode == MODE_TEXT:
+        logger.info(f"Calling Gemini with the text of {len(plan.pages)}/{plan.page_count} pages")
+        gemini_result = await analyze_health_report(
+            extracted_text=plan.text,
+            content_sha=content_hash(f"{content_sha}:{plan.mode}:{plan.page_key}".encode("utf-8")),
+            original_bytes=os.path.getsize(file_path),
+            on_event=on_event
+        )
+    elif plan is not None and plan.mode == MODE_PAGES:
+        logger.info(f"Calling Gemini with {len(plan.pages)}/{plan.page_count} PDF pages")
+        try:
+            with span("pdf.build_subset"):
+                subset = await build_page_subset(file_path, plan.pages)
+        except PDFLimitError as e:
+            raise ReportProcessingError(e.detail, status_code=e.status_code)
+        gemini_result = await analyze_health_report(
+            pdf_bytes=subset,
+            content_sha=content_hash(f"{content_sha}:{plan.mode}:{plan.page_key}".encode("utf-8")),
+            original_bytes=os.path.getsize(file_path),
+            on_event=on_event
+        )
+    else:
+        # Analyze with Gemini (pass bytes for native visual/layout analysis)
+        logger.info("Calling Gemini for native PDF analysis")
+        gemini_result = await analyze_health_report(pdf_path=file_path, content_sha=content_sha, on_event=on_event)
+    await progress(70, "analyzed")
+    return gemini_result
+
+
+async def _analyze_locally(file_path: str) -> Optional[dict]:
+    """
+    Extracts values with the rule-based lab parser. Returns None when its
+    confidence is below LAB_PARSER_MIN_CONFIDENCE, so Gemini takes over.
+    """
+    try:
+        with span("pdf.extract_tables"):
+            rows = await extract_table_rows(file_path)
+    except PDFLimitError:
+        return None
+    parsed = parse_lab_report(rows)
+    accepted = parsed.confidence >= settings.LAB_PARSER_MIN_CONFIDENCE
+    parser_stats.record(parsed, accepted)
+    logger.info(f"Local parser: {len(parsed.extracted_data)} parameters, template={parsed.template or 'generic'}, confidence={parsed.confidence}")
+    if not accepted:
+        return None
+
+    analysis = None
+    if settings.LAB_PARSER_MODE == "advice":
+        analysis = await advise_on_lab_values(parsed.extracted_data, parsed.abnormal_parameters)
+    return {
+        "extracted_data": parsed.extracted_data,
+        "analysis": analysis or local_analysis(parsed)
+    }
+
+
+def build_report(
+    user_id: str,
+    gemini_result: dict,
+    content_sha: str,
+    upload_date: Optional[datetime] = None,
+    original_filename: Optional[str] = None
+) -> ReportInDB:
+    try:
+        return ReportInDB(
+            user_id=user_id,
+            extracted_data=gemini_result.get("extracted_data", {}),
+            gemini_analysis=gemini_result.get("analysis"),
+            pdf_path=get_storage().uri(content_sha),
+            pdf_sha256=content_sha,
+            original_filename=original_filename,
+            upload_date=upload_date or report_upload_date()
+        )
+    except Exception as e:
+        logger.error(f"Could not build ReportInDB model: {e}")
+        raise ReportProcessingError(f"Data validation error: {str(e)}", status_code=500)
+
+
+async def save_report(db, report_in_db: ReportInDB, job_id: Optional[str] = None) -> dict:
+    document = report_in_db.dict(by_alias=True, exclude={"id"})
+    if job_id:
+        document["job_id"] = job_id
+    try:
+        new_report = await db.reports.insert_one(document)
+    except DuplicateKeyError:
+        # Another worker ran the same job after its lease expired and saved first
+        created_report = await db.reports.find_one({"job_id": job_id})
+        created_report["_id"] = str(created_report["_id"])
+        return created_report
+    created_report = await db.reports.find_one({"_id": new_report.inserted_id})
+    created_report["_id"] = str(created_report["_id"])
+    await add_report_to_trends(db, created_report)
+    return created_report
+
+
+async def save_reports(db, reports: List[ReportInDB]) -> List[dict]:
+    """Bulk variant of save_report: one insert_many and one trends update for the batch."""
+    documents = [report.dict(by_alias=True, exclude={"id"}) for report in reports]
+    result = await db.reports.insert_many(documents)
+    for document, inserted_id in zip(documents, result.inserted_ids):
+        document["_id"] = str(inserted_id)
+    await add_reports_to_trends(db, documents)
+    return documents
+
+
+async def update_user_checkup(db, user_id: str) -> None:
+    # Update user's last report date and next checkup
+    next_checkup = datetime.utcnow() + timedelta(days=90)
+    # Also bumps the data version, so cached report and trends reads revalidate
+    await db.users.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$set": {
+            "last_report_date": datetime.utcnow(),
+            "next_checkup_date": next_checkup
+        }, **data_version_update()}
+    )
+    invalidate_principal(user_id=user_id)
+
+
+async def process_report(
+    db,
+    user_id: str,
+    content_sha: str,
+    upload_date: Optional[datetime] = None,
+    progress: ProgressCallback = _noop_progress,
+    original_filename: Optional[str] = None,
+    on_event: Optional[EventCallback] = None,
+    job_id: Optional[str] = None,
+    release_on_failure: bool = False,
+) -> dict:
+    """
+    Full upload pipeline for a PDF already held in storage (see acquire_blob):
+    extraction, analysis and persistence.
+    Shared by the synchronous and streaming upload routes and the background job workers.
+    A job saves at most one report: if `job_id` already has one, that report is returned.
+    With release_on_failure, the caller's blob reference is dropped if processing
+    fails before the report is saved; once saved, the report owns it.
+    """
+    try:
+        async with get_storage().local_copy(content_sha) as local_path:
+            gemini_result = await analyze_report_content(local_path, content_sha, progress, on_event)
+        report_in_db = build_report(user_id, gemini_result, content_sha, upload_date, original_filename)
+    except BaseException:
+        if release_on_failure:
+            await release_blob(db, content_sha)
+        raise
+
+    created_report = await save_report(db, report_in_db, job_id)
+    logger.info(f"Report {created_report['_id']} saved")
+
+    await update_user_checkup(db, user_id)
+    await progress(100, "completed")
+    return created_report
+
+
+# --- Report listing (keyset pagination) ---
+
+async def report_stats(db, user_id: str) -> dict:
+    """Report count and mean health score (reports without one count as 0), in one aggregation."""
+    stats = await db.reports.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "average_health_score": {"$avg": {"$ifNull": ["$gemini_analysis.health_score", 0]}},
+        }},
+    ]).to_list(length=1)
+    if not stats:
+        return {"count": 0, "average_health_score": None}
+    return {"count": stats[0]["count"], "average_health_score": round(stats[0]["average_health_score"], 1)}
+
+
+# Fields a caller may add to the summary projection with `fields=`
+LISTABLE_FIELDS = {
+    "extracted_data",
+    "gemini_analysis",
+    "pdf_path",
+    "gemini_analysis.summary",
+    "gemini_analysis.abnormal_parameters",
+    "gemini_analysis.dietary_suggestions",
+    "gemini_analysis.foods_to_include",
+    "gemini_analysis.foods_to_avoid",
+    "gemini_analysis.lifestyle_tips",
+    "gemini_analysis.doctor_consultation",
+}
+
+SUMMARY_PROJECTION = {
+    "report_type": 1,
+    "upload_date": 1,
+    "health_score": "$gemini_analysis.health_score",
+    "abnormal_count": {"$size": {"$ifNull": ["$gemini_analysis.abnormal_parameters", []]}},
+}
+
+
+def encode_cursor(report: dict) -> str:
+    raw = f"{report['upload_date'].isoformat()}|{report['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        date_part, id_part = raw.split("|", 1)
+        return datetime.fromisoformat(date_part), ObjectId(id_part)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return []
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in LISTABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+async def list_report_summaries(
+    db,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Newest-first page of report summaries using keyset pagination on
+    (upload_date, _id), so deep pages cost the same as the first one.
+    Returns (items, next_cursor).
+    """
+    match = {"user_id": user_id}
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        match["$or"] = [
+            {"upload_date": {"$lt": after_date}},
+            {"upload_date": after_date, "_id": {"$lt": after_id}},
+        ]
+
+    projection = dict(SUMMARY_PROJECTION)
+    for field in fields or []:
+        projection[field] = 1
+    # gemini_analysis.* and gemini_analysis cannot both be projected
+    if "gemini_analysis" in projection:
+        projection = {k: v for k, v in projection.items() if not k.startswith("gemini_analysis.")}
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"upload_date": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": projection},
+    ]
+    items = await db.reports.aggregate(pipeline).to_list(length=limit + 1)
+
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    items = items[:limit]
+    for item in items:
+        item["_id"] = str(item["_id"])
+    return items, next_cursor
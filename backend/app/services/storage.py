@@ -0,0 +1,299 @@
+"""
+Content-addressed storage for uploaded report PDFs.
+
+Blobs are identified by the SHA-256 of their bytes, so identical uploads are
+stored once. The `blobs` collection keeps a reference count per hash: reports
+acquire a reference when created and release it when deleted, and the blob is
+removed with its last reference. While its bytes are being deleted the record
+carries `deleting_at`, and acquire_blob waits for it to go instead of taking a
+reference on bytes that are about to disappear. STORAGE_BACKEND selects the local filesystem
+(hash-sharded directories) or GridFS (shared by every API instance).
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from gridfs.errors import FileExists, NoFile
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import get_settings
+from app.core.database import db as mongo
+from app.core.metrics import span
+from app.services.upload_service import remove_quietly
+
+settings = get_settings()
+
+READ_CHUNK_SIZE = 256 * 1024
+# A deletion marker older than this was left by a crashed process and is ignored
+BLOB_DELETE_TIMEOUT = timedelta(seconds=60)
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range HTTP Range header ("bytes=0-499", "bytes=500-", "bytes=-500").
+    Returns None when the whole file should be sent, raises ValueError when the
+    range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+async def iter_file_range(path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    try:
+        f = await asyncio.to_thread(open, path, "rb")
+    except FileNotFoundError:
+        raise BlobNotFound(path)
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+class StorageBackend:
+    name = "base"
+
+    def uri(self, sha256: str) -> str:
+        return f"{self.name}://{sha256}"
+
+    async def exists(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    async def put(self, sha256: str, source_path: str) -> None:
+        """Stores the file at source_path under its hash. Must be idempotent."""
+        raise NotImplementedError
+
+    async def size(self, sha256: str) -> int:
+        raise NotImplementedError
+
+    def open_range(self, sha256: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yields bytes start..end (inclusive) in chunks."""
+        raise NotImplementedError
+
+    async def delete(self, sha256: str) -> None:
+        raise NotImplementedError
+
+    def local_copy(self, sha256: str):
+        """Async context manager yielding a local filesystem path for the blob, e.g. for PyMuPDF."""
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        # ab/cd/abcd...: keeps directories small with millions of blobs
+        return os.path.join(self.root, sha256[:2], sha256[2:4], f"{sha256}.pdf")
+
+    async def exists(self, sha256: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self.path(sha256))
+
+    def _put(self, sha256: str, source_path: str) -> None:
+        dest = self.path(sha256)
+        if os.path.exists(dest):
+            return
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(source_path, tmp)
+        os.replace(tmp, dest)  # atomic, so readers never see a partial blob
+
+    async def put(self, sha256: str, source_path: str) -> None:
+        await asyncio.to_thread(self._put, sha256, source_path)
+
+    async def size(self, sha256: str) -> int:
+        try:
+            return await asyncio.to_thread(os.path.getsize, self.path(sha256))
+        except FileNotFoundError:
+            raise BlobNotFound(sha256)
+
+    async def open_range(self, sha256: str, start: int, end: int) -> AsyncIterator[bytes]:
+        async for chunk in iter_file_range(self.path(sha256), start, end):
+            yield chunk
+
+    async def delete(self, sha256: str) -> None:
+        try:
+            await asyncio.to_thread(os.remove, self.path(sha256))
+        except FileNotFoundError:
+            pass
+
+    @asynccontextmanager
+    async def local_copy(self, sha256: str):
+        path = self.path(sha256)
+        if not await asyncio.to_thread(os.path.exists, path):
+            raise BlobNotFound(sha256)
+        yield path
+
+
+class GridFSStorage(StorageBackend):
+    name = "gridfs"
+
+    def __init__(self, database, bucket_name: str):
+        self.database = database
+        self.bucket_name = bucket_name
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name)
+
+    async def exists(self, sha256: str) -> bool:
+        return await self.database[f"{self.bucket_name}.files"].find_one({"_id": sha256}, {"_id": 1}) is not None
+
+    async def put(self, sha256: str, source_path: str) -> None:
+        if await self.exists(sha256):
+            return
+        grid_in = self.bucket.open_upload_stream_with_id(sha256, f"{sha256}.pdf", metadata={"content_type": "application/pdf"})
+        f = await asyncio.to_thread(open, source_path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                await grid_in.write(chunk)
+            await grid_in.close()
+        except (FileExists, DuplicateKeyError):
+            # Another instance stored the same content concurrently
+            await grid_in.abort()
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def size(self, sha256: str) -> int:
+        doc = await self.database[f"{self.bucket_name}.files"].find_one({"_id": sha256}, {"length": 1})
+        if doc is None:
+            raise BlobNotFound(sha256)
+        return doc["length"]
+
+    async def open_range(self, sha256: str, start: int, end: int) -> AsyncIterator[bytes]:
+        try:
+            grid_out = await self.bucket.open_download_stream(sha256)
+        except NoFile:
+            raise BlobNotFound(sha256)
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, sha256: str) -> None:
+        try:
+            await self.bucket.delete(sha256)
+        except NoFile:
+            pass
+
+    @asynccontextmanager
+    async def local_copy(self, sha256: str):
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=settings.UPLOAD_TMP_DIR)
+        os.close(fd)
+        try:
+            try:
+                with open(path, "wb") as f:
+                    await self.bucket.download_to_stream(sha256, f)
+            except NoFile:
+                raise BlobNotFound(sha256)
+            yield path
+        finally:
+            await asyncio.to_thread(os.remove, path)
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "gridfs":
+            _storage = GridFSStorage(mongo.db, settings.STORAGE_GRIDFS_BUCKET)
+        else:
+            _storage = LocalStorage(settings.STORAGE_LOCAL_ROOT)
+    return _storage
+
+
+async def acquire_blob(db, sha256: str, source_path: str, size: int) -> str:
+    """
+    Takes a reference on the blob for sha256, storing source_path's bytes if this
+    content is new. source_path is consumed (removed) either way. Returns the blob URI.
+    """
+    storage = get_storage()
+    try:
+        while True:
+            try:
+                await db.blobs.find_one_and_update(
+                    {"_id": sha256, "deleting_at": {"$exists": False}},
+                    {
+                        "$inc": {"refcount": 1},
+                        "$setOnInsert": {"size": size, "backend": storage.name, "created_at": datetime.utcnow()},
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+                break
+            except DuplicateKeyError:
+                # release_blob is deleting these bytes: start a new record once it has finished
+                await db.blobs.delete_one(
+                    {"_id": sha256, "deleting_at": {"$lt": datetime.utcnow() - BLOB_DELETE_TIMEOUT}}
+                )
+                await asyncio.sleep(0.05)
+        with span("storage.put", backend=storage.name):
+            if not await storage.exists(sha256):
+                await storage.put(sha256, source_path)
+    finally:
+        await asyncio.to_thread(remove_quietly, source_path)
+    return storage.uri(sha256)
+
+
+async def release_blob(db, sha256: Optional[str]) -> None:
+    """Drops one reference; the blob itself is deleted with its last reference."""
+    if not sha256:
+        return
+    blob = await db.blobs.find_one_and_update(
+        {"_id": sha256, "deleting_at": {"$exists": False}},
+        {"$inc": {"refcount": -1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if blob is None or blob["refcount"] > 0:
+        return
+    # Only the caller that marks the zero-count record deletes the bytes; the marker
+    # keeps acquire_blob from taking a reference until they and the record are gone
+    claimed = await db.blobs.find_one_and_update(
+        {"_id": sha256, "refcount": {"$lte": 0}, "deleting_at": {"$exists": False}},
+        {"$set": {"deleting_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if claimed is None:
+        return
+    try:
+        await get_storage().delete(sha256)
+    finally:
+        await db.blobs.find_one_and_delete({"_id": sha256, "deleting_at": claimed["deleting_at"]})
@@ -0,0 +1,227 @@
+import re
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateMany, UpdateOne
+
+from app.services.downsampling import lttb_indices
+from app.services.parameter_registry import canonical_key, display_name
+
+_NUMBER = re.compile(r"(\d+\.?\d*)")
+
+
+def parse_trend_value(val) -> Optional[Tuple[float, str, Optional[str]]]:
+    if isinstance(val, dict):
+        if val.get("value") is None:
+            return None
+        return val.get("value"), val.get("unit", ""), val.get("reference_range", None)
+    if isinstance(val, str):
+        # Legacy support: extract number from string "14.5 g/dL"
+        match = _NUMBER.search(val)
+        if match:
+            return float(match.group(1)), val.replace(match.group(1), "").strip(), None
+    return None
+
+
+def report_trend_points(report: dict) -> List[Tuple[str, dict]]:
+    """(trend key, point) pairs for every numeric parameter of a stored report."""
+    points = []
+    for param, val in (report.get("extracted_data") or {}).items():
+        parsed = parse_trend_value(val)
+        if parsed is None:
+            continue
+        value, unit, ref_range = parsed
+        # New reports carry the key stamped at ingestion; legacy ones are normalized here
+        key = val.get("canonical_key") if isinstance(val, dict) else None
+        points.append((key or canonical_key(param), {
+            "date": report["upload_date"],
+            "value": value,
+            "unit": unit,
+            "referenceRange": ref_range,
+            "name": param.strip(),
+            "report_id": str(report["_id"]),
+        }))
+    return points
+
+
+async def add_report_to_trends(db, report: dict) -> None:
+    """Appends a new report's values to the user's materialized series."""
+    await add_reports_to_trends(db, [report])
+
+
+async def add_reports_to_trends(db, reports: List[dict]) -> None:
+    """Appends several reports at once: one $push per series, however many reports touch it."""
+    series = {}
+    for report in reports:
+        for key, point in report_trend_points(report):
+            series.setdefault((report["user_id"], key), []).append(point)
+    operations = [
+        UpdateOne(
+            {"user_id": user_id, "key": key},
+            {"$push": {"data": {"$each": points, "$sort": {"date": 1}}}},
+            upsert=True
+        )
+        for (user_id, key), points in series.items()
+    ]
+    if operations:
+        await db.user_trends.bulk_write(operations, ordered=False)
+
+
+async def remove_report_from_trends(db, user_id: str, report_id: str) -> None:
+    await db.user_trends.update_many(
+        {"user_id": user_id, "data.report_id": report_id},
+        {"$pull": {"data": {"report_id": report_id}}}
+    )
+    await db.user_trends.delete_many({"user_id": user_id, "data": {"$size": 0}})
+
+
+async def rebuild_user_trends(db, user_id: str) -> int:
+    """
+    Recomputes a user's user_trends documents from their reports. Returns the series count.
+    Points are replaced report by report rather than series by series, so a report
+    saved while the rebuild runs keeps the point its upload pushed.
+    """
+    series, report_ids = {}, []
+    cursor = db.reports.find(
+        {"user_id": user_id},
+        {"user_id": 1, "upload_date": 1, "extracted_data": 1}
+    ).sort("upload_date", 1)
+    async for report in cursor:
+        report_ids.append(str(report["_id"]))
+        for key, point in report_trend_points(report):
+            series.setdefault(key, []).append(point)
+
+    if report_ids:
+        operations = [UpdateMany({"user_id": user_id}, {"$pull": {"data": {"report_id": {"$in": report_ids}}}})]
+        operations += [
+            UpdateOne(
+                {"user_id": user_id, "key": key},
+                {"$push": {"data": {"$each": points, "$sort": {"date": 1}}}},
+                upsert=True
+            )
+            for key, points in series.items()
+        ]
+        await db.user_trends.bulk_write(operations)
+
+    # Points of other reports are kept unless the report is gone
+    others = set(await db.user_trends.distinct("data.report_id", {"user_id": user_id})) - set(report_ids)
+    if others:
+        existing = await db.reports.find(
+            {"_id": {"$in": [ObjectId(report_id) for report_id in others if ObjectId.is_valid(report_id)]}},
+            {"_id": 1}
+        ).to_list(length=None)
+        deleted = list(others - {str(report["_id"]) for report in existing})
+        if deleted:
+            await db.user_trends.update_many({"user_id": user_id}, {"$pull": {"data": {"report_id": {"$in": deleted}}}})
+    await db.user_trends.delete_many({"user_id": user_id, "data": {"$size": 0}})
+    return len(series)
+
+
+def downsample_points(points: List[dict], max_points: int) -> List[dict]:
+    """Reduces date-sorted trend points to max_points with LTTB; non-numeric series are left alone."""
+    if len(points) <= max_points:
+        return points
+    try:
+        y = np.fromiter((point["value"] for point in points), dtype=np.float64, count=len(points))
+    except (TypeError, ValueError):
+        return points
+    x = np.fromiter((point["date"].timestamp() for point in points), dtype=np.float64, count=len(points))
+    return [points[index] for index in lttb_indices(x, y, max_points)]
+
+
+def render_trends(docs: Iterable[dict], max_points: Optional[int] = None) -> dict:
+    """
+    Turns user_trends documents into the /reports/trends response shape.
+    With max_points, longer series are downsampled (LTTB) before serialization.
+    """
+    series_points, headers = {}, {}
+    for doc in docs:
+        data = doc.get("data") or []
+        if not data:
+            continue
+        # Known parameters get their standard name, otherwise the newest report's wording
+        display = display_name(doc["key"]) or data[-1]["name"]
+        if display in series_points:
+            series_points[display] = sorted(series_points[display] + data, key=lambda x: x["date"])
+        else:
+            series_points[display] = data
+            headers[display] = data[0]  # unit and range of the first series seen
+
+    trends = {}
+    for display, points in series_points.items():
+        first = headers[display]
+        if max_points:
+            points = downsample_points(points, max_points)
+        trends[display] = {
+            "unit": first["unit"],
+            "reference_range": first["referenceRange"],
+            "data": [
+                {"date": point["date"].isoformat(), "value": point["value"], "referenceRange": point["referenceRange"]}
+                for point in points
+            ]
+        }
+    return trends
+
+
+def trends_pipeline(
+    user_id: str,
+    keys: Optional[List[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> List[dict]:
+    """
+    Aggregation over user_trends that applies the parameter and date filters in
+    the database and returns only the point fields render_trends uses.
+    """
+    match = {"user_id": user_id}
+    if keys is not None:
+        match["key"] = {"$in": keys}
+
+    conditions = []
+    if start is not None:
+        conditions.append({"$gte": ["$$point.date", start]})
+    if end is not None:
+        conditions.append({"$lte": ["$$point.date", end]})
+    points = "$data"
+    if conditions:
+        points = {"$filter": {"input": "$data", "as": "point", "cond": {"$and": conditions}}}
+
+    return [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "key": 1,
+            "data": {"$map": {
+                "input": points,
+                "as": "point",
+                "in": {
+                    "date": "$$point.date",
+                    "value": "$$point.value",
+                    "unit": "$$point.unit",
+                    "referenceRange": "$$point.referenceRange",
+                    "name": "$$point.name",
+                },
+            }},
+        }},
+    ]
+
+
+async def get_user_trends(
+    db,
+    user_id: str,
+    params: Optional[List[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: Optional[int] = None
+) -> dict:
+    """
+    Trend series for a user, optionally limited to some parameters (any name or
+    alias), a date range, and at most max_points points per series.
+    """
+    keys = sorted({canonical_key(param) for param in params}) if params else None
+    pipeline = trends_pipeline(user_id, keys, start, end)
+    # Reports that predate the materialized view are backfilled by migration 3
+    docs = await db.user_trends.aggregate(pipeline).to_list(length=None)
+    return render_trends(docs, max_points)
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import mmap
+import os
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from fastapi import UploadFile
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+PDF_MAGIC = b"%PDF-"
+# The PDF spec tolerates junk before the header; readers look within the first 1 KB
+PDF_MAGIC_WINDOW = 1024
+
+
+class UploadRejected(Exception):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+def _too_large() -> UploadRejected:
+    return UploadRejected(
+        f"File is larger than {settings.PDF_MAX_BYTES // (1024 * 1024)} MB.",
+        status_code=413
+    )
+
+
+def check_declared_size(upload: UploadFile) -> None:
+    """Rejects uploads whose size is known up front, before copying anything."""
+    if upload.size is not None and upload.size > settings.PDF_MAX_BYTES:
+        raise _too_large()
+
+
+async def stream_upload_to_disk(upload: UploadFile, dest_path: str) -> StoredUpload:
+    """
+    Copies an UploadFile to disk in UPLOAD_CHUNK_SIZE chunks without blocking the
+    event loop, enforcing PDF_MAX_BYTES as it goes. The SHA-256 is computed and
+    the PDF header checked on the fly, so nothing needs to re-read the file.
+    """
+    check_declared_size(upload)
+    hasher = hashlib.sha256()
+    size = 0
+    head = b""
+
+    out = await asyncio.to_thread(open, dest_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > settings.PDF_MAX_BYTES:
+                raise _too_large()
+            if len(head) < PDF_MAGIC_WINDOW:
+                head += chunk[:PDF_MAGIC_WINDOW - len(head)]
+                if len(head) >= PDF_MAGIC_WINDOW and PDF_MAGIC not in head:
+                    raise UploadRejected("Uploaded file is not a PDF.", status_code=415)
+            hasher.update(chunk)
+            await asyncio.to_thread(out.write, chunk)
+        if PDF_MAGIC not in head:
+            raise UploadRejected("Uploaded file is not a PDF.", status_code=415)
+    except BaseException:
+        await asyncio.to_thread(out.close)
+        await asyncio.to_thread(remove_quietly, dest_path)
+        raise
+    await asyncio.to_thread(out.close)
+    return StoredUpload(dest_path, size, hasher.hexdigest())
+
+
+def remove_quietly(path: str) -> None:
+    """Deletes a temporary or staged file, ignoring one that is already gone."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@contextmanager
+def mapped_file(path: str):
+    """Read-only memory-mapped view of a stored upload."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _hash_mapped(path: str) -> str:
+    with mapped_file(path) as view:
+        return hashlib.sha256(view).hexdigest()
+
+
+async def read_stored_file(path: str) -> bytes:
+    """
+    The whole file as bytes, for the Gemini SDK (its request model only accepts
+    bytes). Read straight into one buffer: mapping the file first and slicing the
+    map would hold the mapping and a full copy at the same time.
+    """
+    return await asyncio.to_thread(_read_file, path)
+
+
+async def hash_stored_file(path: str) -> str:
+    return await asyncio.to_thread(_hash_mapped, path)
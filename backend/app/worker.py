@@ -0,0 +1,37 @@
+"""
+Standalone report job worker.
+
+    python -m app.worker
+
+Processes uploads queued with POST /api/reports/upload?async=true. Run it
+alongside (or instead of) the in-process workers controlled by REPORT_JOB_WORKERS.
+"""
+import asyncio
+import logging
+
+from app.core.config import get_settings
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.logs import configure_logging
+from app.services.job_service import ReportJobWorkerPool
+
+settings = get_settings()
+logger = logging.getLogger("app.worker")
+
+
+async def main():
+    configure_logging()
+    await connect_to_mongo()
+    pool = ReportJobWorkerPool(get_database, max(settings.REPORT_JOB_WORKERS, 1))
+    logger.info(f"Report worker {pool.worker_prefix} started with {pool.concurrency} slots")
+    try:
+        await pool.run_forever()
+    finally:
+        await pool.stop()
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
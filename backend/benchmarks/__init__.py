@@ -0,0 +1 @@
+"""Local stand-ins and load/benchmark tooling for the backend."""
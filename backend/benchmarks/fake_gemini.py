@@ -0,0 +1,157 @@
+"""
+Local stand-in for the Gemini generateContent and streamGenerateContent APIs.
+
+    python -m benchmarks.fake_gemini --port 8090 --latency 1.5 --error-rate 0.1
+
+Point the backend at it with GEMINI_BASE_URL=http://127.0.0.1:8090 (any
+GEMINI_API_KEY works). Latency, jitter and injected errors can also be changed
+at runtime with POST /_control, e.g. {"error_rate": 1.0, "error_status": 503}.
+Streamed answers are split into --chunk-size character chunks sent evenly
+over the latency, so the first one arrives after latency / chunks.
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SAMPLE_ANALYSIS = {
+    "extracted_data": {
+        "Hemoglobin": {"value": 12.1, "unit": "g/dL", "reference_range": "13-17"},
+        "Fasting Blood Sugar": {"value": 108, "unit": "mg/dL", "reference_range": "70-100"},
+        "Total Cholesterol": {"value": 182, "unit": "mg/dL", "reference_range": "125-200"},
+        "HDL Cholesterol": {"value": 44, "unit": "mg/dL", "reference_range": "40-60"},
+        "LDL Cholesterol": {"value": 118, "unit": "mg/dL", "reference_range": "0-100"},
+        "Triglycerides": {"value": 140, "unit": "mg/dL", "reference_range": "0-150"},
+        "Vitamin D": {"value": 18, "unit": "ng/mL", "reference_range": "30-100"},
+        "TSH": {"value": 2.4, "unit": "uIU/mL", "reference_range": "0.5-5"},
+    },
+    "analysis": {
+        "summary": "Mildly low hemoglobin and vitamin D with borderline fasting sugar and LDL.",
+        "health_score": 72,
+        "abnormal_parameters": ["Hemoglobin", "Fasting Blood Sugar", "LDL Cholesterol", "Vitamin D"],
+        "dietary_suggestions": ["Increase iron-rich foods", "Reduce refined carbohydrates"],
+        "foods_to_include": ["Spinach", "Lentils", "Oats"],
+        "foods_to_avoid": ["Sugary drinks", "Fried snacks"],
+        "lifestyle_tips": ["30 minutes of sunlight daily", "Walk after meals"],
+        "doctor_consultation": False,
+    },
+}
+
+
+class FakeGeminiConfig:
+    def __init__(self, latency=0.5, jitter=0.1, error_rate=0.0, error_status=503, payload=None, chunk_size=80):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.payload = payload or SAMPLE_ANALYSIS
+        self.requests = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "latency": self.latency,
+            "jitter": self.jitter,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+            "chunk_size": self.chunk_size,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+def _candidate_response(text: str) -> dict:
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {"promptTokenCount": 1000, "candidatesTokenCount": len(text) // 4},
+    }
+
+
+def create_app(config: FakeGeminiConfig = None) -> FastAPI:
+    config = config or FakeGeminiConfig()
+    app = FastAPI(title="Fake Gemini")
+    app.state.config = config
+
+    def _latency() -> float:
+        return max(0.0, config.latency + random.uniform(-config.jitter, config.jitter))
+
+    async def _delay_or_error(delay: float):
+        config.requests += 1
+        await asyncio.sleep(delay)
+        if random.random() < config.error_rate:
+            config.errors += 1
+            return JSONResponse(
+                status_code=config.error_status,
+                content={"error": {"code": config.error_status, "message": "Injected failure", "status": "UNAVAILABLE"}},
+            )
+        return None
+
+    @app.post("/{api_version}/models/{model_action:path}")
+    async def generate(api_version: str, model_action: str, request: Request):
+        await request.body()
+        text = json.dumps(config.payload)
+        if not model_action.endswith(":streamGenerateContent"):
+            error = await _delay_or_error(_latency())
+            if error is not None:
+                return error
+            return _candidate_response(text)
+
+        chunks = [text[i:i + config.chunk_size] for i in range(0, len(text), max(1, config.chunk_size))]
+        interval = _latency() / len(chunks)
+        error = await _delay_or_error(interval)
+        if error is not None:
+            return error
+
+        async def stream():
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(interval)
+                yield f"data: {json.dumps(_candidate_response(chunk))}\r\n\r\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/_control")
+    async def get_control():
+        return config.as_dict()
+
+    @app.post("/_control")
+    async def set_control(changes: dict):
+        for key in ("latency", "jitter", "error_rate", "error_status", "payload", "chunk_size"):
+            if key in changes:
+                setattr(config, key, changes[key])
+        return config.as_dict()
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Gemini API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0..1 share of failed requests")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--payload", help="JSON file with the analysis to return")
+    parser.add_argument("--chunk-size", type=int, default=80, help="characters per streamed chunk")
+    args = parser.parse_args()
+
+    payload = None
+    if args.payload:
+        with open(args.payload) as f:
+            payload = json.load(f)
+    config = FakeGeminiConfig(args.latency, args.jitter, args.error_rate, args.error_status, payload, args.chunk_size)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""
+End-to-end load scenarios against a real server, with local stand-ins.
+
+    python -m benchmarks.load --output run.json
+    python -m benchmarks.load --scenarios trends,pagination --baseline run.json
+
+Starts a throwaway mongod (see benchmarks.mongod), seeds it with synthetic
+users (benchmarks.synthetic), starts the fake Gemini server and the API under
+uvicorn, then drives these scenarios over HTTP:
+
+- login:       POST /api/auth/token storm (bcrypt-bound)
+- login_burst: --burst-concurrency logins while a probe measures an ordinary
+               authenticated read (GET /api/reports/) alongside them
+- upload:      burst of synchronous PDF uploads (extraction + fake Gemini)
+- upload_stream: the same over POST /api/reports/upload/stream (SSE), also
+               reporting "first_parameter_ms", the time until the first
+               extracted value arrives
+- trends:      GET /api/reports/trends for users with --trend-sizes reports
+- pagination:  walks GET /api/reports/ page by page for the largest user
+- read_your_writes: records a BMI reading, then immediately lists the recent
+               BMI history and counts responses missing that reading
+               ("stale_reads"; must stay 0 with causal consistency)
+
+Each scenario reports throughput and p50/p95/p99 latency. The result is one
+JSON document; with --baseline every scenario also gets its p50/p95/p99 and
+throughput ratio against that earlier run. --env KEY=VALUE passes settings
+to the server (e.g. --env FAST_JSON_RESPONSES=true).
+
+--replica-set 3 runs everything against a local three-member replica set
+with MONGO_READ_PREFERENCE=secondaryPreferred, so the read scenarios are
+served by secondaries (--env MONGO_READ_PREFERENCE=... overrides it).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+import httpx
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+# Settings the server gets; the seeder builds documents with the app's models, which read them on import
+BENCH_SETTINGS = {
+    "SECRET_KEY": "bench-secret",
+    "GEMINI_API_KEY": "bench",
+    "MONGODB_URI": "mongodb://127.0.0.1:27017",
+    "DATABASE_NAME": "bench",
+    "LOG_LEVEL": "WARNING",
+}
+for _key, _value in BENCH_SETTINGS.items():
+    os.environ.setdefault(_key, _value)
+
+from benchmarks.mongod import free_port, local_mongod, local_replica_set, stop_process  # noqa: E402
+from benchmarks.synthetic import PASSWORD, SeededUser, seed  # noqa: E402
+
+SCENARIOS = ("login", "login_burst", "upload", "upload_stream", "trends", "pagination", "read_your_writes")
+
+Step = Callable[[httpx.AsyncClient, int, dict], Awaitable[httpx.Response]]
+
+
+def make_report_pdf(marker: str) -> bytes:
+    """A small text-layer lab report; `marker` makes its hash (and analysis cache key) unique."""
+    import fitz
+
+    lines = [
+        "Bench Diagnostics - Lab Report",
+        f"Sample ID: {marker}",
+        "",
+        "Test                    Result   Unit     Reference Range",
+        "Hemoglobin              12.1     g/dL     13-17",
+        "Fasting Blood Sugar     108      mg/dL    70-100",
+        "Total Cholesterol       182      mg/dL    125-200",
+        "HDL Cholesterol         44       mg/dL    40-60",
+        "LDL Cholesterol         118      mg/dL    0-100",
+        "Triglycerides           140      mg/dL    0-150",
+        "Vitamin D               18       ng/mL    30-100",
+        "TSH                     2.4      uIU/mL   0.5-5",
+    ]
+    document = fitz.open()
+    page = document.new_page()
+    page.insert_text((50, 72), "\n".join(lines), fontname="cour", fontsize=10)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+# --- Measurement ---
+
+def summarize(name: str, latencies: List[float], statuses: Counter, elapsed: float, concurrency: int) -> dict:
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) if len(values) else (0.0, 0.0, 0.0)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status == "error" or int(status) >= 400),
+        "statuses": dict(sorted(statuses.items())),
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(float(values.mean()), 2) if len(values) else 0.0,
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(values.max()), 2) if len(values) else 0.0,
+        },
+    }
+
+
+async def run_scenario(
+    name: str,
+    client: httpx.AsyncClient,
+    requests: Optional[int],
+    concurrency: int,
+    step: Step,
+    stop: Optional[asyncio.Event] = None
+) -> dict:
+    """
+    Runs `requests` steps over `concurrency` workers; each worker keeps its own
+    state dict. With requests=None it runs until `stop` is set instead.
+    """
+    latencies: List[float] = []
+    statuses = Counter()
+    indices = iter(range(requests)) if requests is not None else itertools.count()
+
+    async def worker():
+        state = {}
+        for index in indices:
+            if stop is not None and stop.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                response = await step(client, index, state)
+                status = str(response.status_code)
+            except httpx.HTTPError:
+                status = "error"
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, latencies, statuses, time.perf_counter() - started, concurrency)
+
+
+def compare(result: dict, baseline: Optional[dict]) -> dict:
+    """Current / baseline ratios: above 1 means slower latency or higher throughput."""
+    if not baseline:
+        return result
+    change = {"throughput_rps": round(result["throughput_rps"] / baseline["throughput_rps"], 3) if baseline["throughput_rps"] else None}
+    for key in ("p50", "p95", "p99"):
+        before = baseline["latency_ms"][key]
+        change[key] = round(result["latency_ms"][key] / before, 3) if before else None
+    return {**result, "vs_baseline": change}
+
+
+# --- Scenarios ---
+
+async def login(client: httpx.AsyncClient, email: str) -> str:
+    response = await client.post("/api/auth/token", data={"username": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def login_step(email: str) -> Step:
+    async def step(client, index, state):
+        return await client.post("/api/auth/token", data={"username": email, "password": PASSWORD})
+    return step
+
+
+def upload_step(token: str, run_id: str) -> Step:
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def step(client, index, state):
+        pdf = make_report_pdf(f"{run_id}-{index}")
+        return await client.post(
+            "/api/reports/upload",
+            files={"file": (f"bench-{index}.pdf", pdf, "application/pdf")},
+            headers=headers,
+        )
+    return step
+
+
+def upload_stream_step(token: str, run_id: str, first_parameter: List[float]) -> Step:
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def step(client, index, state):
+        pdf = make_report_pdf(f"{run_id}-stream-{index}")
+        start = time.perf_counter()
+        async with client.stream(
+            "POST",
+            "/api/reports/upload/stream",
+            files={"file": (f"bench-{index}.pdf", pdf, "application/pdf")},
+            headers=headers,
+        ) as response:
+            seen = False
+            async for line in response.aiter_lines():
+                if not seen and line == "event: parameter":
+                    first_parameter.append(time.perf_counter() - start)
+                    seen = True
+                elif line == "event: error":
+                    # Failed analyses count as errors, like a non-2xx upload
+                    response.status_code = 502
+        return response
+    return step
+
+
+def list_step(token: str) -> Step:
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def step(client, index, state):
+        return await client.get("/api/reports/", params={"limit": 20}, headers=headers)
+    return step
+
+
+async def login_burst(client: httpx.AsyncClient, args, email: str, probe: Step) -> List[dict]:
+    """A login storm and, at the same time, two clients reading reports until it is over."""
+    done = asyncio.Event()
+    probe_task = asyncio.create_task(run_scenario("login_burst_probe", client, None, 2, probe, stop=done))
+    try:
+        burst = await run_scenario("login_burst", client, args.requests, args.burst_concurrency, login_step(email))
+    finally:
+        done.set()
+    return [burst, await probe_task]
+
+
+def trends_step(token: str) -> Step:
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def step(client, index, state):
+        return await client.get("/api/reports/trends", headers=headers)
+    return step
+
+
+def pagination_step(token: str, page_size: int) -> Step:
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def step(client, index, state):
+        params = {"limit": page_size}
+        if state.get("cursor"):
+            params["cursor"] = state["cursor"]
+        response = await client.get("/api/reports/", params=params, headers=headers)
+        state["cursor"] = response.headers.get("X-Next-Cursor")  # None restarts from the first page
+        return response
+    return step
+
+
+def read_your_writes_step(token: str, stale: Counter) -> Step:
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def step(client, index, state):
+        # Unique per request, so concurrent workers can't satisfy each other's check
+        weight = round(60 + index / 1000, 3)
+        since = (datetime.utcnow() - timedelta(seconds=5)).isoformat()
+        response = await client.post("/api/bmi/calculate", json={"height_cm": 175, "weight_kg": weight}, headers=headers)
+        if response.status_code != 200:
+            return response
+        response = await client.get("/api/bmi/history", params={"start": since, "limit": 10000}, headers=headers)
+        if response.status_code == 200 and not any(point["weight_kg"] == weight for point in response.json()):
+            stale["stale_reads"] += 1
+        return response
+    return step
+
+
+async def run_scenarios(base_url: str, users: List[SeededUser], args, baseline: Dict[str, dict]) -> List[dict]:
+    timeout = httpx.Timeout(300.0)
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        # users[0] has no reports and takes the logins and uploads; the rest back the read scenarios
+        tokens = {user.user_id: await login(client, user.email) for user in users}
+        uploader = users[0]
+        by_size = users[1:]
+
+        def record(result: dict):
+            results.append(compare(result, baseline.get(result["scenario"])))
+
+        if "login" in args.scenarios:
+            record(await run_scenario("login", client, args.requests, args.concurrency, login_step(uploader.email)))
+        if "login_burst" in args.scenarios and by_size:
+            smallest = min(by_size, key=lambda user: user.reports)
+            for result in await login_burst(client, args, uploader.email, list_step(tokens[smallest.user_id])):
+                record(result)
+        if "trends" in args.scenarios:
+            for user in by_size:
+                step = trends_step(tokens[user.user_id])
+                record(await run_scenario(f"trends_{user.reports}", client, args.requests, args.concurrency, step))
+        if "pagination" in args.scenarios and by_size:
+            largest = max(by_size, key=lambda user: user.reports)
+            step = pagination_step(tokens[largest.user_id], args.page_size)
+            record(await run_scenario(f"pagination_{largest.reports}", client, args.requests, args.concurrency, step))
+        if "upload" in args.scenarios:
+            step = upload_step(tokens[uploader.user_id], uuid.uuid4().hex)
+            record(await run_scenario("upload", client, args.uploads, args.upload_concurrency, step))
+        if "upload_stream" in args.scenarios:
+            first_parameter: List[float] = []
+            step = upload_stream_step(tokens[uploader.user_id], uuid.uuid4().hex, first_parameter)
+            result = await run_scenario("upload_stream", client, args.uploads, args.upload_concurrency, step)
+            values = np.asarray(first_parameter) * 1000
+            p50, p95 = np.percentile(values, [50, 95]) if len(values) else (0.0, 0.0)
+            record({**result, "first_parameter_ms": {"p50": round(float(p50), 2), "p95": round(float(p95), 2)}})
+        if "read_your_writes" in args.scenarios:
+            stale = Counter()
+            step = read_your_writes_step(tokens[uploader.user_id], stale)
+            result = await run_scenario("read_your_writes", client, args.requests, args.concurrency, step)
+            record({**result, "stale_reads": stale["stale_reads"]})
+    return results
+
+
+# --- Processes ---
+
+def wait_for_http(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not come up within {timeout}s")
+        time.sleep(0.2)
+
+
+@contextmanager
+def background(command: List[str], ready_url: str, env: Optional[dict] = None) -> Iterator[subprocess.Popen]:
+    process = subprocess.Popen(command, env=env)
+    try:
+        wait_for_http(ready_url, process)
+        yield process
+    finally:
+        stop_process(process)
+
+
+def server_env(
+    mongodb_uri: str,
+    database: str,
+    gemini_url: str,
+    workdir: str,
+    overrides: List[str],
+    replica_set: bool = False
+) -> dict:
+    env = {**os.environ, **BENCH_SETTINGS}
+    if replica_set:
+        env["MONGO_READ_PREFERENCE"] = "secondaryPreferred"
+    env.update({
+        "MONGODB_URI": mongodb_uri,
+        "DATABASE_NAME": database,
+        "GEMINI_BASE_URL": gemini_url,
+        "STORAGE_LOCAL_ROOT": os.path.join(workdir, "blobs"),
+        "UPLOAD_TMP_DIR": os.path.join(workdir, "tmp"),
+    })
+    for override in overrides:
+        key, _, value = override.partition("=")
+        env[key] = value
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load scenarios")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests per read/login scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--burst-concurrency", type=int, default=100, help="concurrent logins in login_burst")
+    parser.add_argument("--trend-sizes", default="10,100,1000", help="reports per seeded user")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--upload-concurrency", type=int, default=5)
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--app-workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="server setting override")
+    parser.add_argument("--baseline", help="earlier output of this command to compare with")
+    parser.add_argument("--output", help="also write the result to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replica-set", type=int, default=0, metavar="MEMBERS",
+                        help="run against a local replica set with this many members instead of one mongod")
+    args = parser.parse_args()
+    args.scenarios = {name for name in args.scenarios.split(",") if name}
+    unknown = args.scenarios - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {result["scenario"]: result for result in json.load(f)["results"]}
+
+    trend_sizes = [int(value) for value in args.trend_sizes.split(",") if value]
+    database = f"bench_{uuid.uuid4().hex[:8]}"
+    gemini_port, app_port = free_port(), free_port()
+    gemini_url = f"http://127.0.0.1:{gemini_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    mongo = local_replica_set(args.replica_set) if args.replica_set else local_mongod()
+    with mongo as mongodb_uri, tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        seeded_at = time.perf_counter()
+        users = asyncio.run(_seed(mongodb_uri, database, [0] + trend_sizes, args.seed))
+        seed_seconds = time.perf_counter() - seeded_at
+        env = server_env(mongodb_uri, database, gemini_url, workdir, args.env, replica_set=bool(args.replica_set))
+        try:
+            with background(
+                [sys.executable, "-m", "benchmarks.fake_gemini", "--port", str(gemini_port),
+                 "--latency", str(args.gemini_latency)],
+                f"{gemini_url}/_control",
+            ), background(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+                 "--workers", str(args.app_workers), "--log-level", "warning"],
+                f"{app_url}/health",
+                env,
+            ):
+                results = asyncio.run(run_scenarios(app_url, users, args, baseline))
+        finally:
+            with MongoClient(mongodb_uri) as client:
+                client.drop_database(database)
+
+    output = {
+        "benchmark": "load",
+        "python": sys.version.split()[0],
+        "config": {
+            "concurrency": args.concurrency,
+            "burst_concurrency": args.burst_concurrency,
+            "requests": args.requests,
+            "uploads": args.uploads,
+            "upload_concurrency": args.upload_concurrency,
+            "gemini_latency": args.gemini_latency,
+            "app_workers": args.app_workers,
+            "replica_set": args.replica_set,
+            "env": args.env,
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "results": results,
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+async def _seed(uri: str, database: str, report_counts: List[int], seed_value: int) -> List[SeededUser]:
+    client = AsyncIOMotorClient(uri)
+    try:
+        return await seed(client[database], report_counts, seed_value=seed_value)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Throwaway local MongoDB for benchmarks.
+
+    with local_mongod() as uri:
+        ...
+
+    with local_replica_set(members=3) as uri:
+        ...
+
+Starts `mongod` (MONGOD_BIN, or the one on PATH) on a free port with a
+temporary dbpath, waits until it answers ping, and stops it and deletes the
+data on exit. local_replica_set() does the same for every member, initiates
+the set and waits for a primary; its URI names the set, so clients discover
+the members and can read from secondaries. Set BENCH_MONGODB_URI to run
+against an existing server or replica set instead.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_mongo(uri: str, timeout: float, process: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"mongod exited with status {process.returncode}")
+        try:
+            with MongoClient(uri, serverSelectionTimeoutMS=500) as client:
+                client.admin.command("ping")
+            return
+        except PyMongoError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def stop_process(process: subprocess.Popen, timeout: float = 10.0) -> None:
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _mongod_binary(binary: Optional[str]) -> str:
+    binary = binary or os.environ.get("MONGOD_BIN") or shutil.which("mongod")
+    if not binary:
+        raise RuntimeError("mongod not found: install MongoDB, or set MONGOD_BIN or BENCH_MONGODB_URI")
+    return binary
+
+
+def _start_mongod(binary: str, dbpath: str, port: int, *extra: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            binary,
+            "--dbpath", dbpath,
+            "--port", str(port),
+            "--bind_ip", "127.0.0.1",
+            "--logpath", os.path.join(dbpath, "mongod.log"),
+            *extra,
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+@contextmanager
+def local_mongod(binary: Optional[str] = None, startup_timeout: float = 30.0) -> Iterator[str]:
+    """Yields the URI of a fresh mongod that is removed on exit."""
+    existing = os.environ.get("BENCH_MONGODB_URI")
+    if existing:
+        yield existing
+        return
+
+    binary = _mongod_binary(binary)
+    dbpath = tempfile.mkdtemp(prefix="bench-mongod-")
+    port = free_port()
+    process = _start_mongod(binary, dbpath, port)
+    try:
+        uri = f"mongodb://127.0.0.1:{port}"
+        wait_for_mongo(uri, startup_timeout, process)
+        yield uri
+    finally:
+        stop_process(process)
+        shutil.rmtree(dbpath, ignore_errors=True)
+
+
+def wait_for_primary(uri: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    with MongoClient(uri, serverSelectionTimeoutMS=500) as client:
+        while True:
+            try:
+                status = client.admin.command("replSetGetStatus")
+                states = [member["stateStr"] for member in status["members"]]
+                # Secondaries must be readable too, or secondaryPreferred runs everything on the primary
+                if "PRIMARY" in states and all(state in ("PRIMARY", "SECONDARY") for state in states):
+                    return
+            except PyMongoError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"replica set at {uri} did not elect a primary in {timeout}s")
+            time.sleep(0.5)
+
+
+@contextmanager
+def local_replica_set(
+    members: int = 3,
+    binary: Optional[str] = None,
+    startup_timeout: float = 60.0,
+    name: str = "bench"
+) -> Iterator[str]:
+    """Yields the URI of a fresh replica set (the first member is the preferred primary)."""
+    existing = os.environ.get("BENCH_MONGODB_URI")
+    if existing:
+        yield existing
+        return
+
+    binary = _mongod_binary(binary)
+    ports = [free_port() for _ in range(members)]
+    dbpaths = [tempfile.mkdtemp(prefix=f"bench-{name}-{i}-") for i in range(members)]
+    processes = []
+    try:
+        for dbpath, port in zip(dbpaths, ports):
+            processes.append(_start_mongod(binary, dbpath, port, "--replSet", name))
+        for process, port in zip(processes, ports):
+            wait_for_mongo(f"mongodb://127.0.0.1:{port}/?directConnection=true", startup_timeout, process)
+
+        config = {
+            "_id": name,
+            "members": [
+                {"_id": i, "host": f"127.0.0.1:{port}", "priority": 2 if i == 0 else 1}
+                for i, port in enumerate(ports)
+            ],
+        }
+        with MongoClient(f"mongodb://127.0.0.1:{ports[0]}/?directConnection=true") as client:
+            client.admin.command("replSetInitiate", config)
+
+        hosts = ",".join(f"127.0.0.1:{port}" for port in ports)
+        uri = f"mongodb://{hosts}/?replicaSet={name}"
+        wait_for_primary(uri, startup_timeout)
+        yield uri
+    finally:
+        for process in processes:
+            stop_process(process)
+        for dbpath in dbpaths:
+            shutil.rmtree(dbpath, ignore_errors=True)
@@ -0,0 +1,136 @@
+"""
+Microbenchmark: report response encoding, current path vs FAST_JSON_RESPONSES.
+
+    python -m benchmarks.serialization --params 20,200,1000 --list-size 20
+
+"current" reproduces what FastAPI does for a response_model route: validate
+the returned dict into the model, dump it in JSON mode by alias, then encode
+with json.dumps. "fast" is FastJSONResponse (orjson, BSON-aware, no
+validation). Results are printed as one JSON document.
+"""
+import argparse
+import json
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from app.core.serialization import FastJSONResponse, orjson
+from app.models.report import ReportResponse, ReportSummary
+
+
+def make_report(params: int) -> dict:
+    extracted = {
+        f"Parameter {i}": {
+            "value": round(random.uniform(1, 300), 1),
+            "unit": "mg/dL",
+            "reference_range": "70-100",
+            "canonical_key": f"parameter {i}",
+        }
+        for i in range(params)
+    }
+    return {
+        "_id": str(ObjectId()),
+        "user_id": str(ObjectId()),
+        "report_type": "General Health",
+        "upload_date": datetime(2024, 1, 1) + timedelta(days=random.randint(0, 365)),
+        "extracted_data": extracted,
+        "gemini_analysis": {
+            "summary": "Mostly within range. " * 10,
+            "health_score": 78,
+            "abnormal_parameters": list(extracted)[: params // 10],
+            "dietary_suggestions": ["Eat more fibre"] * 5,
+            "foods_to_include": ["Oats", "Lentils"] * 3,
+            "foods_to_avoid": ["Sugary drinks"] * 3,
+            "lifestyle_tips": ["Walk daily"] * 3,
+            "doctor_consultation": False,
+        },
+        "pdf_path": "local://" + "0" * 64,
+        "pdf_sha256": "0" * 64,
+        "original_filename": "report.pdf",
+    }
+
+
+def make_summaries(count: int) -> List[dict]:
+    return [
+        {
+            "_id": str(ObjectId()),
+            "report_type": "General Health",
+            "upload_date": datetime(2024, 1, 1) + timedelta(days=i),
+            "health_score": 70 + i % 20,
+            "abnormal_count": i % 5,
+        }
+        for i in range(count)
+    ]
+
+
+def current_encoder(annotation):
+    adapter = TypeAdapter(annotation)
+
+    def encode(content) -> bytes:
+        value = adapter.validate_python(content)
+        dumped = adapter.dump_python(value, mode="json", by_alias=True)
+        return json.dumps(dumped, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    return encode
+
+
+def fast_encode(content) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def measure(encode, content, repeat: int) -> float:
+    """Best per-call time in microseconds over `repeat` rounds."""
+    encode(content)
+    number = max(1, 2000 // max(1, len(fast_encode(content)) // 1000))
+    best = min(timeit.repeat(lambda: encode(content), number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+def run(params: List[int], list_size: int, repeat: int) -> dict:
+    cases = []
+    get_report = current_encoder(ReportResponse)
+    for count in params:
+        report = make_report(count)
+        cases.append(("get_report", count, get_report, report))
+    cases.append(("list_reports", list_size, current_encoder(List[ReportSummary]), make_summaries(list_size)))
+
+    results = []
+    for name, size, current, content in cases:
+        current_us = measure(current, content, repeat)
+        fast_us = measure(fast_encode, content, repeat)
+        results.append({
+            "case": name,
+            "size": size,
+            "bytes": len(fast_encode(content)),
+            "current_us": round(current_us, 1),
+            "fast_us": round(fast_us, 1),
+            "speedup": round(current_us / fast_us, 2),
+        })
+    return {
+        "benchmark": "serialization",
+        "encoder": "orjson" if orjson is not None else "json",
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report serialization microbenchmark")
+    parser.add_argument("--params", default="20,200,1000", help="extracted_data sizes for get_report")
+    parser.add_argument("--list-size", type=int, default=20, help="summaries per list_reports page")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    params = [int(value) for value in args.params.split(",") if value]
+    print(json.dumps(run(params, args.list_size, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
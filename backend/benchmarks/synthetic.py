@@ -0,0 +1,158 @@
+"""
+Synthetic users, reports and BMI histories for load tests.
+
+    python -m benchmarks.synthetic --uri mongodb://127.0.0.1:27017 --db bench --reports 10,100,1000
+
+One user is created per entry of --reports, with that many reports spread
+over the past years (values drift like real follow-ups, so trends have
+shape), their materialized trends and a daily BMI history. Every user's
+password is PASSWORD. Documents are built with the app's own models and
+written through the same helpers as real uploads.
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+from typing import List, NamedTuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.migrations import run_migrations
+from app.core.security import get_password_hash
+from app.models.bmi import BMIRecord
+from app.models.report import ReportInDB
+from app.models.user import UserInDB
+from app.services.bmi_service import classify_bmi, compute_bmi
+from app.services.parameter_registry import PARAMETERS, annotate_extracted_data
+from app.services.trends_service import add_reports_to_trends
+
+PASSWORD = "bench-password"
+REPORT_INTERVAL_DAYS = 3
+INSERT_BATCH = 500
+
+# Parameters with a default range, so values can be placed around it
+_RANGED = [spec for spec in PARAMETERS if spec.reference_range]
+
+
+class SeededUser(NamedTuple):
+    user_id: str
+    email: str
+    reports: int
+
+
+def user_email(index: int, reports: int) -> str:
+    return f"user{index}-{reports}r@bench.local"
+
+
+def _bounds(reference_range: str):
+    low, high = (float(part) for part in reference_range.split("-"))
+    return low, high
+
+
+def make_reports(user_id: str, count: int, rng: random.Random, end: datetime) -> List[dict]:
+    """`count` report documents, oldest first, each a small random step from the previous one."""
+    levels = {}
+    for spec in _RANGED:
+        low, high = _bounds(spec.reference_range)
+        levels[spec.name] = rng.uniform(low, high)
+
+    reports = []
+    for i in range(count):
+        extracted, abnormal = {}, []
+        for spec in _RANGED:
+            low, high = _bounds(spec.reference_range)
+            value = levels[spec.name] = max(0.0, levels[spec.name] + rng.gauss(0, (high - low) * 0.05))
+            extracted[spec.name] = {"value": round(value, 2), "unit": spec.unit, "reference_range": spec.reference_range}
+            if not low <= value <= high:
+                abnormal.append(spec.name)
+        sha = f"{rng.getrandbits(256):064x}"
+        report = ReportInDB(
+            user_id=user_id,
+            upload_date=end - timedelta(days=REPORT_INTERVAL_DAYS * (count - 1 - i)),
+            extracted_data=annotate_extracted_data(extracted),
+            gemini_analysis={
+                "summary": "Synthetic report for load testing.",
+                "health_score": max(0, 100 - 8 * len(abnormal)),
+                "abnormal_parameters": abnormal,
+                "dietary_suggestions": ["Eat more fibre"],
+                "foods_to_include": ["Oats"],
+                "foods_to_avoid": ["Sugary drinks"],
+                "lifestyle_tips": ["Walk daily"],
+                "doctor_consultation": len(abnormal) > 4,
+            },
+            pdf_path=f"local://{sha}",
+            pdf_sha256=sha,
+            original_filename=f"report-{i}.pdf",
+        )
+        reports.append(report.dict(by_alias=True, exclude={"id"}))
+    return reports
+
+
+def make_bmi_history(user_id: str, days: int, rng: random.Random, end: datetime) -> List[dict]:
+    height = rng.uniform(150, 190)
+    weight = rng.uniform(50, 100)
+    records = []
+    for day in range(days):
+        weight = max(35.0, weight + rng.gauss(0, 0.3))
+        bmi = compute_bmi(weight, height)
+        category, _ = classify_bmi(bmi)
+        records.append(BMIRecord(
+            user_id=user_id,
+            height_cm=round(height, 1),
+            weight_kg=round(weight, 1),
+            bmi=bmi,
+            category=category,
+            created_at=end - timedelta(days=days - 1 - day, minutes=rng.randint(0, 600)),
+        ).dict())
+    return records
+
+
+async def seed(db, report_counts: List[int], bmi_days: int = 365, seed_value: int = 0) -> List[SeededUser]:
+    """Creates one user per entry of report_counts. Returns them in the same order."""
+    await run_migrations(db)
+    rng = random.Random(seed_value)
+    hashed_password = get_password_hash(PASSWORD)  # same password for everyone, hash it once
+    end = datetime.utcnow().replace(microsecond=0)
+
+    users = []
+    for index, count in enumerate(report_counts):
+        email = user_email(index, count)
+        user = UserInDB(email=email, full_name=f"Bench User {index}", hashed_password=hashed_password)
+        result = await db.users.insert_one(user.dict(by_alias=True, exclude={"id"}))
+        user_id = str(result.inserted_id)
+
+        reports = make_reports(user_id, count, rng, end)
+        for start in range(0, len(reports), INSERT_BATCH):
+            batch = reports[start:start + INSERT_BATCH]
+            inserted = await db.reports.insert_many(batch)
+            for document, inserted_id in zip(batch, inserted.inserted_ids):
+                document["_id"] = str(inserted_id)
+            await add_reports_to_trends(db, batch)
+
+        history = make_bmi_history(user_id, bmi_days, rng, end)
+        if history:
+            await db.bmi_records.insert_many(history)
+        users.append(SeededUser(user_id, email, count))
+    return users
+
+
+async def main(uri: str, database: str, report_counts: List[int], bmi_days: int, seed_value: int):
+    client = AsyncIOMotorClient(uri)
+    try:
+        users = await seed(client[database], report_counts, bmi_days, seed_value)
+    finally:
+        client.close()
+    print(json.dumps([user._asdict() for user in users], indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic users and reports")
+    parser.add_argument("--uri", required=True)
+    parser.add_argument("--db", default="bench")
+    parser.add_argument("--reports", default="10,100,1000", help="reports per user, one user per entry")
+    parser.add_argument("--bmi-days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    counts = [int(value) for value in args.reports.split(",") if value]
+    asyncio.run(main(args.uri, args.db, counts, args.bmi_days, args.seed))
@@ -7,6 +7,7 @@ import { Plus, FileText, Calendar, Activity, Calculator, ArrowRight, Loader2 } f
 const Dashboard = () => {
     const { user } = useAuth();
     const [reports, setReports] = useState([]);
+    const [reportStats, setReportStats] = useState({ count: 0, average_health_score: null });
     const [reminderStatus, setReminderStatus] = useState(null);
     const [latestBmi, setLatestBmi] = useState(null);
     const [loading, setLoading] = useState(true);
@@ -14,14 +15,12 @@ const Dashboard = () => {
     const fetchData = useCallback(async (isManualSync = false) => {
         if (isManualSync) setLoading(true);
         try {
-            const [reportsRes, remindersRes, bmiRes] = await Promise.all([
-                api.get(`/reports/?_t=${Date.now()}`),
-                api.get(`/users/reminders/status?_t=${Date.now()}`),
-                api.get(`/bmi/latest?_t=${Date.now()}`)
-            ]);
-            setReports(reportsRes.data);
-            setReminderStatus(remindersRes.data);
-            setLatestBmi(bmiRes.data);
+            // One round trip: the server reads these sections concurrently
+            const { data } = await api.get('/dashboard?include=reminder,bmi,reports&reports_limit=5');
+            setReports(data.reports.items);
+            setReportStats({ count: data.reports.count, average_health_score: data.reports.average_health_score });
+            setReminderStatus(data.reminder);
+            setLatestBmi(data.bmi);
         } catch (error) {
             console.error("Error fetching dashboard data", error);
         } finally {
@@ -43,8 +42,8 @@ const Dashboard = () => {
         );
     }
 
-    const avgHealthScore = reports.length > 0 
-        ? Math.round(reports.reduce((acc, r) => acc + (r.gemini_analysis?.health_score || 0), 0) / reports.length)
+    const avgHealthScore = reportStats.count > 0
+        ? Math.round(reportStats.average_health_score)
         : null;
 
     return (
@@ -191,12 +190,12 @@ const Dashboard = () => {
                                     </div>
                                 </div>
                                 <div className="flex items-center gap-4 w-full sm:w-auto justify-between sm:justify-end">
-                                    {report.gemini_analysis?.health_score && (
+                                    {report.health_score && (
                                         <div className="flex items-center gap-2">
                                             <div className="w-12 h-1 bg-slate-100 rounded-full overflow-hidden hidden md:block">
-                                                <div className="bg-indigo-400 h-full" style={{ width: `${report.gemini_analysis.health_score}%` }}></div>
+                                                <div className="bg-indigo-400 h-full" style={{ width: `${report.health_score}%` }}></div>
                                             </div>
-                                            <span className="text-sm font-black text-slate-400">{report.gemini_analysis.health_score} pt</span>
+                                            <span className="text-sm font-black text-slate-400">{report.health_score} pt</span>
                                         </div>
                                     )}
                                     <div className="px-4 py-2 bg-emerald-50 text-emerald-600 rounded-2xl text-[10px] font-black uppercase tracking-widest border border-emerald-100">
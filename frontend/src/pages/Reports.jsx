@@ -7,12 +7,21 @@ const Reports = () => {
     const [reports, setReports] = useState([]);
     const [loading, setLoading] = useState(true);
     const [searchTerm, setSearchTerm] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    const fetchPage = async (cursor = null) => {
+        const response = await api.get('/reports/', {
+            params: { fields: 'gemini_analysis.summary', ...(cursor ? { cursor } : {}) }
+        });
+        setNextCursor(response.headers['x-next-cursor'] || null);
+        return response.data;
+    };
 
     useEffect(() => {
         const fetchReports = async () => {
             try {
-                const response = await api.get('/reports/');
-                setReports(response.data);
+                setReports(await fetchPage());
             } catch (error) {
                 console.error("Error fetching reports", error);
             } finally {
@@ -22,6 +31,18 @@ const Reports = () => {
         fetchReports();
     }, []);
 
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const page = await fetchPage(nextCursor);
+            setReports((current) => [...current, ...page]);
+        } catch (error) {
+            console.error("Error fetching reports", error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const filteredReports = reports.filter(report => 
         (report.report_type || 'Health Report').toLowerCase().includes(searchTerm.toLowerCase())
     );
@@ -100,10 +121,10 @@ const Reports = () => {
                                             <Activity className="h-3 w-3" /> Health Score
                                         </div>
                                         <div className={`text-3xl font-black ${
-                                            (report.gemini_analysis?.health_score || 0) >= 80 ? 'text-emerald-500' :
-                                            (report.gemini_analysis?.health_score || 0) >= 60 ? 'text-amber-500' : 'text-rose-500'
+                                            (report.health_score || 0) >= 80 ? 'text-emerald-500' :
+                                            (report.health_score || 0) >= 60 ? 'text-amber-500' : 'text-rose-500'
                                         }`}>
-                                            {report.gemini_analysis?.health_score || '--'}
+                                            {report.health_score || '--'}
                                             <span className="text-sm text-slate-300 ml-1">/100</span>
                                         </div>
                                     </div>
@@ -128,6 +149,17 @@ const Reports = () => {
                              <p className="text-slate-400 font-bold uppercase tracking-widest text-xs">No matching archives found</p>
                         </div>
                     )}
+
+                    {nextCursor && (
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="mx-auto mt-4 flex items-center gap-2 bg-white border border-slate-100 px-10 py-4 rounded-2xl font-bold text-slate-600 hover:text-indigo-600 hover:border-indigo-200 transition-all shadow-sm disabled:opacity-60"
+                        >
+                            {loadingMore && <Loader2 className="h-4 w-4 animate-spin" />}
+                            Load older reports
+                        </button>
+                    )}
                 </div>
             )}
         </div>
@@ -15,14 +15,8 @@ const Trends = () => {
     const fetchTrends = useCallback(async (isManualRefresh = false) => {
         if (isManualRefresh) setLoading(true);
         try {
-            // Add cache-busting timestamp to ensure fresh data from server
-            const response = await api.get(`/reports/trends?_t=${Date.now()}`, {
-                headers: {
-                    'Cache-Control': 'no-cache',
-                    'Pragma': 'no-cache',
-                    'Expires': '0',
-                }
-            });
+            // The server sends an ETag with no-cache, so the browser revalidates and reuses unchanged data
+            const response = await api.get('/reports/trends?max_points=200');
             setTrends(response.data);
             
             // Auto-select first parameter if none selected, or if current selection disappeared
@@ -1,12 +1,15 @@
 import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import api from '../services/api';
+import { postEventStream } from '../services/api';
 import { UploadCloud, File, AlertCircle, Loader2, ArrowLeft, Shield } from 'lucide-react';
 
 const UploadReport = () => {
     const [file, setFile] = useState(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState('');
+    const [stage, setStage] = useState('');
+    const [parameters, setParameters] = useState([]);
+    const [summary, setSummary] = useState('');
     const navigate = useNavigate();
 
     const handleFileChange = (e) => {
@@ -32,23 +35,34 @@ const UploadReport = () => {
 
         setLoading(true);
         setError('');
+        setStage('Uploading document...');
+        setParameters([]);
+        setSummary('');
 
         const formData = new FormData();
         formData.append('file', file);
 
         try {
-            const response = await api.post('/reports/upload', formData, {
-                headers: {
-                    'Content-Type': 'multipart/form-data',
-                },
+            // Values and the summary appear as the analysis streams in
+            let reportId = null;
+            await postEventStream('/reports/upload/stream', formData, (event) => {
+                if (event.event === 'started') setStage('Extracting text...');
+                else if (event.event === 'extracted') setStage('Reading lab values...');
+                else if (event.event === 'parameter') setParameters((current) => [...current, event]);
+                else if (event.event === 'summary' && event.field === 'summary') setSummary(event.value);
+                else if (event.event === 'recommendation') setStage('Writing recommendations...');
+                else if (event.event === 'completed') reportId = event.report._id;
+                else if (event.event === 'error') throw Object.assign(new Error(event.detail), { response: { data: event } });
             });
-            navigate(`/reports/${response.data._id}`);
+            if (!reportId) throw new Error('The analysis ended unexpectedly.');
+            navigate(`/reports/${reportId}`);
         } catch (err) {
             console.error(err);
             const errorMessage = err.response?.data?.detail || 'System error during analysis. Please retry.';
             setError(errorMessage);
         } finally {
             setLoading(false);
+            setStage('');
         }
     };
 
@@ -111,6 +125,20 @@ const UploadReport = () => {
                     )}
                 </div>
 
+                {loading && (parameters.length > 0 || summary) && (
+                    <div className="mt-8 p-6 bg-slate-50 rounded-2xl animate-in fade-in">
+                        {summary && <p className="text-sm font-bold text-slate-700 mb-4">{summary}</p>}
+                        <div className="grid grid-cols-2 gap-3">
+                            {parameters.map((parameter) => (
+                                <div key={parameter.name} className="flex justify-between text-xs font-bold text-slate-500">
+                                    <span>{parameter.name}</span>
+                                    <span className="text-slate-900">{parameter.value.value} {parameter.value.unit}</span>
+                                </div>
+                            ))}
+                        </div>
+                    </div>
+                )}
+
                 {error && (
                     <div className="mt-8 p-5 bg-rose-50 border border-rose-100 text-rose-600 rounded-2xl flex items-center gap-4 animate-in slide-in-from-top-4">
                         <AlertCircle className="h-5 w-5 shrink-0" />
@@ -130,7 +158,7 @@ const UploadReport = () => {
                         {loading ? (
                             <>
                                 <Loader2 className="h-6 w-6 animate-spin text-white/50" />
-                                Processing Neural Analysis...
+                                {stage || 'Processing Neural Analysis...'}
                             </>
                         ) : (
                             'Initialize AI Synthesis'
@@ -35,4 +35,37 @@ api.interceptors.response.use(
   },
 );
 
+// POSTs a form and calls onEvent for each Server-Sent Event of the response as it arrives
+// (axios buffers the whole body in the browser, so this uses fetch).
+export const postEventStream = async (path, formData, onEvent) => {
+  const token = localStorage.getItem("token");
+  const response = await fetch(`${API_URL}${path}`, {
+    method: "POST",
+    body: formData,
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+  });
+  if (!response.ok) {
+    const body = await response.json().catch(() => ({}));
+    if (response.status === 401) {
+      localStorage.removeItem("token");
+      window.location.href = "/login?expired=true";
+    }
+    throw Object.assign(new Error(body.detail || response.statusText), { response: { status: response.status, data: body } });
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const data = buffer.slice(0, end).split("\n").find((line) => line.startsWith("data: "));
+      buffer = buffer.slice(end + 2);
+      if (data) onEvent(JSON.parse(data.slice(6)));
+    }
+  }
+};
+
 export default api;